@@ -1,10 +1,14 @@
 from __future__ import annotations
 
 import asyncio
-from typing import Any, Dict, List
+import os
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
 
-from backend.LLM_Score.clients.llm_client import LLMClient
+from backend.LLM_Score.clients.llm_client import close_llm_client, get_llm_client
+from backend.LLM_Score.services.batcher import MicroBatcher
 from backend.LLM_Score.services.carbon_service import CarbonService
+from backend.LLM_Score.services.emission_cache import get_emission_cache
+from backend.LLM_Score.services.emission_catalog import get_emission_catalog
 
 
 async def score_receipt(receipt_json: Dict[str, Any]) -> List[Dict[str, Any]]:
@@ -13,10 +17,79 @@ async def score_receipt(receipt_json: Dict[str, Any]) -> List[Dict[str, Any]]:
         raise ValueError("Receipt JSON must include an 'items_parsed' list.")
 
     fallback_context = receipt_json.get("cleaned_text")
-    llm_client = LLMClient()
-    service = CarbonService(llm_client=llm_client)
+    return await get_carbon_service().estimate_batch(items, fallback_context=fallback_context)
 
-    return await service.estimate_batch(items, fallback_context=fallback_context)
+
+async def stream_receipt_scores(receipt_json: Dict[str, Any]) -> AsyncIterator[Tuple[int, Dict[str, Any]]]:
+    """score_receipt, item by item: (index into items_parsed, row) as each estimate becomes known."""
+    items = receipt_json.get("items_parsed")
+    if not items:
+        raise ValueError("Receipt JSON must include an 'items_parsed' list.")
+
+    fallback_context = receipt_json.get("cleaned_text")
+    async for index, row in get_carbon_service().stream_batch(items, fallback_context=fallback_context):
+        yield index, row
+
+
+_service: Optional[CarbonService] = None
+
+# Cache misses of concurrent receipts are coalesced into one LLM call: a batch goes out
+# LLM_BATCH_WINDOW_MS after its first item, or as soon as LLM_BATCH_MAX_ITEMS distinct
+# items are waiting. LLM_BATCH_WINDOW_MS=0 sends every receipt on its own.
+LLM_BATCH_WINDOW_MS = float(os.getenv("LLM_BATCH_WINDOW_MS", "10"))
+LLM_BATCH_MAX_ITEMS = int(os.getenv("LLM_BATCH_MAX_ITEMS", "40"))
+
+
+def get_carbon_service() -> CarbonService:
+    """
+    The shared service: one pooled LLM client, the emission catalog and cache, and the
+    micro-batcher for every receipt. Created on first use, or ahead of time by init_scoring() at startup.
+    """
+    global _service
+    if _service is None:
+        service = CarbonService(
+            llm_client=get_llm_client(), cache=get_emission_cache(), catalog=get_emission_catalog()
+        )
+        if LLM_BATCH_WINDOW_MS > 0:
+            service.batcher = MicroBatcher(
+                service.estimate_pending, window_ms=LLM_BATCH_WINDOW_MS, max_items=LLM_BATCH_MAX_ITEMS
+            )
+        _service = service
+    return _service
+
+
+def init_scoring() -> None:
+    """Create the LLM client (and its connection pool), load the catalog and open the emission cache."""
+    get_carbon_service()
+
+
+async def close_scoring() -> None:
+    global _service
+    _service = None
+    await close_llm_client()
+
+
+def emission_cache_stats() -> Dict[str, Any]:
+    return get_emission_cache().stats()
+
+
+def catalog_stats() -> Dict[str, Any]:
+    catalog = get_emission_catalog()
+    return catalog.stats() if catalog is not None else {"enabled": False}
+
+
+def batcher_stats() -> Dict[str, Any]:
+    batcher = _service.batcher if _service is not None else None
+    return batcher.stats() if batcher is not None else {"enabled": False}
 
 
-__all__ = ["score_receipt"]
+__all__ = [
+    "score_receipt",
+    "stream_receipt_scores",
+    "emission_cache_stats",
+    "catalog_stats",
+    "batcher_stats",
+    "get_carbon_service",
+    "init_scoring",
+    "close_scoring",
+]
@@ -0,0 +1,68 @@
+"""Incremental parser for the streamed {"items": [...]} JSON of a chat completion.
+
+feed() takes the text deltas as they arrive and returns every item object whose
+closing brace has been seen, so a caller can act on each item while the model is
+still writing the rest. Only the objects directly inside the top-level array are
+returned. Braces and brackets inside strings are ignored. Text before the current
+unfinished item is dropped, so memory stays bounded by the largest single item.
+"""
+
+from __future__ import annotations
+
+import json
+from typing import Any, Dict, List, Optional
+
+_ITEM_PARENTS = ["{", "["]   # top-level object -> items array -> item object
+
+
+class ItemStreamParser:
+    def __init__(self) -> None:
+        self._text = ""
+        self._pos = 0
+        self._stack: List[str] = []
+        self._in_string = False
+        self._escape = False
+        self._start: Optional[int] = None
+
+    def feed(self, chunk: str) -> List[Dict[str, Any]]:
+        """Item objects completed by this chunk, in stream order."""
+        self._text += chunk
+        text = self._text
+        items: List[Dict[str, Any]] = []
+        for i in range(self._pos, len(text)):
+            c = text[i]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif c == "\\":
+                    self._escape = True
+                elif c == '"':
+                    self._in_string = False
+                continue
+            if c == '"':
+                self._in_string = True
+            elif c == "{" or c == "[":
+                if c == "{" and self._stack == _ITEM_PARENTS:
+                    self._start = i
+                self._stack.append(c)
+            elif c == "}" or c == "]":
+                if self._stack:
+                    self._stack.pop()
+                if c == "}" and self._start is not None and self._stack == _ITEM_PARENTS:
+                    try:
+                        obj = json.loads(text[self._start:i + 1])
+                    except ValueError:
+                        obj = None
+                    if isinstance(obj, dict):
+                        items.append(obj)
+                    self._start = None
+
+        if self._start is None:
+            self._text, self._pos = "", 0
+        else:
+            self._text, self._pos = text[self._start:], len(text) - self._start
+            self._start = 0
+        return items
+
+
+__all__ = ["ItemStreamParser"]
@@ -3,12 +3,15 @@ from __future__ import annotations
 import asyncio
 import json
 import os
+import threading
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Any, Dict, Iterable, List, Optional
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Iterable, List, Optional
 
 from dotenv import load_dotenv
-from openai import OpenAI
+
+from backend.LLM_Score.clients.json_stream import ItemStreamParser
+from backend.LLM_Score.clients.prompt_builder import PromptBuilder
 
 # Ensure we load the API key from backend/LLM_Score/keys.env
 CURRENT_DIR = Path(__file__).resolve().parents[1]
@@ -30,7 +33,14 @@ class LLMCarbonEstimate:
 
 
 class LLMClient:
-    """Simple wrapper around the OpenAI Chat Completions endpoint."""
+    """
+    Async wrapper around the OpenAI Chat Completions endpoint.
+
+    One instance is meant to live for the whole process (see get_llm_client()): it owns
+    an AsyncOpenAI client on a pooled httpx connection (keep-alive, HTTP/2 when the h2
+    package is installed), so receipts reuse warm TLS connections instead of opening new
+    ones, and a semaphore caps the chat completions in flight.
+    """
 
     def __init__(
         self,
@@ -38,22 +48,61 @@ class LLMClient:
         model: Optional[str] = None,
         base_url: Optional[str] = None,
         timeout_seconds: float = 45.0,
+        max_connections: Optional[int] = None,
+        max_keepalive_connections: Optional[int] = None,
+        http2: Optional[bool] = None,
+        max_concurrency: Optional[int] = None,
+        chunk_max_items: Optional[int] = None,
+        chunk_max_tokens: Optional[int] = None,
+        chunk_retries: Optional[int] = None,
     ) -> None:
         self.api_key = api_key or os.getenv("OPENAI_API_KEY")
         self.model = model or os.getenv("OPENAI_MODEL", "gpt-4o-mini")
         self.base_url = (base_url or os.getenv("OPENAI_API_BASE", "https://api.openai.com/v1")).rstrip("/")
         self.timeout_seconds = timeout_seconds
+        self.max_connections = max_connections or int(os.getenv("OPENAI_MAX_CONNECTIONS", "20"))
+        self.max_keepalive_connections = max_keepalive_connections or int(os.getenv("OPENAI_MAX_KEEPALIVE", "10"))
+        self.http2 = (os.getenv("OPENAI_HTTP2", "1") != "0") if http2 is None else http2
+        self.max_concurrency = max_concurrency or int(os.getenv("OPENAI_MAX_CONCURRENCY", "8"))
+        self.chunk_max_items = chunk_max_items or int(os.getenv("LLM_CHUNK_MAX_ITEMS", "15"))
+        self.chunk_max_tokens = chunk_max_tokens or int(os.getenv("LLM_CHUNK_MAX_TOKENS", "6000"))
+        self.chunk_retries = int(os.getenv("LLM_CHUNK_RETRIES", "2")) if chunk_retries is None else chunk_retries
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        self.prompt_builder = PromptBuilder(self.model)
         self._client = None
         if self.api_key:
-            client_kwargs: dict[str, Any] = {"api_key": self.api_key}
+            # imported on first use: the SDK is slow to import
+            import httpx
+            from openai import AsyncOpenAI
+
+            if self.http2:
+                try:
+                    import h2  # noqa: F401  (httpx needs it for HTTP/2)
+                except ImportError:
+                    self.http2 = False
+            http_client = httpx.AsyncClient(
+                http2=self.http2,
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_keepalive_connections,
+                    keepalive_expiry=float(os.getenv("OPENAI_KEEPALIVE_SECONDS", "60")),
+                ),
+                timeout=httpx.Timeout(self.timeout_seconds, connect=10.0),
+            )
+            client_kwargs: dict[str, Any] = {"api_key": self.api_key, "http_client": http_client}
             if self.base_url:
                 client_kwargs["base_url"] = self.base_url
-            self._client = OpenAI(**client_kwargs)
+            self._client = AsyncOpenAI(**client_kwargs)
 
     @property
     def is_configured(self) -> bool:
         return bool(self.api_key)
 
+    async def aclose(self) -> None:
+        """Close the pooled connections (the process-wide client is closed on shutdown)."""
+        if self._client is not None:
+            await self._client.close()
+
     # async def estimate_carbon(
     #     self,
     #     item_name: str,
@@ -130,6 +179,75 @@ class LLMClient:
         items: List[dict[str, Optional[str]]],
         shared_context: Optional[str] = None,
     ) -> List[Dict[str, Optional[float]]]:
+        """
+        Estimates for a whole receipt. Items are split into chunks (by item count and
+        estimated prompt tokens) that are sent concurrently, under the client's
+        semaphore, and merged back in input order. Each chunk is retried on its own.
+        A chunk that still fails adds no rows, but the other chunks are kept. Every row
+        carries "index", the position of its item in items (see _batch_from_response);
+        items the model didn't identify get no row.
+        """
+        normalized_items = self._normalize_items(items, shared_context)
+        if not normalized_items:
+            return []
+
+        chunks = chunk_items(normalized_items, self.chunk_max_items, self.chunk_max_tokens, self.prompt_builder)
+        results = await asyncio.gather(*(self._estimate_chunk(chunk) for chunk in chunks))
+        merged = []
+        offset = 0
+        for chunk, rows in zip(chunks, results):
+            for row in rows:
+                row["index"] = offset + row.pop("position")
+                merged.append(row)
+            offset += len(chunk)
+        return merged
+
+    async def stream_carbon_batch(
+        self,
+        items: List[dict[str, Optional[str]]],
+        shared_context: Optional[str] = None,
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Streaming variant of estimate_carbon_batch. Chunks are streamed concurrently
+        and each row is yielded as soon as its JSON object is complete, so rows arrive
+        in completion order, not input order. Every row carries "index", the position
+        of its item in items. When a chunk's stream fails, is cut off, or leaves items
+        unanswered, only those items are retried.
+        """
+        normalized_items = self._normalize_items(items, shared_context)
+        if not normalized_items:
+            return
+
+        chunks = chunk_items(normalized_items, self.chunk_max_items, self.chunk_max_tokens, self.prompt_builder)
+        offsets = [0]
+        for chunk in chunks[:-1]:
+            offsets.append(offsets[-1] + len(chunk))
+        queue: asyncio.Queue = asyncio.Queue()
+
+        async def run(n: int, chunk: List[Dict[str, Any]]) -> None:
+            try:
+                await self._stream_chunk(chunk, lambda row: queue.put((n, row)))
+            finally:
+                queue.put_nowait(None)
+
+        tasks = [asyncio.create_task(run(n, chunk)) for n, chunk in enumerate(chunks)]
+        try:
+            finished = 0
+            while finished < len(tasks):
+                tagged = await queue.get()
+                if tagged is None:
+                    finished += 1
+                    continue
+                n, row = tagged
+                row["index"] = offsets[n] + row.pop("position")
+                yield row
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    def _normalize_items(
+        self, items: List[dict[str, Optional[str]]], shared_context: Optional[str]
+    ) -> List[Dict[str, Any]]:
         if not self.api_key or not self._client:
             raise RuntimeError("OPENAI_API_KEY is not configured")
 
@@ -144,67 +262,250 @@ class LLMClient:
                     "context": entry.get("context") or shared_context,
                 }
             )
+        return normalized_items
 
-        if not normalized_items:
-            return []
-
-        user_prompt = (
-            "You are given a list of grocery or retail items. "
-            "Estimate the carbon emissions per item (kg CO2e). "
-            "Respond with JSON: {\"items\":[{\"item_name\":<str>,\"emissions_kg_co2e\":<number|null>}]}."
-        )
-
-        user_prompt += "\nItems JSON:\n" + json.dumps(normalized_items, ensure_ascii=False)
+    async def _stream_chunk(
+        self, chunk: List[Dict[str, Any]], emit: Callable[[Dict[str, Any]], Awaitable[None]]
+    ) -> None:
+        """
+        Stream one chunk into emit(). Each streamed object is matched to an item of the
+        chunk by the "id" the model echoes, else by its exact item name, and emitted
+        tagged with the item's "position" in the chunk. Objects that match no unanswered
+        item are dropped: their item stays unanswered and goes into the retry.
+        """
+        unanswered = dict(enumerate(chunk))   # position in chunk -> entry
+        error: Any = None
+        for attempt in range(self.chunk_retries + 1):
+            if attempt:
+                await asyncio.sleep(0.5 * 2 ** (attempt - 1))
+            positions = list(unanswered)     # prompt id -> position in chunk
+            try:
+                async for entry in self._stream_completion([unanswered[p] for p in positions]):
+                    position = _match_position(entry, positions, unanswered)
+                    row = _row_from_item(entry)
+                    if position is None or row is None:
+                        continue
+                    del unanswered[position]
+                    row["position"] = position
+                    await emit(row)
+                error = "items left unanswered"
+            except Exception as e:
+                error = e
+            if not unanswered:
+                return
+        print(f"LLM stream of {len(unanswered)} items failed after {self.chunk_retries + 1} attempts (non-critical):", error)
+
+    async def _stream_completion(self, chunk: List[Dict[str, Any]]) -> AsyncIterator[Dict[str, Any]]:
+        """One streamed chat completion; yields each item object as the items array is written."""
+        messages, prompt_tokens = self.prompt_builder.build(chunk)
+        print(f"🧾 LLM prompt (stream): {len(chunk)} items, ~{prompt_tokens} input tokens ({self.prompt_builder.tokenizer})")
+
+        parser = ItemStreamParser()
+        finish_reason = None
+        async with self._semaphore:
+            stream = await self._client.chat.completions.create(
+                model=self.model,
+                temperature=0.2,
+                response_format={"type": "json_object"},
+                messages=messages,
+                timeout=self.timeout_seconds,
+                stream=True,
+            )
+            async for event in stream:
+                if not event.choices:
+                    continue
+                choice = event.choices[0]
+                finish_reason = choice.finish_reason or finish_reason
+                delta = choice.delta.content if choice.delta else None
+                if not delta:
+                    continue
+                for entry in parser.feed(delta):
+                    yield entry
+        if finish_reason == "length":
+            raise ValueError("response truncated")
+
+    async def _estimate_chunk(self, chunk: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        error: Any = None
+        for attempt in range(self.chunk_retries + 1):
+            if attempt:
+                await asyncio.sleep(0.5 * 2 ** (attempt - 1))
+            try:
+                parsed, truncated = await self._complete_chunk(chunk)
+            except Exception as e:
+                error = e
+                continue
+            if not truncated:
+                return _batch_from_response(parsed, chunk)
+            if len(chunk) > 1:
+                # Output hit the token limit: ask for each half separately.
+                half = len(chunk) // 2
+                left, right = await asyncio.gather(
+                    self._estimate_chunk(chunk[:half]), self._estimate_chunk(chunk[half:])
+                )
+                for row in right:
+                    row["position"] += half
+                return left + right
+            error = "response truncated"
+        print(f"LLM chunk of {len(chunk)} items failed after {self.chunk_retries + 1} attempts (non-critical):", error)
+        return []
+
+    async def _complete_chunk(self, chunk: List[Dict[str, Any]]) -> tuple[Dict[str, Any], bool]:
+        """One chat completion. Returns (parsed JSON, truncated)."""
+        messages, prompt_tokens = self.prompt_builder.build(chunk)
+        print(f"🧾 LLM prompt: {len(chunk)} items, ~{prompt_tokens} input tokens ({self.prompt_builder.tokenizer})")
 
         payload = {
             "model": self.model,
             "temperature": 0.2,
             "response_format": {"type": "json_object"},
-            "messages": [
-                {
-                    "role": "system",
-                    "content": (
-                        "You are a sustainability analyst producing factual carbon footprint estimates. "
-                        "Try your best to find the estimate for each item."
-                        "If absolutely unsure even about the estimate, only then return a random number between 1.0 and 3.0 kg CO2e. "
-                    ),
-                },
-                {"role": "user", "content": user_prompt},
-            ],
+            "messages": messages,
             "timeout": self.timeout_seconds,
         }
 
-        response = await asyncio.to_thread(
-            self._client.chat.completions.create,
-            **payload,
-        )
+        async with self._semaphore:
+            response = await self._client.chat.completions.create(**payload)
 
-        raw_text = _extract_content(response.choices[0].message.content)
+        choice = response.choices[0]
+        raw_text = _extract_content(choice.message.content)
         try:
             parsed = json.loads(raw_text)
             print("Parsed LLM response:", parsed)
         except json.JSONDecodeError:
-            parsed = {"items": []}
+            if choice.finish_reason == "length":
+                return {}, True
+            raise ValueError(f"invalid JSON from model: {raw_text[:80]!r}")
+        if not isinstance(parsed, dict) or not isinstance(parsed.get("items"), list):
+            raise ValueError("model response has no 'items' list")
+        return parsed, False
+
+
+# Expected output per item: {"item_name": "...", "emissions_kg_co2e": 1.23}
+OUTPUT_TOKENS_PER_ITEM = 25
+
+
+def chunk_items(
+    items: List[Dict[str, Any]],
+    max_items: int,
+    max_tokens: int,
+    builder: Optional[PromptBuilder] = None,
+) -> List[List[Dict[str, Any]]]:
+    """
+    Split items into consecutive chunks of at most max_items whose estimated prompt and
+    output tokens stay under max_tokens. Each distinct context counts once per chunk,
+    at its trimmed size, since that is how the prompt builder sends it. An item that is
+    larger than the budget on its own gets a chunk to itself.
+    """
+    builder = builder or PromptBuilder("")
+    chunks: List[List[Dict[str, Any]]] = []
+    current: List[Dict[str, Any]] = []
+    current_tokens = 0
+    contexts: set = set()
+    for entry in items:
+        context = entry.get("context")
+        tokens = builder.item_tokens(entry) + OUTPUT_TOKENS_PER_ITEM
+        if context and context not in contexts:
+            tokens += builder.context_tokens(context)
+        if current and (len(current) >= max_items or current_tokens + tokens > max_tokens):
+            chunks.append(current)
+            current, current_tokens, contexts = [], 0, set()
+            tokens = builder.item_tokens(entry) + OUTPUT_TOKENS_PER_ITEM + builder.context_tokens(context)
+        current.append(entry)
+        current_tokens += tokens
+        if context:
+            contexts.add(context)
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def _batch_from_response(parsed: Dict[str, Any], chunk: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Rows of a chunk's response, each tagged with the "position" in chunk of the item
+    it answers, matched like streamed objects (_match_position). Rows that identify no
+    unanswered item are dropped rather than guessed by order.
+    """
+    unanswered = dict(enumerate(chunk))
+    positions = list(unanswered)
+    batch = []
+    for entry in parsed.get("items", []):
+        row = _row_from_item(entry)
+        if row is None:
+            continue
+        position = _match_position(entry, positions, unanswered)
+        if position is None:
+            continue
+        del unanswered[position]
+        row["position"] = position
+        batch.append(row)
+    return batch
+
+
+def _row_from_item(entry: Any) -> Optional[Dict[str, Any]]:
+    if not isinstance(entry, dict):
+        return None
+    name = entry.get("item_name")
+    emissions = entry.get("emissions_kg_co2e")
+    fallback = emissions is None
+    if fallback:
+        emissions = _to_float(1.0 + 2.0 * os.urandom(1)[0] / 255.0)
+        emissions = round(emissions, 2)
+    else:
+        emissions = _to_float(emissions)
+    if not name:
+        return None
+    return {
+        "item_name": name,
+        "emissions_kg_co2e": emissions,
+        "fallback": fallback,  # random placeholder, not an estimate (never cached)
+    }
+
+
+def _match_position(entry: Dict[str, Any], positions: List[int], unanswered: Dict[int, Any]) -> Optional[int]:
+    """
+    Chunk position of an item object from the model, from its echoed "id" (an index into
+    positions, the prompt's items) or its item name (equal up to case and spacing).
+    None when neither identifies an unanswered item, or when they point at different
+    items: the caller never guesses.
+    """
+    by_id: Optional[int] = None
+    item_id = entry.get("id")
+    if isinstance(item_id, int) and not isinstance(item_id, bool) and 0 <= item_id < len(positions):
+        by_id = positions[item_id]
+    by_name: Optional[int] = None
+    name = _name_key(entry.get("item_name"))
+    if name:
+        by_name = next((p for p in positions if _name_key(unanswered.get(p, {}).get("item_name")) == name), None)
+
+    if by_id is not None and by_name is not None and by_id != by_name:
+        return None
+    position = by_id if by_id is not None else by_name
+    return position if position in unanswered else None
+
+
+def _name_key(name: Any) -> str:
+    return " ".join(name.lower().split()) if isinstance(name, str) else ""
+
+
+_shared_client: Optional[LLMClient] = None
+_shared_lock = threading.Lock()
+
+
+def get_llm_client() -> LLMClient:
+    """The process-wide client, created on first use (or at startup by the API's warm-up)."""
+    global _shared_client
+    if _shared_client is None:
+        with _shared_lock:
+            if _shared_client is None:
+                _shared_client = LLMClient()
+    return _shared_client
 
-        batch = []
-        for entry in parsed.get("items", []):
-            name = entry.get("item_name")
-            emissions = entry.get("emissions_kg_co2e")
-            if emissions is None:
-                emissions = _to_float(1.0 + 2.0 * os.urandom(1)[0] / 255.0)
-                emissions = round(emissions, 2)
-            else:
-                emissions = _to_float(emissions)
-            if not name:
-                continue
-            batch.append(
-                {
-                    "item_name": name,
-                    "emissions_kg_co2e": emissions,
-                }
-            )
 
-        return batch
+async def close_llm_client() -> None:
+    global _shared_client
+    with _shared_lock:
+        client, _shared_client = _shared_client, None
+    if client is not None:
+        await client.aclose()
 
 
 def _to_float(value: Any) -> Optional[float]:
@@ -0,0 +1,145 @@
+"""Compact prompts for batched item scoring.
+
+Items used to carry the whole receipt text as their "context", and the prompt
+serialized it once per item. A 30-item receipt therefore sent the receipt 30 times.
+PromptBuilder sends each distinct context once per prompt, trimmed to the lines that
+matter for the items in the chunk:
+  - the first header_lines lines (store name/address: what kind of shop this is)
+  - lines that mention a word from one of the chunk's item names
+It fits those into context_max_tokens, header first, then in receipt order. When a
+chunk mixes receipts (micro-batching), items point at their receipt by number and
+the budget is split between the receipts.
+
+Token counts use tiktoken when installed (the model's encoding), else ~4 chars/token.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import re
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+TokenCounter = Callable[[str], int]
+
+INSTRUCTIONS = (
+    "You are given a list of grocery or retail items. "
+    "Estimate the carbon emissions per item (kg CO2e). "
+    "Respond with JSON: {\"items\":[{\"id\":<the item's id>,\"item_name\":<str>,\"emissions_kg_co2e\":<number|null>}]}."
+)
+
+SYSTEM_PROMPT = (
+    "You are a sustainability analyst producing factual carbon footprint estimates. "
+    "Try your best to find the estimate for each item."
+    "If absolutely unsure even about the estimate, only then return a random number between 1.0 and 3.0 kg CO2e. "
+)
+
+_WORD_RE = re.compile(r"[a-z]{3,}")
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (~4 characters per token), used when tiktoken is unavailable."""
+    return len(text) // 4 + 1
+
+
+def make_token_counter(model: str) -> Tuple[TokenCounter, str]:
+    """(count_tokens, tokenizer name): tiktoken's encoding for model, else the 4-chars estimate."""
+    try:
+        import tiktoken
+
+        try:
+            encoding = tiktoken.encoding_for_model(model)
+        except KeyError:
+            encoding = tiktoken.get_encoding("o200k_base")
+        encoding.encode("warm up")   # loads the BPE ranks now (may need network once)
+    except Exception:
+        return estimate_tokens, "chars/4"
+    return (lambda text: len(encoding.encode(text, disallowed_special=()))), f"tiktoken:{encoding.name}"
+
+
+class PromptBuilder:
+    def __init__(
+        self,
+        model: str,
+        context_max_tokens: Optional[int] = None,
+        header_lines: int = 3,
+    ) -> None:
+        self.context_max_tokens = (
+            int(os.getenv("LLM_CONTEXT_MAX_TOKENS", "600")) if context_max_tokens is None else context_max_tokens
+        )
+        self.header_lines = header_lines
+        self.count_tokens, self.tokenizer = make_token_counter(model)
+
+    def item_tokens(self, entry: Dict[str, Any]) -> int:
+        """Prompt tokens one item adds, excluding its (shared) context."""
+        return self.count_tokens(json.dumps({"id": 0, "item_name": entry.get("item_name")}, ensure_ascii=False))
+
+    def context_tokens(self, context: Optional[str]) -> int:
+        """Prompt tokens a context can add at most (after trimming)."""
+        if not context:
+            return 0
+        return min(self.count_tokens(context), self.context_max_tokens)
+
+    def build(self, chunk: List[Dict[str, Any]]) -> Tuple[List[Dict[str, str]], int]:
+        """
+        Chat messages for a chunk of {"item_name", "context"} entries, and their token
+        count. Items are sent with "id" = their position in the chunk, for the model to
+        echo back.
+        """
+        contexts: List[str] = []
+        context_index: Dict[str, int] = {}
+        names_by_context: Dict[int, List[str]] = {}
+        items: List[Dict[str, Any]] = []
+        for position, entry in enumerate(chunk):
+            item: Dict[str, Any] = {"id": position, "item_name": entry["item_name"]}
+            context = (entry.get("context") or "").strip()
+            if context:
+                n = context_index.get(context)
+                if n is None:
+                    n = context_index[context] = len(contexts)
+                    contexts.append(context)
+                names_by_context.setdefault(n, []).append(entry["item_name"])
+                item["receipt"] = n + 1
+            items.append(item)
+        if len(contexts) <= 1:
+            for item in items:
+                item.pop("receipt", None)
+
+        user_prompt = INSTRUCTIONS
+        budget = self.context_max_tokens // len(contexts) if contexts else 0
+        for n, context in enumerate(contexts):
+            trimmed = self.trim_context(context, names_by_context[n], budget)
+            if not trimmed:
+                continue
+            label = "Receipt text" if len(contexts) == 1 else f"Receipt {n + 1} text"
+            user_prompt += f"\n{label} (relevant lines):\n{trimmed}"
+        user_prompt += "\nItems JSON:\n" + json.dumps(items, ensure_ascii=False)
+
+        messages = [
+            {"role": "system", "content": SYSTEM_PROMPT},
+            {"role": "user", "content": user_prompt},
+        ]
+        return messages, self.count_tokens(SYSTEM_PROMPT) + self.count_tokens(user_prompt)
+
+    def trim_context(self, context: str, item_names: List[str], budget: int) -> str:
+        """Header lines plus lines that mention an item word, in receipt order, within budget tokens."""
+        if budget <= 0:
+            return ""
+        words = {w for name in item_names for w in _WORD_RE.findall(name.lower())}
+        lines = [line.strip() for line in context.splitlines() if line.strip()]
+
+        header = set(range(min(self.header_lines, len(lines))))
+        relevant = [i for i, line in enumerate(lines) if i not in header and any(w in line.lower() for w in words)]
+
+        keep: List[int] = []
+        used = 0
+        for i in sorted(header) + relevant:
+            cost = self.count_tokens(lines[i]) + 1
+            if used + cost > budget:
+                continue
+            keep.append(i)
+            used += cost
+        return "\n".join(lines[i] for i in sorted(keep))
+
+
+__all__ = ["INSTRUCTIONS", "SYSTEM_PROMPT", "PromptBuilder", "estimate_tokens", "make_token_counter"]
@@ -0,0 +1,113 @@
+"""Cross-request micro-batching for LLM item scoring.
+
+At peak many small receipts arrive together, and each would make its own LLM call
+for 3-5 items. MicroBatcher collects the cache misses of concurrent receipts for up
+to window_ms, or until max_items distinct items are waiting. It then makes a single
+estimate call and hands every receipt its own results.
+
+Items are keyed by canonical name, so the same product from two receipts, or one
+that is already in flight, is only estimated once.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+EstimateFn = Callable[[Dict[str, Dict[str, Any]]], Awaitable[Dict[str, Dict[str, Any]]]]
+
+
+class MicroBatcher:
+    def __init__(self, estimate: EstimateFn, window_ms: float = 15.0, max_items: int = 40) -> None:
+        """estimate: key -> entry in, key -> result out (keys without a result are simply missing)."""
+        self.estimate = estimate
+        self.window = window_ms / 1000.0
+        self.max_items = max_items
+
+        self._pending: Dict[str, Dict[str, Any]] = {}
+        self._futures: Dict[str, asyncio.Future] = {}   # pending + in flight
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._tasks: set = set()
+
+        self.submitted = 0      # items asked for, across all receipts
+        self.deduplicated = 0   # of those, already pending or in flight
+        self.batches = 0
+        self.batched_items = 0
+        self.flushed_full = 0
+        self.errors = 0
+
+    async def submit(self, entries: Dict[str, Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+        """Results for this caller's keys, once the batch (or batches) holding them finishes."""
+        loop = asyncio.get_running_loop()
+        waiting: Dict[str, asyncio.Future] = {}
+        for key, entry in entries.items():
+            self.submitted += 1
+            fut = self._futures.get(key)
+            if fut is None:
+                fut = loop.create_future()
+                self._futures[key] = fut
+                self._pending[key] = entry
+            else:
+                self.deduplicated += 1
+            waiting[key] = fut
+
+            if len(self._pending) >= self.max_items:
+                self.flushed_full += 1
+                self._flush()
+        if self._pending and self._timer is None:
+            self._timer = loop.call_later(self.window, self._flush)
+
+        # shield: a cancelled receipt must not cancel results other receipts share
+        results = await asyncio.gather(*(asyncio.shield(f) for f in waiting.values()))
+        return {key: row for key, row in zip(waiting, results) if row is not None}
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "window_ms": round(self.window * 1000, 1),
+            "max_items": self.max_items,
+            "submitted": self.submitted,
+            "deduplicated": self.deduplicated,
+            "batches": self.batches,
+            "avg_batch_items": round(self.batched_items / self.batches, 2) if self.batches else 0.0,
+            "avg_fill": round(self.batched_items / (self.batches * self.max_items), 4) if self.batches else 0.0,
+            "flushed_full": self.flushed_full,
+            "errors": self.errors,
+        }
+
+    # ---- internals ----
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self._pending:
+            return
+        batch, self._pending = self._pending, {}
+        self.batches += 1
+        self.batched_items += len(batch)
+        task = asyncio.get_running_loop().create_task(self._run(batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch: Dict[str, Dict[str, Any]]) -> None:
+        t0 = time.perf_counter()
+        try:
+            results = await self.estimate(batch)
+        except BaseException as e:
+            self.errors += 1
+            for key in batch:
+                fut = self._futures.pop(key, None)
+                if fut is not None and not fut.done():
+                    fut.set_exception(e if isinstance(e, Exception) else RuntimeError("LLM batch cancelled"))
+            if not isinstance(e, Exception):
+                raise
+            return
+        for key in batch:
+            fut = self._futures.pop(key, None)
+            if fut is not None and not fut.done():
+                fut.set_result(results.get(key))
+        print(f"🧮 LLM batch: {len(batch)} items ({len(batch) / self.max_items:.0%} full) in {(time.perf_counter() - t0) * 1000:.0f} ms")
+
+
+__all__ = ["MicroBatcher"]
@@ -1,33 +1,213 @@
 from __future__ import annotations
 
-from typing import Any, Dict, List, Optional
+import asyncio
+import functools
+import time
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
 
 from backend.LLM_Score.clients.llm_client import LLMClient
+from backend.LLM_Score.services.batcher import MicroBatcher
+from backend.LLM_Score.services.emission_catalog import EmissionCatalog
+from backend.LLM_Score.services.emission_cache import EmissionCache, canonical_item_name
 
 
 class CarbonService:
-    """Minimal service that always uses the LLM client for estimates."""
+    """
+    Per-item estimates, cheapest source first:
+      1. EmissionCatalog: confident fuzzy matches against the offline emission-factor catalog
+      2. EmissionCache: items the LLM already estimated (by canonical name)
+      3. the LLM client, for whatever is left. A MicroBatcher lets concurrent receipts
+         share those calls.
+    The cache is SQLite: lookups run in a worker thread, and new estimates are written
+    behind, without holding up the receipt.
+    """
 
-    def __init__(self, llm_client: LLMClient) -> None:
+    def __init__(
+        self,
+        llm_client: LLMClient,
+        cache: Optional[EmissionCache] = None,
+        batcher: Optional[MicroBatcher] = None,
+        catalog: Optional[EmissionCatalog] = None,
+    ) -> None:
         if not llm_client or not llm_client.is_configured:
             raise RuntimeError("LLM client is not configured. Set OPENAI_API_KEY before calling the service.")
         self.llm_client = llm_client
+        self.cache = cache
+        self.batcher = batcher
+        self.catalog = catalog
+        self._llm_ms: Optional[float] = None   # moving average of one LLM round trip
 
     async def estimate_batch(
         self,
         items: List[Dict[str, Any]],
         fallback_context: Optional[str] = None,
     ) -> List[Dict[str, Any]]:
-        normalized: List[Dict[str, Optional[str]]] = []
-        for idx, item in enumerate(items, start=1):
-            name = item.get("name")
-            if not name:
-                raise ValueError(f"Item #{idx} is missing a 'name' field.")
-            normalized.append(
-                {
-                    "item_name": name,
-                    "context": item.get("context") or fallback_context,
-                }
+        normalized = _normalize_items(items, fallback_context)
+
+        if self.cache is None and self.batcher is None and self.catalog is None:
+            results = await self.llm_client.estimate_carbon_batch(normalized, shared_context=fallback_context)
+            return [
+                {"item_name": normalized[r["index"]]["item_name"], "emissions_kg_co2e": r["emissions_kg_co2e"]}
+                for r in results
+            ]
+
+        keys, known, pending = await self._resolve_known(normalized)
+
+        fresh: Dict[str, float] = {}
+        if pending:
+            estimate = self.batcher.submit if self.batcher is not None else self.estimate_pending
+            t0 = time.perf_counter()
+            rows = await estimate(pending)
+            self._record_llm_ms((time.perf_counter() - t0) * 1000)
+            fresh = {k: row["emissions_kg_co2e"] for k, row in rows.items()}
+            self._cache_put({k: row["emissions_kg_co2e"] for k, row in rows.items() if not row["fallback"]})
+
+        merged: List[Dict[str, Any]] = []
+        for i, (key, entry) in enumerate(zip(keys, normalized)):
+            emissions = known.get(i, fresh.get(key))
+            if emissions is None:
+                continue   # the LLM returned nothing usable for this item
+            merged.append({"item_name": entry["item_name"], "emissions_kg_co2e": emissions})
+        return merged
+
+    async def stream_batch(
+        self,
+        items: List[Dict[str, Any]],
+        fallback_context: Optional[str] = None,
+    ) -> AsyncIterator[Tuple[int, Dict[str, Any]]]:
+        """
+        (item index, {"item_name", "emissions_kg_co2e"}) for each item as soon as it is
+        known: catalog and cache hits first, then LLM rows while the model streams them.
+        Items the LLM returns nothing for are not yielded. Doesn't go through the
+        micro-batcher, which would hold every row until its whole batch is done.
+        """
+        normalized = _normalize_items(items, fallback_context)
+        keys, known, pending = await self._resolve_known(normalized)
+
+        for i, emissions in sorted(known.items()):
+            yield i, {"item_name": normalized[i]["item_name"], "emissions_kg_co2e": emissions}
+        if not pending:
+            return
+
+        indexes: Dict[str, List[int]] = {}
+        for i, key in enumerate(keys):
+            if i not in known:
+                indexes.setdefault(key, []).append(i)
+        pending_keys = list(pending)   # row["index"] points into this list
+        to_cache: Dict[str, float] = {}
+        t0 = time.perf_counter()
+        try:
+            async for row in self.llm_client.stream_carbon_batch(list(pending.values())):
+                if row["emissions_kg_co2e"] is None:
+                    continue
+                key = pending_keys[row["index"]]
+                if not row["fallback"]:
+                    to_cache[key] = row["emissions_kg_co2e"]
+                for i in indexes[key]:
+                    yield i, {"item_name": normalized[i]["item_name"], "emissions_kg_co2e": row["emissions_kg_co2e"]}
+            self._record_llm_ms((time.perf_counter() - t0) * 1000)
+        finally:
+            self._cache_put(to_cache)
+
+    async def _resolve_known(
+        self, normalized: List[Dict[str, Optional[str]]]
+    ) -> Tuple[List[str], Dict[int, float], Dict[str, Dict[str, Optional[str]]]]:
+        """
+        Canonical keys, then catalog and cache lookups. Returns (keys, item index ->
+        known emissions, pending key -> entry for the LLM) and logs the hit rates.
+        Catalog matches are per line, since they scale with the weight on the line.
+        """
+        keys = [canonical_item_name(entry["item_name"]) for entry in normalized]
+
+        local: Dict[int, float] = {}
+        catalog_ms = 0.0
+        if self.catalog is not None:
+            t0 = time.perf_counter()
+            for i, (key, entry) in enumerate(zip(keys, normalized)):
+                match = self.catalog.match(entry["item_name"], key=key)
+                if match is not None:
+                    local[i] = match.emissions_kg_co2e
+            catalog_ms = (time.perf_counter() - t0) * 1000
+
+        rest = [(i, key) for i, key in enumerate(keys) if i not in local]
+        cached: Dict[str, float] = {}
+        if self.cache is not None and rest:
+            cached = await asyncio.to_thread(self.cache.get_many, [key for _, key in rest])
+        known = dict(local)
+        known.update((i, cached[key]) for i, key in rest if key in cached)
+
+        # One LLM entry per distinct missing key (repeated lines are asked once).
+        pending: Dict[str, Dict[str, Optional[str]]] = {}
+        for i, key in rest:
+            if key not in cached and key not in pending:
+                pending[key] = normalized[i]
+
+        if self.catalog is not None:
+            matched = len(local)
+            # The receipt needed no LLM call thanks to the catalog: count one average round trip.
+            avoided = bool(local) and not pending
+            saved_ms = (self._llm_ms or 0.0) if avoided else 0.0
+            self.catalog.record(len(keys), matched, avoided, saved_ms)
+            print(
+                f"🌱 Emission catalog: {matched}/{len(keys)} items matched locally in {catalog_ms:.1f} ms"
+                + (f" (~{saved_ms:.0f} ms LLM call avoided)" if avoided else "")
             )
+        if self.cache is not None:
+            served = len(known) - len(local)
+            print(
+                f"🧮 Emission cache: {served}/{len(keys)} items cached, {len(pending)} sent to LLM "
+                f"(hit rate {self.cache.stats()['hit_rate']:.0%} overall)"
+            )
+        return keys, known, pending
+
+    def _cache_put(self, values: Dict[str, float]) -> None:
+        """Write LLM estimates to the cache in a worker thread, without waiting for it."""
+        if self.cache is None or not values:
+            return
+        future = asyncio.get_running_loop().run_in_executor(
+            None, functools.partial(self.cache.put_many, values, model=self.llm_client.model)
+        )
+        future.add_done_callback(_report_cache_error)
+
+    def _record_llm_ms(self, llm_ms: float) -> None:
+        self._llm_ms = llm_ms if self._llm_ms is None else 0.8 * self._llm_ms + 0.2 * llm_ms
+
+    async def estimate_pending(self, pending: Dict[str, Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+        """One LLM call for key -> entry; key -> {"emissions_kg_co2e", "fallback"} for the keys it answered."""
+        results = await self.llm_client.estimate_carbon_batch(list(pending.values()))
+        return _match_results(list(pending), results)
+
+
+def _report_cache_error(future: "asyncio.Future[None]") -> None:
+    if not future.cancelled() and future.exception() is not None:
+        print("Emission cache write failed (non-critical):", future.exception())
+
+
+def _normalize_items(items: List[Dict[str, Any]], fallback_context: Optional[str]) -> List[Dict[str, Optional[str]]]:
+    normalized: List[Dict[str, Optional[str]]] = []
+    for idx, item in enumerate(items, start=1):
+        name = item.get("name")
+        if not name:
+            raise ValueError(f"Item #{idx} is missing a 'name' field.")
+        normalized.append(
+            {
+                "item_name": name,
+                "context": item.get("context") or fallback_context,
+            }
+        )
+    return normalized
+
 
-        return await self.llm_client.estimate_carbon_batch(normalized, shared_context=fallback_context)
+def _match_results(keys: List[str], results: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    """
+    Map LLM results back to the requested keys by their "index", which the client sets
+    only for rows it matched by echoed id or item name. Keys without a row are left out.
+    "fallback" marks the client's random placeholder for an item the model didn't estimate.
+    """
+    rows: Dict[str, Dict[str, Any]] = {}
+    for entry in results:
+        i = entry.get("index")
+        if i is None or not 0 <= i < len(keys) or entry.get("emissions_kg_co2e") is None:
+            continue
+        rows.setdefault(keys[i], {"emissions_kg_co2e": entry["emissions_kg_co2e"], "fallback": bool(entry.get("fallback"))})
+    return rows
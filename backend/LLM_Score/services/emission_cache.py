@@ -0,0 +1,250 @@
+"""Persistent per-item emission cache, keyed by canonicalized item names.
+
+Receipt lines for the same product differ in case, OCR abbreviations, and the
+weight/price/quantity noise around the name ("ORG CHKN BRST 1.32 LB @ 4.99/LB").
+canonical_item_name() strips that down to one key per product, so staples are
+estimated by the LLM once and served from SQLite afterwards.
+
+Entries carry the model that produced them and a timestamp; they expire after the
+TTL, and the least recently used ones are evicted once the table passes max_entries.
+"""
+
+from __future__ import annotations
+
+import os
+import re
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# ----------------------------
+# Item-name canonicalization
+# ----------------------------
+
+# Common register/OCR abbreviations -> full words. Matched per token after cleanup.
+# Tokens that are also brand names or words of their own ("TOMS" of Maine, "POTS",
+# "CHIC") are left out: a wrong expansion puts unrelated products under one key.
+ABBREVIATIONS: Dict[str, str] = {
+    "org": "organic", "orgnc": "organic", "organ": "organic",
+    "chkn": "chicken", "chk": "chicken", "ckn": "chicken",
+    "bnls": "boneless", "bnlss": "boneless", "sknls": "skinless", "sknlss": "skinless",
+    "brst": "breast", "bst": "breast", "thg": "thigh", "thgh": "thigh", "drmstk": "drumstick",
+    "drumstic": "drumstick", "grnd": "ground", "bf": "beef", "stk": "steak",
+    "trky": "turkey", "prk": "pork", "slmn": "salmon",
+    "whl": "whole", "wht": "white", "brn": "brown", "blk": "black", "grn": "green",
+    "yel": "yellow",
+    "mlk": "milk", "yog": "yogurt", "ygrt": "yogurt", "chs": "cheese", "chz": "cheese", "bttr": "butter",
+    "btr": "butter", "crm": "cream", "eggs": "egg",
+    "veg": "vegetable", "vegs": "vegetable",
+    "bana": "banana", "bananas": "banana", "apls": "apple", "apples": "apple",
+    "avoc": "avocado", "avocados": "avocado", "spnch": "spinach", "lett": "lettuce", "oni": "onion",
+    "onions": "onion", "strwb": "strawberry", "strawberries": "strawberry", "blubry": "blueberry",
+    "blueberries": "blueberry",
+    "brd": "bread", "sdgh": "sourdough", "pst": "pasta", "rce": "rice", "crl": "cereal",
+    "bev": "beverage", "jce": "juice", "wtr": "water", "cof": "coffee", "cff": "coffee",
+    "frz": "frozen", "frzn": "frozen", "nat": "natural", "ntrl": "natural", "lg": "large",
+    "sm": "small", "med": "medium", "pk": "pack", "pkg": "pack", "ct": "count",
+}
+
+# Quantities, weights and prices that surround the name on a receipt line.
+_PRICE_RE = re.compile(r"\$?\s*\d+[.,]\d{2}\b(?:\s*/\s*(?:lb|kg|oz|ea))?", re.I)
+_WEIGHT_RE = re.compile(
+    r"\b\d+(?:[.,]\d+)?\s*(?:lbs?|kg|g|gm|gr|oz|fl\s*oz|ml|l|ltr|gal|ct|pk|pack|count|ea|each)\b", re.I
+)
+_QTY_RE = re.compile(r"\b\d+\s*(?:@|x)\s*|\s*@\s*", re.I)
+_CODE_RE = re.compile(r"\b\d{4,}\b")                      # PLU / SKU / UPC numbers
+_TOKEN_RE = re.compile(r"\d+(?:\.\d+)?%|[a-z0-9]+")        # "2%" stays: 2% and 1% milk differ
+
+
+def canonical_item_name(name: str) -> str:
+    """
+    Cache key for a receipt item name: lowercase words with register abbreviations
+    expanded and prices, weights, quantities and item codes removed. Percentages
+    ("2%" milk fat) are kept, other bare numbers are dropped. A trailing
+    single letter is kept: receipt names are cut at a fixed width, so "CKN T" is
+    the start of a word ("THIGH"), not noise.
+    Falls back to the lowercased, whitespace-collapsed name if nothing survives.
+    """
+    stripped = _WEIGHT_RE.sub(" ", name or "")
+    stripped = _PRICE_RE.sub(" ", stripped)
+    stripped = _QTY_RE.sub(" ", stripped)
+    stripped = _CODE_RE.sub(" ", stripped)
+
+    words = []
+    for token in _TOKEN_RE.findall(stripped.lower().replace(",", ".")):
+        if token.isdigit():
+            continue
+        words.append(ABBREVIATIONS.get(token, token))
+    return " ".join(words) or " ".join((name or "").lower().split())
+
+# ----------------------------
+# SQLite store (TTL + LRU)
+# ----------------------------
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS emission_cache (
+    key              TEXT PRIMARY KEY,
+    emissions_kg_co2e REAL NOT NULL,
+    model            TEXT,
+    created          REAL NOT NULL,
+    last_used        REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS emission_cache_last_used ON emission_cache (last_used);
+"""
+
+# SQLite's default host-parameter limit is 999; lookups are chunked below it.
+_IN_CHUNK = 500
+
+
+class EmissionCache:
+    def __init__(
+        self,
+        path: Optional[str] = "data/emission_cache.db",
+        max_entries: int = 50000,
+        ttl_seconds: float = 90 * 24 * 3600,
+    ) -> None:
+        """path=None keeps the cache in memory (per process)."""
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+
+        self._lock = threading.Lock()
+        if path:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path or ":memory:", check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        self._entries = self._conn.execute("SELECT COUNT(*) FROM emission_cache").fetchone()[0]
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    # ---- public API ----
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, float]:
+        """key -> emissions for the keys that are cached and fresh; refreshes their LRU stamp."""
+        wanted = list(dict.fromkeys(keys))
+        if not wanted:
+            return {}
+        now = time.time()
+        found: Dict[str, float] = {}
+        expired: List[str] = []
+        with self._lock:
+            for i in range(0, len(wanted), _IN_CHUNK):
+                part = wanted[i:i + _IN_CHUNK]
+                rows = self._conn.execute(
+                    f"SELECT key, emissions_kg_co2e, created FROM emission_cache "
+                    f"WHERE key IN ({', '.join('?' for _ in part)})",
+                    part,
+                ).fetchall()
+                for key, emissions, created in rows:
+                    if now - created > self.ttl_seconds:
+                        expired.append(key)
+                    else:
+                        found[key] = emissions
+
+            self._conn.execute("BEGIN")
+            try:
+                self._conn.executemany(
+                    "UPDATE emission_cache SET last_used = ? WHERE key = ?", [(now, k) for k in found]
+                )
+                self._conn.executemany("DELETE FROM emission_cache WHERE key = ?", [(k,) for k in expired])
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+            self._entries -= len(expired)
+            self.evictions += len(expired)
+            self.hits += len(found)
+            self.misses += len(wanted) - len(found)
+        return found
+
+    def put_many(self, values: Dict[str, float], model: Optional[str] = None) -> None:
+        if not values:
+            return
+        now = time.time()
+        rows = [(k, float(v), model, now, now) for k, v in values.items()]
+        keys = list(values)
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                existing = 0
+                for i in range(0, len(keys), _IN_CHUNK):
+                    part = keys[i:i + _IN_CHUNK]
+                    existing += self._conn.execute(
+                        f"SELECT COUNT(*) FROM emission_cache WHERE key IN ({', '.join('?' for _ in part)})", part
+                    ).fetchone()[0]
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO emission_cache (key, emissions_kg_co2e, model, created, last_used) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    rows,
+                )
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+            self._entries += len(rows) - existing
+            if self._entries > self.max_entries:
+                self._evict()
+
+    def lookup(self, key: str) -> Optional[Tuple[float, Optional[str], float]]:
+        """(emissions, model, created) for one key, without touching stats or LRU order."""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT emissions_kg_co2e, model, created FROM emission_cache WHERE key = ?", (key,)
+            ).fetchone()
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "entries": self._entries,
+                "evictions": self.evictions,
+            }
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    # ---- eviction (lock held) ----
+
+    def _evict(self) -> None:
+        """Drop expired rows, then the least recently used ones, down to 90% of the limit."""
+        cutoff = time.time() - self.ttl_seconds
+        expired = self._conn.execute("DELETE FROM emission_cache WHERE created < ?", (cutoff,)).rowcount
+        self._entries -= expired
+        target = int(self.max_entries * 0.9)
+        lru = self._conn.execute(
+            "DELETE FROM emission_cache WHERE key IN "
+            "(SELECT key FROM emission_cache ORDER BY last_used LIMIT ?)",
+            (max(0, self._entries - target),),
+        ).rowcount
+        self._entries -= lru
+        self.evictions += expired + lru
+
+
+_cache: Optional[EmissionCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_emission_cache() -> EmissionCache:
+    """The process-wide cache, opened on first use. EMISSION_CACHE_PATH="" keeps it in memory."""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = EmissionCache(
+                    path=os.getenv("EMISSION_CACHE_PATH", "data/emission_cache.db") or None,
+                    max_entries=int(os.getenv("EMISSION_CACHE_MAX_ENTRIES", "50000")),
+                    ttl_seconds=float(os.getenv("EMISSION_CACHE_TTL_DAYS", "90")) * 24 * 3600,
+                )
+    return _cache
+
+
+__all__ = ["ABBREVIATIONS", "EmissionCache", "canonical_item_name", "get_emission_cache"]
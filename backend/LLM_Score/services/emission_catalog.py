@@ -0,0 +1,196 @@
+"""Offline emission-factor catalog with a trigram fuzzy matcher.
+
+The catalog (data/emission_factors.json) maps product categories to kg CO2e per kg
+and a typical retail unit. Each category lists aliases. Aliases and item names go
+through canonical_item_name(), so "ORG CHKN BRST" meets "chicken breast". They are
+then compared by padded word trigrams (" ch", "chi", ..., "en ").
+
+An alias matches with score = the Jaccard similarity of its trigrams and the item
+name's, after dropping words that don't change what the product is ("organic",
+"large", "boneless"...). Words of the item that the alias doesn't cover lower the
+score, so "beef broth" and "coffee creamer" are not beef or coffee. Padding keeps
+words whole: "eggplant" shares only " eg" and "egg" with "egg".
+When several aliases reach the bar, the longest (most specific) alias wins, so
+"oat milk" beats "milk". Items below min_score are left to the LLM.
+
+Emissions are kg_co2e_per_kg times the weight or volume printed on the receipt line
+("GRND BF 5 LB"), times a leading quantity ("2 @", "3 X"). Without one, a typical
+retail unit (typical_kg) is assumed. Lines sized in counts or packs ("12 CT", "6 PK")
+can't be converted to kg and are left to the LLM.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import re
+import threading
+from collections import defaultdict
+from pathlib import Path
+from typing import Any, Dict, List, NamedTuple, Optional, Set, Tuple
+
+from backend.LLM_Score.services.emission_cache import canonical_item_name
+
+DEFAULT_CATALOG_PATH = Path(__file__).resolve().parents[1] / "data" / "emission_factors.json"
+
+# Canonical words that qualify a product without changing its category (as do
+# percentages: "2%" milk is still milk).
+NEUTRAL_WORDS = frozenset({
+    "organic", "natural", "fresh", "premium", "large", "small", "medium", "jumbo", "frozen",
+    "boneless", "skinless", "raw", "pack", "count", "value", "family",
+})
+
+
+# kg per unit; volumes count as kg of water, close enough for drinks and dairy.
+UNIT_KG = {
+    "lb": 0.4536, "lbs": 0.4536, "kg": 1.0, "g": 0.001, "gm": 0.001, "gr": 0.001, "oz": 0.02835,
+    "floz": 0.02957, "ml": 0.001, "l": 1.0, "ltr": 1.0, "gal": 3.785,
+}
+_AMOUNT_RE = re.compile(r"(?<![\d.,/])(\d+(?:[.,]\d+)?)\s*(lbs?|kg|gm?|gr|fl\s*oz|oz|ml|ltr|l|gal)\b", re.I)
+_MULTIPLIER_RE = re.compile(r"(?<![\d.,/])(\d+)\s*(?:@|x\b)", re.I)
+_COUNT_RE = re.compile(r"\b\d+\s*(?:ct|pk|pack|count|ea|each|dz|doz|dozen)\b", re.I)
+
+
+class CatalogMatch(NamedTuple):
+    category: str
+    alias: str
+    score: float
+    emissions_kg_co2e: float
+    weight_kg: float
+
+
+def line_weight_kg(name: str, typical_kg: float) -> Optional[float]:
+    """
+    kg of product on a receipt line: its printed weight/volume, else typical_kg, times
+    a leading quantity. None when the line is sized in counts or packs instead.
+    """
+    amount = _AMOUNT_RE.search(name or "")
+    if amount is None and _COUNT_RE.search(name or ""):
+        return None
+    weight = typical_kg
+    if amount is not None:
+        unit = re.sub(r"\s+", "", amount.group(2).lower())
+        weight = float(amount.group(1).replace(",", ".")) * UNIT_KG[unit]
+    multiplier = _MULTIPLIER_RE.search(name or "")
+    if multiplier is not None and (amount is None or multiplier.start() != amount.start()):
+        weight *= int(multiplier.group(1))
+    return weight if weight > 0 else None
+
+
+def trigrams(text: str) -> Set[str]:
+    """Padded trigrams of each word: "eggs" -> {" eg", "egg", "ggs", "gs "}."""
+    grams: Set[str] = set()
+    for word in text.split():
+        padded = f" {word} "
+        for i in range(len(padded) - 2):
+            grams.add(padded[i:i + 3])
+    return grams
+
+
+class EmissionCatalog:
+    def __init__(self, categories: List[Dict[str, Any]], min_score: float = 0.8) -> None:
+        self.min_score = min_score
+        self._aliases: List[tuple] = []        # (alias, category, kg_co2e_per_kg, typical_kg, trigram count)
+        self._index: Dict[str, List[int]] = defaultdict(list)
+        seen: Set[str] = set()
+        for cat in categories:
+            per_kg = float(cat["kg_co2e_per_kg"])
+            typical_kg = float(cat.get("typical_kg", 1.0))
+            for alias in cat.get("aliases") or [cat["category"]]:
+                key = canonical_item_name(alias)
+                if not key or key in seen:
+                    continue
+                seen.add(key)
+                grams = trigrams(key)
+                alias_id = len(self._aliases)
+                self._aliases.append((key, cat["category"], per_kg, typical_kg, len(grams)))
+                for g in grams:
+                    self._index[g].append(alias_id)
+
+        self._lock = threading.Lock()
+        self.lookups = 0
+        self.hits = 0
+        self.llm_calls_avoided = 0
+        self.saved_ms = 0.0
+
+    @classmethod
+    def load(cls, path: Optional[str] = None, min_score: float = 0.8) -> "EmissionCatalog":
+        with open(path or DEFAULT_CATALOG_PATH, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        return cls(data.get("categories", []), min_score=min_score)
+
+    def __len__(self) -> int:
+        return len(self._aliases)
+
+    def match(self, name: str, key: Optional[str] = None) -> Optional[CatalogMatch]:
+        """
+        Best alias for an item name, if it reaches min_score, with the emissions of the
+        amount on the line. key is the name's canonical_item_name(), when already known.
+        """
+        key = key if key is not None else canonical_item_name(name)
+        query = trigrams(" ".join(w for w in key.split() if w not in NEUTRAL_WORDS and not w.endswith("%")))
+        if not query:
+            return None
+        shared: Dict[int, int] = defaultdict(int)
+        for g in query:
+            for alias_id in self._index.get(g, ()):
+                shared[alias_id] += 1
+
+        best: Optional[Tuple[Tuple[float, int], int]] = None
+        for alias_id, count in shared.items():
+            n_grams = self._aliases[alias_id][-1]
+            score = count / (n_grams + len(query) - count)
+            if score < self.min_score:
+                continue
+            rank = (score, len(self._aliases[alias_id][0]))
+            if best is None or rank > best[0]:
+                best = (rank, alias_id)
+        if best is None:
+            return None
+
+        alias, category, per_kg, typical_kg, _ = self._aliases[best[1]]
+        weight_kg = line_weight_kg(name, typical_kg)
+        if weight_kg is None:
+            return None
+        return CatalogMatch(category, alias, round(best[0][0], 3), round(per_kg * weight_kg, 2), round(weight_kg, 3))
+
+    def record(self, lookups: int, hits: int, llm_call_avoided: bool, saved_ms: float) -> None:
+        with self._lock:
+            self.lookups += lookups
+            self.hits += hits
+            self.llm_calls_avoided += int(llm_call_avoided)
+            self.saved_ms += saved_ms
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "aliases": len(self._aliases),
+                "min_score": self.min_score,
+                "lookups": self.lookups,
+                "hits": self.hits,
+                "hit_rate": round(self.hits / self.lookups, 4) if self.lookups else 0.0,
+                "llm_calls_avoided": self.llm_calls_avoided,
+                "est_llm_ms_saved": round(self.saved_ms, 1),
+            }
+
+
+_catalog: Optional[EmissionCatalog] = None
+_catalog_lock = threading.Lock()
+
+
+def get_emission_catalog() -> Optional[EmissionCatalog]:
+    """The process-wide catalog, loaded on first use. EMISSION_CATALOG_PATH="" disables it."""
+    global _catalog
+    path = os.getenv("EMISSION_CATALOG_PATH", str(DEFAULT_CATALOG_PATH))
+    if not path:
+        return None
+    if _catalog is None:
+        with _catalog_lock:
+            if _catalog is None:
+                _catalog = EmissionCatalog.load(
+                    path, min_score=float(os.getenv("EMISSION_CATALOG_MIN_SCORE", "0.8"))
+                )
+    return _catalog
+
+
+__all__ = ["CatalogMatch", "EmissionCatalog", "get_emission_catalog", "line_weight_kg", "trigrams"]
@@ -0,0 +1,210 @@
+# backend/bench_parsers.py
+# Micro-benchmarks for the OCR text parsers in ocr.py, on a seeded synthetic corpus that
+# looks like Vision output: long receipts with noisy/split amounts, multi-page energy
+# bills, Uber/Lyft ride screens. No network, no OCR; parsers only.
+#
+#   python bench_parsers.py                    # run and print a table
+#   python bench_parsers.py --baseline         # compare with bench_baseline.json; exit 1 on regression
+#   python bench_parsers.py --save-baseline    # re-record bench_baseline.json
+#
+# Per parser: docs/s, MB/s (of input text), p50 / p99 latency per document.
+# bench_baseline.json is committed, recorded with the default --seed/--docs. Timings are
+# machine-specific: on another machine, record a baseline there first (on the base
+# branch), then compare the change against it. Both flags also take a path.
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import time
+from typing import Callable, Dict, List, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+os.environ.setdefault("OCR_CACHE_DIR", "")   # importing ocr must not create a cache dir
+
+import ocr  # noqa: E402
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "bench_baseline.json")
+
+# ----------------------------
+# Synthetic corpus
+# ----------------------------
+
+STORES = ["TRADER JOE'S", "WHOLE FOODS MARKET", "H-E-B", "Safeway", "COSTCO WHOLESALE", "Kroger", "Stop & Shop"]
+PRODUCTS = ["BANANAS", "ORG WHOLE MILK", "CHKN BRST BNLS", "AVOCADO HASS", "SOURDOUGH LOAF", "GREEK YOGURT",
+            "BABY SPINACH", "EGGS LG 12CT", "OLIVE OIL XV", "COFFEE BEANS", "RICE BASMATI", "TOFU FIRM",
+            "CHEDDAR SHARP", "APPLES GALA", "PASTA PENNE", "TOMATO SAUCE", "ALMOND BUTTER", "OAT MILK"]
+UTILITIES = ["Dominion Energy", "Pacific Gas and Electric Company", "Duke Energy", "ConEd", "Eversource"]
+
+
+def _amount(r: random.Random) -> str:
+    value = f"{r.randint(0, 59)}.{r.randint(0, 99):02d}"
+    noise = r.random()
+    if noise < 0.15:
+        return value.replace(".", " ")          # "3 49": OCR lost the decimal point
+    if noise < 0.25:
+        return value.replace(".", ",")
+    if noise < 0.35:
+        return "$" + value
+    if noise < 0.40:
+        return "$ " + value.replace(".", " ")
+    return value
+
+
+def gen_receipt(r: random.Random, n_items: int) -> str:
+    lines = [r.choice(STORES), f"{r.randint(100, 9999)} Main St", f"({r.randint(200, 999)}) {r.randint(200, 999)}-{r.randint(1000, 9999)}"]
+    for _ in range(n_items):
+        name = r.choice(PRODUCTS)
+        k = r.random()
+        if k < 0.15:
+            lines.append(f"{r.randint(2, 5)} @ {_amount(r)}")
+            lines.append(f"{name} {_amount(r)}")
+        elif k < 0.30:
+            lines.append(name)                      # name and price on separate lines
+            lines.append(_amount(r))
+        elif k < 0.35:
+            lines.append(f"{name}-")                # hyphenated line break
+            lines.append(f"CONT {_amount(r)} F")
+        else:
+            lines.append(f"{name}  {_amount(r)} {r.choice(['F', 'N', 'T', ''])}".rstrip())
+    lines += [f"SUBTOTAL {_amount(r)}", f"TAX {_amount(r)}", f"TOTAL {_amount(r)}",
+              f"VISA ************{r.randint(1000, 9999)}", "THANK YOU FOR SHOPPING"]
+    return "\n".join(lines)
+
+
+def gen_energy_bill(r: random.Random, n_pages: int) -> str:
+    m1, m2 = r.randint(1, 11), r.randint(1, 28)
+    page1 = [
+        r.choice(UTILITIES), "Account Number 1234-5678-90", "Service Address:",
+        f"{r.randint(1, 9999)} Oak Ave Apt {r.randint(1, 40)}", f"Springfield, IL {r.randint(10000, 99999)}",
+        f"Billing period: {m1:02d}/{m2:02d}/2024 - {m1 + 1:02d}/{m2:02d}/2024",
+        f"Total usage {r.randint(200, 1800):,} kWh",
+        f"On-Peak {r.randint(50, 400)} kWh", f"Off-Peak {r.randint(100, 900)} kWh",
+        f"Supplier: {r.choice(['Green Mountain Energy', 'Default Service', 'Constellation'])}",
+        f"Plan: {r.choice(['Pollution Free 100% wind', 'Fixed 12 months', 'Standard Offer'])}",
+        f"Your share {r.randint(10, 90)}%", f"T&D losses {r.randint(3, 9)}%",
+    ]
+    pages = ["\n".join(page1)]
+    for p in range(1, n_pages):
+        rows = [f"Usage history page {p + 1}"]
+        rows += [f"{mon} 2023   {r.randint(200, 1500)} kWh   ${r.randint(40, 300)}.{r.randint(0, 99):02d}"
+                 for mon in ("Jan", "Feb", "Mar", "Apr", "May", "Jun", "Jul", "Aug", "Sep", "Oct", "Nov", "Dec")]
+        rows += ["Rates and regulations are available at the company website."] * r.randint(5, 20)
+        pages.append("\n".join(rows))
+    return "\n\f".join(pages)
+
+
+def gen_ride(r: random.Random) -> str:
+    provider = r.choice(["Uber", "Lyft"])
+    h = r.randint(1, 11)
+    lines = [
+        f"Thanks for riding with {provider}", f"Jun {r.randint(1, 28)}, 2025",
+        f"{r.randint(1, 60)}.{r.randint(0, 9)} mi   {r.randint(3, 90)} min",
+        f"{h}:{r.randint(10, 29)} PM", f"{r.randint(100, 999)} Market St", "Pickup",
+        f"{h}:{r.randint(30, 59)} PM", f"{r.randint(100, 999)} Mission St", "Drop-off",
+        f"Total ${r.randint(5, 80)}.{r.randint(0, 99):02d}", "Payments  Visa ••••1234",
+    ]
+    return "\n".join(lines)
+
+
+def build_corpus(seed: int, n: int) -> Dict[str, List[str]]:
+    r = random.Random(seed)
+    receipts = [ocr.basic_clean(gen_receipt(r, r.choice([8, 20, 40, 120]))) for _ in range(n)]
+    bills = [ocr.basic_clean(gen_energy_bill(r, r.choice([1, 2, 4, 12]))) for _ in range(n)]
+    rides = [gen_ride(r) for _ in range(n)]
+    return {"receipt": receipts, "energy": bills, "transport": rides}
+
+# ----------------------------
+# Runner
+# ----------------------------
+
+PARSERS: List[Tuple[str, str, Callable[[str], object]]] = [
+    ("extract_items_structured", "receipt", ocr.extract_items_structured),
+    ("extract_store_name", "receipt", ocr.extract_store_name),
+    ("extract_receipt_items", "receipt", ocr.extract_receipt_items),
+    ("extract_energy_structured", "energy", ocr.extract_energy_structured),
+    ("parse_transport_text", "transport", ocr.parse_transport_text),
+]
+
+
+def bench(fn: Callable[[str], object], docs: List[str], repeat: int) -> Dict[str, float]:
+    for d in docs[: max(1, len(docs) // 10)]:   # warm-up (regex caches, allocator)
+        fn(d)
+    latencies: List[float] = []
+    for _ in range(repeat):
+        for d in docs:
+            t0 = time.perf_counter()
+            fn(d)
+            latencies.append(time.perf_counter() - t0)
+    total = sum(latencies)
+    size = sum(len(d.encode("utf-8")) for d in docs) * repeat
+    latencies.sort()
+    return {
+        "docs_per_s": round(len(latencies) / total, 1),
+        "mb_per_s": round(size / total / 1e6, 3),
+        "p50_us": round(statistics.median(latencies) * 1e6, 1),
+        "p99_us": round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1e6, 1),
+    }
+
+
+def run(seed: int, n: int, repeat: int) -> Dict[str, Dict[str, float]]:
+    corpus = build_corpus(seed, n)
+    return {name: bench(fn, corpus[kind], repeat) for name, kind, fn in PARSERS}
+
+
+def compare(results: Dict[str, Dict[str, float]], baseline: Dict[str, Dict[str, float]], tolerance: float) -> List[str]:
+    """Parsers whose throughput dropped or p99 grew by more than `tolerance` (fraction)."""
+    regressions = []
+    for name, cur in results.items():
+        base = baseline.get(name)
+        if not base:
+            continue
+        if cur["docs_per_s"] < base["docs_per_s"] * (1 - tolerance):
+            regressions.append(f"{name}: docs/s {base['docs_per_s']} -> {cur['docs_per_s']}")
+        if cur["p99_us"] > base["p99_us"] * (1 + tolerance):
+            regressions.append(f"{name}: p99 {base['p99_us']}us -> {cur['p99_us']}us")
+    return regressions
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="Benchmark the OCR text parsers on a synthetic corpus")
+    ap.add_argument("--seed", type=int, default=1234)
+    ap.add_argument("--docs", type=int, default=300, help="documents per corpus")
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--baseline", nargs="?", const=BASELINE_PATH, help="baseline JSON to compare against")
+    ap.add_argument("--save-baseline", nargs="?", const=BASELINE_PATH, help="write results as a baseline JSON")
+    ap.add_argument("--tolerance", type=float, default=0.2, help="allowed slowdown before flagging (0.2 = 20%%)")
+    args = ap.parse_args()
+
+    results = run(args.seed, args.docs, args.repeat)
+
+    print(f"{'parser':<28}{'docs/s':>12}{'MB/s':>10}{'p50 us':>10}{'p99 us':>10}")
+    for name, res in results.items():
+        print(f"{name:<28}{res['docs_per_s']:>12}{res['mb_per_s']:>10}{res['p50_us']:>10}{res['p99_us']:>10}")
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w", encoding="utf-8") as f:
+            json.dump({"seed": args.seed, "docs": args.docs, "results": results}, f, indent=2)
+        print(f"✅ Baseline saved to {args.save_baseline}")
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            base = json.load(f)
+        if (base.get("seed"), base.get("docs")) != (args.seed, args.docs):
+            print("⚠️ baseline was recorded with a different --seed/--docs; numbers are not comparable")
+        regressions = compare(results, base.get("results", {}), args.tolerance)
+        if regressions:
+            print("❌ Regressions:")
+            for line in regressions:
+                print("  ", line)
+            return 1
+        print("✅ No regressions vs baseline")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,15 +1,24 @@
-import json
 import os
 from datetime import date
 import uuid
 
+from storage import open_storage
 
+# Storage engine: "sqlite" (default) or "json" (original data/*.json files)
+STORAGE_ENGINE = os.getenv("ECOSCORE_STORAGE", "sqlite")
+DB_PATH = os.getenv("ECOSCORE_DB_PATH", "data/ecoscore.db")
 
+_storage = None
+
+def get_storage():
+    """Open the configured storage engine once (migrating data/*.json on first use)."""
+    global _storage
+    if _storage is None:
+        _storage = open_storage(STORAGE_ENGINE, DB_PATH)
+    return _storage
 
-def add_receipt(user,items, store=None):
-    RECEIPTS_PATH = "data/receipts.json"
-    
 
+def add_receipt(user,items, store=None):
     # Build one receipt object
     new_receipt = {
         "entry_id": str(uuid.uuid4()),          # unique id
@@ -18,47 +27,12 @@ def add_receipt(user,items, store=None):
         "store": store or "Unknown Store"
     }
 
-    data = []
-
-    # If file exists, load it (expecting a JSON array)
-    if os.path.exists(RECEIPTS_PATH):
-        with open(RECEIPTS_PATH, "r", encoding="utf-8") as f:
-            content = f.read().strip()
-            if content:
-                data = json.loads(content)
-
-    # Find existing user entry if present
-    
-    user_entry = None
-    for entry in data:
-        if entry.get("user") == user:
-            user_entry = entry
-            break
-
-    # If user not present, create their structure
-    if user_entry is None:
-        user_entry = {
-            "user": user,
-            "receipts": []
-        }
-        data.append(user_entry)
-
-    # Append the new receipt to this user's receipts
-    user_entry["receipts"].append(new_receipt)
-
-    # Save back to Receipts.json
-    with open(RECEIPTS_PATH, "w", encoding="utf-8") as f:
-        json.dump(data, f, indent=2)
+    get_storage().insert("receipts", user, new_receipt)
 
     print("✅ Added shopping receipt for", user)
 
 
 def add_energy(user,bill):
-    PATH = "data/energy.json"
-
-    
-
-    # Build one receipt object
     new_entry = {
         "entry_id": str(uuid.uuid4()),          # unique id
         "date": date.today().isoformat(),         # e.g. "2025-11-08"
@@ -69,46 +43,11 @@ def add_energy(user,bill):
         "points": bill['points']
     }
 
-    data = []
-
-    # If file exists, load it (expecting a JSON array)
-    if os.path.exists(PATH):
-        with open(PATH, "r", encoding="utf-8") as f:
-            content = f.read().strip()
-            if content:
-                data = json.loads(content)
-
-    # Find existing user entry if present
-    
-    user_entry = None
-    for entry in data:
-        if entry.get("user") == user:
-            user_entry = entry
-            break
-
-    # If user not present, create their structure
-    if user_entry is None:
-        user_entry = {
-            "user": user,
-            "energy_bills": []
-        }
-        data.append(user_entry)
-
-    # Append the new receipt to this user's receipts
-    user_entry["energy_bills"].append(new_entry)
-
-    # Save back to Receipts.json
-    with open(PATH, "w", encoding="utf-8") as f:
-        json.dump(data, f, indent=2)
+    get_storage().insert("energy", user, new_entry)
 
     print("✅ Added energy receipt for", user)
 
 def add_rides(user,bill):
-    PATH = "data/transport.json"
-
-    
-
-    # Build one receipt object
     new_entry = {
         "entry_id": str(uuid.uuid4()),          # unique id
         "date": date.today().isoformat(),         # e.g. "2025-11-08"
@@ -119,39 +58,31 @@ def add_rides(user,bill):
         "points": bill['points']
     }
 
-    data = []
-
-    # If file exists, load it (expecting a JSON array)
-    if os.path.exists(PATH):
-        with open(PATH, "r", encoding="utf-8") as f:
-            content = f.read().strip()
-            if content:
-                data = json.loads(content)
-
-    # Find existing user entry if present
-    
-    user_entry = None
-    for entry in data:
-        if entry.get("user") == user:
-            user_entry = entry
-            break
-
-    # If user not present, create their structure
-    if user_entry is None:
-        user_entry = {
-            "user": user,
-            "rides": []
-        }
-        data.append(user_entry)
+    get_storage().insert("rides", user, new_entry)
 
-    # Append the new receipt to this user's receipts
-    user_entry["rides"].append(new_entry)
+    print("✅ Added rides for", user)
 
-    # Save back to Receipts.json
-    with open(PATH, "w", encoding="utf-8") as f:
-        json.dump(data, f, indent=2)
 
-    print("✅ Added rides for", user)
+def transaction():
+    """Group several add_* calls into one commit (no-op for the JSON engine)."""
+    return get_storage().transaction()
+
+def savepoint():
+    """Inside transaction(): add_* calls in the block are undone together if it raises."""
+    return get_storage().savepoint()
+
+
+# -------- Reads (used by /summary) --------
+# The JSON engine raises FileNotFoundError when its file is missing.
+
+def get_receipts(user):
+    return get_storage().list_entries("receipts", user)
+
+def get_energy_bills(user):
+    return get_storage().list_entries("energy", user)
+
+def get_rides(user):
+    return get_storage().list_entries("rides", user)
 
 if __name__ == "__main__":
     user="Aashnna Soni"
@@ -0,0 +1,69 @@
+# backend/keyword_prefilter.py
+# Literal keyword prefilter for the large case-insensitive alternation regexes in ocr.py
+# (BAD_LINE_RE, STORE_HINT_RE, UTILITY_NAME_HINT_RE).
+#
+#   - Each regex gets a keyword family: every match of the regex contains at least one of
+#     its keywords, so a line without any of them can't match and the regex is skipped.
+#     Keywords are necessary, not sufficient: candidate lines are confirmed by the regex.
+#   - One scan tags a line with all of its families at once (a pyahocorasick automaton when
+#     installed; otherwise one plain literal alternation per family, which is still far
+#     cheaper than the re.I regexes).
+#   - Keywords are matched against line.lower(). That equals re.I case folding only for
+#     ASCII, so non-ASCII lines get every family and always go to the regex.
+#
+# tests/test_keyword_prefilter.py checks both implementations against the regexes.
+
+from __future__ import annotations
+
+import re
+from typing import Dict, Iterable
+
+
+class KeywordPrefilter:
+    def __init__(self, families: Dict[int, Iterable[str]]) -> None:
+        """families: bit flag -> lowercase literal keywords."""
+        self.families = {flag: tuple(k.lower() for k in kws) for flag, kws in families.items()}
+        self.all_flags = 0
+        for flag in self.families:
+            self.all_flags |= flag
+
+        self._automaton = None
+        self._family_res = None
+        try:
+            import ahocorasick
+        except Exception:
+            ahocorasick = None
+
+        if ahocorasick is not None:
+            masks: Dict[str, int] = {}
+            for flag, kws in self.families.items():
+                for k in kws:
+                    masks[k] = masks.get(k, 0) | flag
+            automaton = ahocorasick.Automaton()
+            for k, mask in masks.items():
+                automaton.add_word(k, mask)
+            automaton.make_automaton()
+            self._automaton = automaton
+        else:
+            self._family_res = [
+                (flag, re.compile("|".join(re.escape(k) for k in sorted(kws, key=len, reverse=True))))
+                for flag, kws in self.families.items()
+            ]
+
+    def tags(self, line: str) -> int:
+        """Bitwise OR of the families whose keywords occur in line."""
+        if not line.isascii():
+            return self.all_flags
+        low = line.lower()
+        found = 0
+        if self._automaton is not None:
+            for _, mask in self._automaton.iter(low):
+                found |= mask
+                if found == self.all_flags:
+                    break
+            return found
+        for flag, family_re in self._family_res:
+            if family_re.search(low):
+                found |= flag
+        return found
+
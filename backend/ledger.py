@@ -0,0 +1,170 @@
+# backend/ledger.py
+# Append-only points ledger.
+#   - Each entry is written as one JSON line to data/points.jsonl, so adding
+#     a point costs O(1) instead of rewriting the whole history.
+#   - Torn / partial lines (e.g. a crash mid-write) are skipped on load and
+#     dropped by compaction.
+#   - The legacy data/points.json (one big JSON array) is imported once, the
+#     first time the ledger file does not exist yet.
+
+from __future__ import annotations
+
+import json
+import os
+import threading
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+
+
+class PointsLedger:
+    """JSONL-backed, append-only store for points entries."""
+
+    def __init__(
+        self,
+        path: str = "data/points.jsonl",
+        legacy_path: Optional[str] = "data/points.json",
+        compact_every: int = 5000,
+    ) -> None:
+        self.path = path
+        self.legacy_path = legacy_path
+        self.compact_every = compact_every
+        self._lock = threading.RLock()
+        self._appends_since_compact = 0
+        self._bad_lines = 0
+        self._buffer: Optional[List[Dict[str, Any]]] = None   # set while inside batch()
+        self._listeners: List[Callable[[List[Dict[str, Any]]], None]] = []
+
+        if not os.path.exists(self.path) and self.legacy_path and os.path.exists(self.legacy_path):
+            self.import_legacy(self.legacy_path)
+        self._terminate_torn_tail()
+
+    # ---- writes ----
+
+    def append(self, entry: Dict[str, Any]) -> None:
+        self.append_many([entry])
+
+    def append_many(self, entries: Iterable[Dict[str, Any]]) -> None:
+        """Append entries with a single write call."""
+        entries = list(entries)
+        if not entries:
+            return
+        with self._lock:
+            if self._buffer is not None:
+                self._buffer.extend(entries)
+                return
+            self._write_entries(entries)
+
+    def subscribe(self, listener: Callable[[List[Dict[str, Any]]], None]) -> None:
+        """Call listener(entries) after appended entries have been written to the file."""
+        self._listeners.append(listener)
+
+    @contextmanager
+    def batch(self) -> Iterator[None]:
+        """
+        Buffer appends made inside the block and write them with one call at exit.
+        If the block raises, the buffered appends are dropped instead.
+        """
+        with self._lock:
+            if self._buffer is not None:   # already batching: join the outer batch
+                yield
+                return
+            self._buffer = []
+            try:
+                yield
+            except BaseException:
+                self._buffer = None
+                raise
+            entries, self._buffer = self._buffer, None
+            if entries:
+                self._write_entries(entries)
+
+    @contextmanager
+    def savepoint(self) -> Iterator[None]:
+        """Inside batch(): appends made in the block are dropped if it raises. Outside: a batch."""
+        with self._lock:
+            if self._buffer is None:
+                with self.batch():
+                    yield
+                return
+            mark = len(self._buffer)
+            try:
+                yield
+            except BaseException:
+                del self._buffer[mark:]
+                raise
+
+    def _write_entries(self, entries: List[Dict[str, Any]]) -> None:
+        self._write_lines([json.dumps(e, ensure_ascii=False) + "\n" for e in entries])
+        for listener in self._listeners:
+            listener(entries)
+
+    def _write_lines(self, lines: List[str]) -> None:
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write("".join(lines))
+            self._appends_since_compact += len(lines)
+            due = bool(self.compact_every) and self._appends_since_compact >= self.compact_every
+            if due:
+                self._appends_since_compact = 0
+        # Only worth rewriting when the last load saw torn/invalid lines.
+        if due and self._bad_lines:
+            self.compact()
+
+    def rewrite(self, entries: List[Dict[str, Any]]) -> None:
+        """Atomically replace the ledger contents (tmp file + rename)."""
+        tmp = self.path + ".tmp"
+        with self._lock:
+            with open(tmp, "w", encoding="utf-8") as f:
+                for e in entries:
+                    f.write(json.dumps(e, ensure_ascii=False) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, self.path)
+            self._appends_since_compact = 0
+            self._bad_lines = 0
+
+    def _terminate_torn_tail(self) -> None:
+        """Make sure a torn last line can't swallow the next appended entry."""
+        if not os.path.exists(self.path) or os.path.getsize(self.path) == 0:
+            return
+        with open(self.path, "rb+") as f:
+            f.seek(-1, os.SEEK_END)
+            if f.read(1) != b"\n":
+                f.write(b"\n")
+                self._bad_lines += 1
+
+    def compact(self) -> int:
+        """Rewrite the ledger without torn/invalid lines. Returns entries kept."""
+        with self._lock:
+            entries = self.load()
+            self.rewrite(entries)
+        return len(entries)
+
+    def import_legacy(self, legacy_path: str) -> int:
+        """One-shot import of the old flat points.json array."""
+        with open(legacy_path, "r", encoding="utf-8") as f:
+            content = f.read().strip()
+        entries = json.loads(content) if content else []
+        self.rewrite(entries)
+        print(f"✅ Imported {len(entries)} points entries from {legacy_path} into {self.path}")
+        return len(entries)
+
+    # ---- reads ----
+
+    def load(self) -> List[Dict[str, Any]]:
+        if not os.path.exists(self.path):
+            return []
+        out: List[Dict[str, Any]] = []
+        bad = 0
+        with self._lock:
+            with open(self.path, "r", encoding="utf-8") as f:
+                for line in f:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        out.append(json.loads(line))
+                    except json.JSONDecodeError:
+                        bad += 1
+            self._bad_lines = bad
+        return out
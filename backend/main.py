@@ -1,33 +1,48 @@
+import asyncio
 import json
 from re import U
 from pydantic import BaseModel
 from google.oauth2 import id_token
 from google.auth.transport import requests
 from google.oauth2.credentials import Credentials
-from googleapiclient.discovery import build
 from jose import jwt
 from datetime import datetime, timedelta, timezone
-from pymongo import MongoClient
 import os
+import time
 from dotenv import load_dotenv
 from fastapi import FastAPI, File, UploadFile, Form, HTTPException
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pathlib import Path
 import sys
 from uuid import uuid4
-from collections import defaultdict
+from typing import List
 import random
 
 from ocr import (
     ocr_from_bytes,
     energy_from_image_bytes,
-    energy_from_pdf_bytes,
+    energy_from_pdf_bytes_async,
     transport_from_image_bytes,
-    transport_from_pdf_bytes,
+    transport_from_pdf_bytes_async,
+    ocr_from_image_batch,
+    energy_from_image_batch,
+    ocr_cache,
+    run_ocr,
+    get_ocr_backend,
+    MAX_IMAGE_BYTES,
+    MAX_PDF_BYTES,
+    MAX_BATCH_IMAGES,
 )
+from uploads import UploadLimitMiddleware, read_upload, read_uploads
 
-from db import add_receipt, add_energy, add_rides
+from db import add_receipt, add_energy, add_rides, get_receipts, get_energy_bills, get_rides
+import db
+from ledger import PointsLedger
+from points_index import PointsAggregates, DailyRankIndex
+from persistence import PersistenceWriter
+from pdf_text import shutdown_pdf_pool, warm_up_pdf_pool
+from contextlib import asynccontextmanager
 
 
 # REPO_ROOT = Path(__file__).resolve().parents[1]
@@ -37,24 +52,37 @@ from db import add_receipt, add_energy, add_rides
 REPO_ROOT = Path(__file__).resolve().parents[1]   # .../CarbonScoreCalculator
 if str(REPO_ROOT) not in sys.path:
     sys.path.insert(0, str(REPO_ROOT))
-from LLM_Score.ScoreCal import score_receipt
+from LLM_Score.ScoreCal import (
+    score_receipt,
+    stream_receipt_scores,
+    emission_cache_stats,
+    catalog_stats,
+    batcher_stats,
+    init_scoring,
+    close_scoring,
+)
+
 
+POINTS_FILE = "data/points.json"            # legacy flat array, imported once
+POINTS_LEDGER_FILE = "data/points.jsonl"    # append-only ledger (one entry per line)
+points_ledger = PointsLedger(POINTS_LEDGER_FILE, legacy_path=POINTS_FILE)
+points_aggregates = PointsAggregates()               # user -> day/month/type totals
+daily_ranks = DailyRankIndex()                       # day -> sorted user totals
+_ledger_entries = points_ledger.load()
+points_aggregates.rebuild(_ledger_entries)
+daily_ranks.rebuild(_ledger_entries)
+del _ledger_entries
 
-POINTS_FILE = "data/points.json"
 def load_points():
-    if os.path.exists(POINTS_FILE):
-        with open(POINTS_FILE, "r") as f:
-            return json.load(f)
-    return []
+    return points_ledger.load()
 
 def save_points(points_data):
-    with open(POINTS_FILE, "w") as f:
-        json.dump(points_data, f, indent=2)
+    points_ledger.rewrite(points_data)
+    points_aggregates.rebuild(points_data)
+    daily_ranks.rebuild(points_data)
 
 def add_points_entry(user, item, entry_type, date, carbon_emission, points):
-    """Adds a single unified entry to a flat points.json structure."""
-    data = load_points()  # Load the existing list from points.json
-    
+    """Appends a single unified entry to the points ledger."""
     new_entry = {
         "user": user,
         "item": item,
@@ -64,12 +92,85 @@ def add_points_entry(user, item, entry_type, date, carbon_emission, points):
         "points": round(float(points), 3)
     }
 
-    data.append(new_entry)  # Simply append the entry to the flat list
-    #print(data)
-    save_points(data)
+    points_ledger.append(new_entry)  # O(1): one line appended, no full rewrite
     print(f"✅ Added new points entry for {user}: {item} ({entry_type})")
 
-app = FastAPI(title="EcoScore Upload API", version="3.0.0")
+def _index_points(entries):
+    for entry in entries:
+        points_aggregates.add(entry)
+        daily_ranks.add(entry)
+
+# Aggregates follow what is actually written: a rolled-back batch never reaches them.
+points_ledger.subscribe(_index_points)
+
+# Single writer for receipts/energy/rides + points: upload handlers enqueue one job per
+# upload (the entry and its points) and await it. Pending jobs are flushed together in
+# one DB transaction + one ledger write; the DB commits first, and the ledger lines are
+# only written if it did. Each job runs in a savepoint, so a failing upload leaves
+# nothing behind and doesn't take the rest of the batch down with it.
+persistence = PersistenceWriter(
+    batch_contexts=(points_ledger.batch, db.transaction),
+    job_contexts=(points_ledger.savepoint, db.savepoint),
+    max_queue=int(os.getenv("PERSIST_MAX_QUEUE", "1000")),
+    batch_size=int(os.getenv("PERSIST_BATCH_SIZE", "256")),
+    flush_interval=float(os.getenv("PERSIST_FLUSH_MS", "10")) / 1000.0,
+)
+
+# Heavy clients are created on first use, not at import. With WARM_UP=1 (default) the
+# lifespan creates them in the background right after startup (OCR client + gRPC channel,
+# Mongo connection, PDF worker processes, the pooled OpenAI client), so the first request
+# doesn't pay for it and a slow or unreachable dependency never blocks the worker from starting.
+WARM_UP = os.getenv("WARM_UP", "1") != "0"
+
+def _warm_up_mongo():
+    if not os.getenv("MONGO_URI"):
+        raise RuntimeError("MONGO_URI not set")
+    get_users_collection().database.client.admin.command("ping")
+
+WARM_UP_HOOKS = [
+    ("ocr backend", lambda: get_ocr_backend().warm_up()),
+    ("mongo", _warm_up_mongo),
+    ("pdf pool", warm_up_pdf_pool),
+    ("llm client", init_scoring),
+]
+
+async def warm_up():
+    for name, hook in WARM_UP_HOOKS:
+        t0 = time.perf_counter()
+        try:
+            await asyncio.to_thread(hook)
+            print(f"✅ Warm-up: {name} ({(time.perf_counter() - t0) * 1000:.0f} ms)")
+        except Exception as e:
+            print(f"Warm-up: {name} failed (non-critical):", e)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    persistence.start()
+    warm_up_task = asyncio.create_task(warm_up()) if WARM_UP else None
+    yield
+    if warm_up_task is not None and not warm_up_task.done():
+        warm_up_task.cancel()
+    if scoring_tasks:   # streamed receipts still being scored: let them save first
+        await asyncio.gather(*scoring_tasks, return_exceptions=True)
+    await persistence.stop()   # drain pending writes before the worker exits
+    shutdown_pdf_pool()
+    await close_scoring()
+
+app = FastAPI(title="EcoScore Upload API", version="3.0.0", lifespan=lifespan)
+
+# Upload size limits, enforced from Content-Length / while streaming (before form parsing)
+FORM_OVERHEAD_BYTES = 256 * 1024
+
+def upload_limit_for_path(path: str):
+    if not path.startswith("/ocr/"):
+        return None
+    if path.endswith("/batch"):
+        return MAX_BATCH_IMAGES * MAX_IMAGE_BYTES + FORM_OVERHEAD_BYTES
+    if path.endswith("/pdf"):
+        return MAX_PDF_BYTES + FORM_OVERHEAD_BYTES
+    return MAX_IMAGE_BYTES + FORM_OVERHEAD_BYTES
+
+app.add_middleware(UploadLimitMiddleware, limit_for_path=upload_limit_for_path)
 
 # CORS for dev; tighten for prod
 app.add_middleware(
@@ -87,10 +188,15 @@ GOOGLE_CLIENT_ID = os.getenv("GOOGLE_CLIENT_ID")  # From your Google Cloud OAuth
 JWT_SECRET = os.getenv("JWT_SECRET", "supersecret")
 JWT_ALGORITHM = "HS256"
 
-# MongoDB setup
-client = MongoClient(os.getenv("MONGO_URI"))
-db = client["myapp_db"]
-users = db.users
+# MongoDB setup (client created on first use / during warm-up)
+_mongo_client = None
+
+def get_users_collection():
+    global _mongo_client
+    if _mongo_client is None:
+        from pymongo import MongoClient
+        _mongo_client = MongoClient(os.getenv("MONGO_URI"))
+    return _mongo_client["myapp_db"].users
 
 class GoogleAuthModel(BaseModel):
     id_token: str       # ID token for authentication
@@ -116,6 +222,7 @@ async def google_auth(data: GoogleAuthModel):
         picture = idinfo.get("picture")
 
         # Store/retrieve user
+        users = get_users_collection()
         user = users.find_one({"google_id": google_id})
         if not user:
             user = {
@@ -138,6 +245,7 @@ async def google_auth(data: GoogleAuthModel):
         try:
             # Only attempt Gmail API if access token is provided and scopes are granted
             if data.access_token:
+                from googleapiclient.discovery import build  # heavy; only needed here
                 credentials = Credentials(token=data.access_token)
                 service = build("gmail", "v1", credentials=credentials)
                 gmail_labels = service.users().labels().list(userId="me").execute()
@@ -176,17 +284,21 @@ async def google_auth(data: GoogleAuthModel):
 #   - /ocr/upload                  (receipt image -> full receipt JSON; unchanged)
 #   - /ocr/energy/upload           (energy bill image -> full structured JSON)
 #   - /ocr/energy/pdf              (energy bill PDF -> full structured JSON; text-based PDFs)
+#   - /ocr/upload/batch            (N receipt images -> one stitched receipt; one Vision batch call)
+#   - /ocr/energy/upload/batch     (N energy bill page images -> one stitched structured JSON)
 #
 # Notes on PDFs:
 #   - This /ocr/energy/pdf route uses pdfminer.six for TEXT-based PDFs.
-#   - For scanned PDFs (images), either:
-#       (a) convert pages to images on the server (e.g., pdf2image + poppler) and pass to Vision, or
-#       (b) upload PDF to GCS and call Vision async batch (needs a GCS bucket).
+#     Extraction runs in a process pool (pdf_text.py): PDF_MAX_PAGES, PDF_TIMEOUT_SECONDS,
+#     and it stops reading pages once the bill fields are found (PDF_STOP_EARLY=0 to disable).
+#   - Scanned (image-only) pages are rasterized on the server (pypdfium2, or pdf2image + poppler)
+#     and OCR'd like uploaded images, a few pages at a time (PDF_OCR_CONCURRENCY, PDF_MAX_OCR_PAGES).
 #
 # Requires:
 #   fastapi, uvicorn[standard], python-multipart
 #   google-cloud-vision
 #   pdfminer.six   (for /ocr/energy/pdf)
+#   pypdfium2      (optional: scanned PDF pages)
 #   GOOGLE_APPLICATION_CREDENTIALS set in the shell running uvicorn
 
 EMISSION_FACTOR_KG_PER_KWH = 0.42
@@ -202,12 +314,12 @@ from datetime import datetime, timezone
 
 @app.get("/points/{user_id}")
 def get_points_summary(user_id: str):
-    data = load_points()
+    today = datetime.now(timezone.utc).strftime("%Y-%m-%d")
 
-    # Filter all records for this user
-    user_points = [p for p in data if p.get("user") == user_id]
+    # O(1): totals are maintained by add_points_entry (see points_index.py)
+    agg = points_aggregates.summary(user_id, today)
 
-    if not user_points:
+    if not agg:
         return {
             "user": user_id,
             "today_points": 0,
@@ -219,17 +331,14 @@ def get_points_summary(user_id: str):
             }
         }
 
-    today = datetime.now(timezone.utc).strftime("%Y-%m-%d")
-    month_prefix = datetime.now(timezone.utc).strftime("%Y-%m")
-
     # ---- Aggregations ----
-    today_points = sum(p["points"] for p in user_points if p["date"] == today)
-    month_points = sum(p["points"] for p in user_points if p["date"].startswith(month_prefix))
+    today_points = agg["today_points"]
+    month_points = agg["month_points"]
 
     # ---- Simple type filters (no month restriction) ----
-    shopping_points = sum(p["points"] for p in user_points if p["type"] == "shopping")
-    energy_points = sum(p["points"] for p in user_points if p["type"] == "energy")
-    transport_points = sum(p["points"] for p in user_points if p["type"] == "transportation")
+    shopping_points = agg["by_type"].get("shopping", 0)
+    energy_points = agg["by_type"].get("energy", 0)
+    transport_points = agg["by_type"].get("transportation", 0)
 
     return {
         "user": user_id,
@@ -266,10 +375,92 @@ def make_min_response(energy_dict: dict) -> JSONResponse:
     })
 
 
+def shopping_points(carbon) -> float:
+    return max(0, 10 - float(carbon))  # shopping logic
+
+async def score_and_store_receipt(userId: str, result: dict):
+    """LLM-score an OCR'd receipt, persist it plus per-item points. Returns (store, items)."""
+    #print("OCR Result:", result)
+    response = await score_receipt(result)   # <-- IMPORTANT: await
+    #print("Scoring Result:", response)
+    store= result.get("store")
+    await store_scored_receipt(userId, store, response)
+    return store, response
+
+async def store_scored_receipt(userId: str, store, response: list):
+    """Persist a scored receipt plus one shopping points entry per item."""
+    await (await persistence.submit(write_scored_receipt, userId, store, response))   # wait until flushed
+
+def write_scored_receipt(userId: str, store, response: list):
+    """Persistence job: the receipt and its points entries, saved or dropped together."""
+    add_receipt(user=userId, items=response, store=store)
+    for item in response:
+        carbon = item.get("emissions_kg_co2e", 0)
+        add_points_entry(
+            user=userId,
+            item=item.get("item_name", "unknown"),
+            entry_type="shopping",
+            date=datetime.now(timezone.utc).strftime("%Y-%m-%d"),
+            carbon_emission=carbon,
+            points=shopping_points(carbon)
+        )
+
+async def store_energy_bill(userId: str, result: dict) -> JSONResponse:
+    """Persist an extracted energy bill plus its points. Returns the minimal response."""
+    resp = make_min_response(result)
+    resp_json =json.loads(resp.body.decode("utf-8"))
+
+    carbon = resp_json.get("carbonFootPrint", 0)
+    energy_points = 100 - float(carbon)  # 🔸 new energy logic
+    resp_json["points"] = energy_points;
+    await (await persistence.submit(write_energy_bill, userId, resp_json))   # wait until flushed
+    return resp
+
+def write_energy_bill(userId: str, bill: dict):
+    """Persistence job: the energy bill and its points entry."""
+    add_energy(user=userId, bill=bill)
+    add_points_entry(
+        user=userId,
+        item="energy",
+        entry_type="energy",
+        date=bill.get("startDate") or datetime.now(timezone.utc).strftime("%Y-%m-%d"),
+        carbon_emission=bill.get("carbonFootPrint", 0),
+        points=bill["points"]
+    )
+
+def write_ride(userId: str, ride: dict):
+    """Persistence job: the ride and its points entry."""
+    add_rides(user=userId, bill=ride)
+    add_points_entry(
+        user=userId,
+        item=f"ride ({ride['vehicle_type']})",
+        entry_type="transportation",
+        date=ride.get("date") or datetime.now(timezone.utc).strftime("%Y-%m-%d"),
+        carbon_emission=ride["carbonFootPrint"],
+        points=ride["points"]
+    )
+
+
 @app.get("/healthz")
 def healthz():
     return {"ok": True}
 
+@app.get("/ocr/cache/stats")
+def ocr_cache_stats():
+    return ocr_cache.stats()
+
+@app.get("/llm/cache/stats")
+def llm_cache_stats():
+    return emission_cache_stats()
+
+@app.get("/llm/catalog/stats")
+def llm_catalog_stats():
+    return catalog_stats()
+
+@app.get("/llm/batch/stats")
+def llm_batch_stats():
+    return batcher_stats()
+
 # -------- Receipts (unchanged) --------
 @app.post("/ocr/upload")
 async def ocr_upload(
@@ -280,31 +471,11 @@ async def ocr_upload(
     if not image.content_type or not image.content_type.startswith("image/"):
         raise HTTPException(status_code=400, detail="file must be an image/*")
 
-    data = await image.read()
+    upload = await read_upload(image, MAX_IMAGE_BYTES, "image")   # chunked, early 413, hashed
     try:
-        result = ocr_from_bytes(data, return_cleaned=bool(return_cleaned))  # if this is slow CPU, consider to_thread
+        result = await run_ocr(ocr_from_bytes, upload.data, return_cleaned=bool(return_cleaned), digest=upload.sha256)  # bounded pool + deadline
         print("Response from OCR Success")
-        #print("OCR Result:", result)
-        response = await score_receipt(result)   # <-- IMPORTANT: await
-        #print("Scoring Result:", response)
-        store= result.get("store")
-
-        # Add the receipt to the database
-
-        add_receipt(user=userId, items=response, store=store)
-        for item in response:
-            carbon = item.get("emissions_kg_co2e", 0)
-            item_points = max(0, 10 - float(carbon))  # shopping logic
-            add_points_entry(
-                user=userId,
-                item=item.get("item_name", "unknown"),
-                entry_type="shopping",
-                date=datetime.now(timezone.utc).strftime("%Y-%m-%d"),
-                carbon_emission=carbon,
-                points=item_points
-            )
-
-
+        store, response = await score_and_store_receipt(userId, result)
         print("Response from LLM Success")
         return JSONResponse(content={"store": store, "items": response})
     except ValueError as e:
@@ -315,6 +486,93 @@ async def ocr_upload(
         raise HTTPException(status_code=500, detail=f"unexpected: {e}")
 
 
+# Background tasks of /ocr/upload/stream (a reference keeps them from being collected).
+scoring_tasks: set = set()
+
+async def stream_score_and_store(userId: str, result: dict, emit):
+    """
+    Score an OCR'd receipt item by item, then persist it like score_and_store_receipt.
+    Calls emit((event, data)) for each SSE event, then emit(None).
+    """
+    store = result.get("store")
+    try:
+        scored = {}
+        try:
+            async for index, row in stream_receipt_scores(result):
+                scored[index] = row
+                points = shopping_points(row["emissions_kg_co2e"])
+                emit(("item", {"index": index, **row, "points": round(points, 3)}))
+        except ValueError as e:
+            emit(("error", {"detail": str(e)}))
+            return
+        except Exception as e:
+            emit(("error", {"detail": f"LLM: {e}"}))
+            return
+
+        response = [scored[i] for i in sorted(scored)]
+        try:
+            await store_scored_receipt(userId, store, response)
+        except Exception as e:
+            emit(("error", {"detail": f"storage: {e}"}))
+            return
+        total = sum(shopping_points(item["emissions_kg_co2e"]) for item in response)
+        emit(("points", {"total": round(total, 3), "items": len(response)}))
+        emit(("done", {"store": store, "items": response}))
+    finally:
+        emit(None)
+
+def _sse(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+@app.post("/ocr/upload/stream")
+async def ocr_upload_stream(
+    userId: str = Form(..., description="User Id"),
+    image: UploadFile = File(..., description="Receipt image (jpg/png/webp)"),
+    return_cleaned: bool = Form(False),
+):
+    """
+    /ocr/upload as Server-Sent Events, so the app can render while the LLM works:
+      ocr     store + parsed items, right after OCR
+      item    {index, item_name, emissions_kg_co2e, points} per item, as soon as it is scored
+      points  {total, items} once the receipt and its points are saved
+      done    {store, items}: the same body /ocr/upload returns
+      error   {detail} if scoring or saving fails after OCR
+    Upload and OCR errors are still plain HTTP errors (the stream only starts after OCR).
+    """
+    if not image.content_type or not image.content_type.startswith("image/"):
+        raise HTTPException(status_code=400, detail="file must be an image/*")
+
+    upload = await read_upload(image, MAX_IMAGE_BYTES, "image")
+    try:
+        result = await run_ocr(ocr_from_bytes, upload.data, return_cleaned=bool(return_cleaned), digest=upload.sha256)
+    except ValueError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except RuntimeError as e:
+        raise HTTPException(status_code=502, detail=f"Vision: {e}")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"unexpected: {e}")
+    queue: asyncio.Queue = asyncio.Queue()
+    task = asyncio.create_task(stream_score_and_store(userId, result, queue.put_nowait))
+    scoring_tasks.add(task)
+    task.add_done_callback(scoring_tasks.discard)
+
+    async def events():
+        # Only reads what the task produces: a client that disconnects tears this
+        # generator down, but the receipt is still scored and saved.
+        yield _sse("ocr", {"store": result.get("store"), "items": result.get("items_parsed") or []})
+        while True:
+            event = await queue.get()
+            if event is None:
+                return
+            yield _sse(*event)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 # -------- Energy bills (images) --------
 @app.post("/ocr/energy/upload")
 async def ocr_energy_upload(
@@ -324,26 +582,58 @@ async def ocr_energy_upload(
 ):
     if not image.content_type or not image.content_type.startswith("image/"):
         raise HTTPException(status_code=400, detail="file must be an image/*")
-    data = await image.read()
+    upload = await read_upload(image, MAX_IMAGE_BYTES, "image")
+    try:
+        result = await run_ocr(energy_from_image_bytes, upload.data, return_cleaned=bool(return_cleaned), digest=upload.sha256)
+        return await store_energy_bill(userId, result)
+    except ValueError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except RuntimeError as e:
+        raise HTTPException(status_code=502, detail=f"Vision API: {e}")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"unexpected: {e}")
+
+# -------- Receipts / energy bills (multi-image batch) --------
+@app.post("/ocr/upload/batch")
+async def ocr_upload_batch(
+    userId: str = Form(..., description="User Id"),
+    images: List[UploadFile] = File(..., description="Receipt images in page order (jpg/png/webp)"),
+    return_cleaned: bool = Form(False),
+):
+    if any(not im.content_type or not im.content_type.startswith("image/") for im in images):
+        raise HTTPException(status_code=400, detail="every file must be an image/*")
+
+    pages = await read_uploads(images, MAX_IMAGE_BYTES, MAX_BATCH_IMAGES)
     try:
-        result = energy_from_image_bytes(data, return_cleaned=bool(return_cleaned))
-        resp = make_min_response(result)
-        resp_json =json.loads(resp.body.decode("utf-8"))
+        result = await run_ocr(
+            ocr_from_image_batch, [p.data for p in pages], return_cleaned=bool(return_cleaned), digests=[p.sha256 for p in pages]
+        )  # one Vision batch
+        print(f"Response from OCR Success ({len(pages)} pages)")
+        store, response = await score_and_store_receipt(userId, result)
+        print("Response from LLM Success")
+        return JSONResponse(content={"store": store, "items": response})
+    except ValueError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except RuntimeError as e:
+        raise HTTPException(status_code=502, detail=f"Vision/LLM: {e}")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"unexpected: {e}")
 
-        carbon = resp_json.get("carbonFootPrint", 0)
-        energy_points = 100 - float(carbon)  # 🔸 new energy logic
-        resp_json["points"] = energy_points;
-        add_energy(user=userId, bill=resp_json)
+@app.post("/ocr/energy/upload/batch")
+async def ocr_energy_upload_batch(
+    userId: str = Form(..., description="User Id"),
+    images: List[UploadFile] = File(..., description="Energy bill pages in order (jpg/png/webp)"),
+    return_cleaned: bool = Form(False),
+):
+    if any(not im.content_type or not im.content_type.startswith("image/") for im in images):
+        raise HTTPException(status_code=400, detail="every file must be an image/*")
 
-        add_points_entry(
-            user=userId,
-            item="energy",
-            entry_type="energy",
-            date=resp_json.get("startDate") or datetime.now(timezone.utc).strftime("%Y-%m-%d"),
-            carbon_emission=carbon,
-            points=energy_points
+    pages = await read_uploads(images, MAX_IMAGE_BYTES, MAX_BATCH_IMAGES)
+    try:
+        result = await run_ocr(
+            energy_from_image_batch, [p.data for p in pages], return_cleaned=bool(return_cleaned), digests=[p.sha256 for p in pages]
         )
-        return resp
+        return await store_energy_bill(userId, result)
     except ValueError as e:
         raise HTTPException(status_code=413, detail=str(e))
     except RuntimeError as e:
@@ -355,34 +645,19 @@ async def ocr_energy_upload(
 @app.post("/ocr/energy/pdf")
 async def ocr_energy_pdf(
     userId: str = Form(..., description="User Id"),
-    pdf: UploadFile = File(..., description="Energy bill PDF (text-based, not scanned)"),
+    pdf: UploadFile = File(..., description="Energy bill PDF (text-based or scanned)"),
     return_cleaned: bool = Form(False),
 ):
     if not pdf.content_type or pdf.content_type not in ("application/pdf", "application/octet-stream"):
         raise HTTPException(status_code=400, detail="file must be a PDF")
-    data = await pdf.read()
+    upload = await read_upload(pdf, MAX_PDF_BYTES, "pdf")
     try:
-        result = energy_from_pdf_bytes(data, return_cleaned=bool(return_cleaned))
-        resp = make_min_response(result)
-        resp_json =json.loads(resp.body.decode("utf-8"))
-
-        carbon = resp_json.get("carbonFootPrint", 0)
-        energy_points = 100 - float(carbon)  # 🔸 new energy logic
-        resp_json["points"] = energy_points;
-        add_energy(user=userId, bill=resp_json)
-        add_points_entry(
-            user=userId,
-            item="energy",
-            entry_type="energy",
-            date=resp_json.get("startDate") or datetime.now(timezone.utc).strftime("%Y-%m-%d"),
-            carbon_emission=carbon,
-            points=energy_points
-        )
-        return resp
+        result = await energy_from_pdf_bytes_async(upload.data, return_cleaned=bool(return_cleaned))   # PDF process pool
+        return await store_energy_bill(userId, result)
     except ValueError as e:
         raise HTTPException(status_code=413, detail=str(e))
     except RuntimeError as e:
-        # Common: "pdfminer.six not installed" or "empty PDF text" (scanned PDF)
+        # Common: "pdfminer.six not installed", "no PDF rasterizer" or "empty PDF text"
         raise HTTPException(status_code=502, detail=f"PDF processing: {e}")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"unexpected: {e}")
@@ -398,9 +673,9 @@ async def ocr_transport_upload(
 ):
     if not image.content_type or not image.content_type.startswith("image/"):
         raise HTTPException(status_code=400, detail="file must be an image/*")
-    data = await image.read()
+    upload = await read_upload(image, MAX_IMAGE_BYTES, "image")
     try:
-        result = transport_from_image_bytes(data)          # <-- OCR in ocr.py
+        result = await run_ocr(transport_from_image_bytes, upload.data, digest=upload.sha256)   # <-- OCR in ocr.py (bounded pool)
         t = result.get("transport", {})
         dist = t.get("distance_miles")
         carbon = compute_transport_carbon(vehicle_type, dist if dist is not None else 0.0)
@@ -424,16 +699,7 @@ async def ocr_transport_upload(
             out["cleaned_text"] = t.get("cleaned_text")
 
 
-        add_rides(user=userId, bill=out)
-        
-        add_points_entry(
-            user=userId,
-            item=f"ride ({vehicle_type})",
-            entry_type="transportation",
-            date=out.get("date") or datetime.now(timezone.utc).strftime("%Y-%m-%d"),
-            carbon_emission=carbon,
-            points=ride_points
-        )
+        await (await persistence.submit(write_ride, userId, out))   # wait until flushed
         return JSONResponse(out)
     except Exception as e:
         raise HTTPException(status_code=502, detail=f"Transport OCR failed: {e}")
@@ -443,14 +709,14 @@ async def ocr_transport_upload(
 async def ocr_transport_pdf(
     userId: str = Form(..., description="User Id"),
     vehicle_type: str = Form(..., description="gasoline | hybrid | electric"),
-    pdf: UploadFile = File(..., description="Transport receipt PDF (text-based, not scanned)"),
+    pdf: UploadFile = File(..., description="Transport receipt PDF (text-based or scanned)"),
     return_cleaned: bool = Form(False),
 ):
     if not pdf.content_type or pdf.content_type not in ("application/pdf", "application/octet-stream"):
         raise HTTPException(status_code=400, detail="file must be a PDF")
-    data = await pdf.read()
+    upload = await read_upload(pdf, MAX_PDF_BYTES, "pdf")
     try:
-        result = transport_from_pdf_bytes(data)            # <-- OCR in ocr.py
+        result = await transport_from_pdf_bytes_async(upload.data)   # <-- pdfminer in the PDF process pool
         t = result.get("transport", {})
         dist = t.get("distance_miles")
         carbon = compute_transport_carbon(vehicle_type, dist if dist is not None else 0.0)
@@ -472,15 +738,7 @@ async def ocr_transport_pdf(
         if return_cleaned:
             out["cleaned_text"] = t.get("cleaned_text")
 
-        add_rides(user=userId, bill=out)
-        add_points_entry(
-            user=userId,
-            item=f"ride ({vehicle_type})",
-            entry_type="transportation",
-            date=out.get("date") or datetime.now(timezone.utc).strftime("%Y-%m-%d"),
-            carbon_emission=carbon,
-            points=ride_points
-        )
+        await (await persistence.submit(write_ride, userId, out))   # wait until flushed
         return JSONResponse(out)
     except Exception as e:
         raise HTTPException(status_code=502, detail=f"Transport PDF OCR failed: {e}")
@@ -507,21 +765,19 @@ async def get_user(user_id: str):
     }
 
 @app.get("/summary")
-async def get_summary(user_id: str, type: str):
+def get_summary(user_id: str, type: str):
+    # Plain def: FastAPI runs it in the threadpool, so the storage reads below wait for a
+    # persistence flush (which holds the storage lock) without blocking the event loop.
     # -------- transport --------
     if type == "transport":
         try:
-            with open("data/transport.json", "r", encoding="utf-8") as f:
-                data = json.load(f)
+            rides = get_rides(user_id)
         except FileNotFoundError:
             raise HTTPException(status_code=500, detail="transport.json not found")
 
-        user_block = next((item for item in data if item.get("user") == user_id), None)
-
-        if not user_block:
+        if not rides:
             return {"user_id": user_id, "type": type, "entries": []}
 
-        rides = user_block.get("rides", [])
         entries = [
         {
             "date": ride.get("ride_date"),
@@ -545,18 +801,13 @@ async def get_summary(user_id: str, type: str):
     # -------- energy --------
     elif type == "energy":
         try:
-            with open("data/energy.json", "r", encoding="utf-8") as f:
-                data = json.load(f)
+            energy_bills = get_energy_bills(user_id)
         except FileNotFoundError:
             raise HTTPException(status_code=500, detail="energy.json not found")
 
-        user_block = next((item for item in data if item.get("user") == user_id), None)
-
-        if not user_block:
+        if not energy_bills:
             return {"user_id": user_id, "type": type, "entries": []}
 
-        # adjust "bills" key based on how you store energy entries
-        energy_bills = user_block.get("energy_bills", [])
         entries = [
             {   "start_date": bill.get("start_date"),
                 "end_date": bill.get("end_date"),
@@ -575,18 +826,13 @@ async def get_summary(user_id: str, type: str):
     # -------- shopping --------
     elif type == "shopping":
         try:
-            with open("data/receipts.json", "r", encoding="utf-8") as f:
-                data = json.load(f)
+            receipts = get_receipts(user_id)
         except FileNotFoundError:
             raise HTTPException(status_code=500, detail="shopping.json not found")
 
-        user_block = next((item for item in data if item.get("user") == user_id), None)
-
-        if not user_block:
+        if not receipts:
             return {"user_id": user_id, "type": type, "entries": []}
 
-        # if you’re using Receipts.json structure, this will be "receipts"
-        receipts = user_block.get("receipts", [])
         # entries = [
         #     {   "date": receipt.get("date"),
         #         "store": receipt.get("store"),
@@ -617,28 +863,13 @@ async def get_summary(user_id: str, type: str):
 
 @app.get("/percentile/{user_id}")
 def get_today_percentile(user_id: str):
-    data = load_points()
-
-    if not data:
-        return {
-            "user": user_id,
-            "today_points": 0,
-            "percentile": 0,
-            "total_users": 0
-        }
-
     today = datetime.now(timezone.utc).strftime("%Y-%m-%d")
 
-    # 1) Compute today's total points per user
-    today_totals = defaultdict(float)
-    for p in data:
-        if p.get("date") == today:
-            user = p.get("user")
-            if user:
-                today_totals[user] += p.get("points", 0)
+    # O(log n): today's totals are kept sorted by add_points_entry (see points_index.py)
+    ranked = daily_ranks.rank(today, user_id)
 
     # If no one has points today
-    if not today_totals:
+    if ranked is None:
         return {
             "user": user_id,
             "today_points": 0,
@@ -646,18 +877,10 @@ def get_today_percentile(user_id: str):
             "total_users": 0
         }
 
-    # 2) Get today's points for this user (0 if not present)
-    user_today_points = today_totals.get(user_id, 0.0)
-
-    # Ensure this user is included in the distribution even if 0
-    if user_id not in today_totals:
-        today_totals[user_id] = 0.0
-
-    values = list(today_totals.values())
-    total_users = len(values)
+    # A user without points today is counted in the distribution with 0
+    user_today_points, count_le, total_users = ranked
 
-    # 3) Percentile: proportion of users with <= this user's points
-    count_le = sum(1 for v in values if v < user_today_points)
+    # Percentile: proportion of users with < this user's points
     percentile = (count_le / total_users) * 100 if total_users > 0 else 0.0
 
     return {
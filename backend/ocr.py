@@ -2,25 +2,43 @@
 # EcoScore OCR:
 #   - Receipts (base64):   POST /ocr/b64            → items + parsed lines (legacy receipt behavior)
 #   - Energy (base64):     POST /ocr/energy/b64     → full structured energy JSON
+#     (both served by ocr_b64.py; importing this module doesn't import FastAPI)
 #   - Helpers used by multipart endpoints in main.py:
 #         ocr_from_bytes(img_bytes, return_cleaned=False)
 #         energy_from_image_bytes(img_bytes, return_cleaned=False)
 #         energy_from_pdf_bytes(pdf_bytes, return_cleaned=False)
+#         energy_from_pdf_bytes_async / transport_from_pdf_bytes_async  (PDF process pool)
+#         ocr_from_image_batch(images, return_cleaned=False)      (multi-image receipt)
+#         energy_from_image_batch(images, return_cleaned=False)   (multi-page energy bill)
+#     (async endpoints call the image runners through run_ocr: bounded pool + deadline)
 #
-# Auth required:
+# Auth required (Vision backend):
 #   export GOOGLE_APPLICATION_CREDENTIALS="$HOME/keys/vision.json"
+# Offline: OCR_BACKEND=tesseract, or OCR_BACKEND=replay with recordings (see ocr_backends.py)
 
 from __future__ import annotations
 
-import base64
+import asyncio
+import functools
+import hashlib
+import os
 import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from io import BytesIO
-from typing import Any, Dict, List, Optional, Tuple
-
-from fastapi import FastAPI, HTTPException
-from google.cloud import vision
-from pydantic import BaseModel
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from ocr_backends import OCRBackend, make_backend
+from ocr_cache import OCRCache, content_key
+from keyword_prefilter import KeywordPrefilter
+from pdf_text import (
+    extract_pdf_pages,
+    extract_pdf_pages_async,
+    is_image_only,
+    render_pdf_pages,
+    render_pdf_pages_async,
+)
 
 # ----------------------------
 # Shared cleaners & limits
@@ -160,6 +178,13 @@ BAD_LINE_RE = re.compile(
     re.I,
 )
 
+# Literal keywords every BAD_LINE_RE match contains (keyword_prefilter.py)
+BAD_LINE_KEYWORDS = (
+    "total", "balance", "transaction", "tax", "gst", "pst", "hst", "rounding", "change", "cash",
+    "card", "visa", "amex", "debit", "tender", "paid", "saved", "discount", "thank", "visit",
+    "bill", "invoice",
+)
+
 # Amount patterns:
 #  - normal: 12.34 / 1,234.56
 #  - OCR split: "12 34" (we'll repair to "12.34")
@@ -178,6 +203,11 @@ QTY_AT_PRICE_RE = re.compile(
 )
 
 STORE_HINT_RE = re.compile(r"(market|mart|foods?|grocery|super\s*market|superstore|store|trader joe|whole foods|walmart|target|costco|safeway|kroger|aldi|heb|h[- ]?e[- ]?b|sprouts|wegmans|publix|meijer|stop ?& ?shop|giant|vons|ralphs|winco|shoprite)", re.I)
+STORE_HINT_KEYWORDS = (
+    "market", "mart", "food", "grocery", "store", "trader joe", "target", "costco", "safeway",
+    "kroger", "aldi", "heb", "h-eb", "h eb", "he-b", "he b", "h-e-b", "h-e b", "h e-b", "h e b",
+    "sprouts", "wegmans", "publix", "meijer", "shop", "giant", "vons", "ralphs", "winco",
+)
 PHONE_RE = re.compile(r"\(?\+?1?\)?[ .-]?\d{3}[ .-]?\d{3}[ .-]?\d{4}")
 ADDRESS_LIKE_RE = re.compile(r"\d{1,6}\s+\w+(\s+\w+){0,5}\s*(st|street|ave|avenue|rd|road|dr|drive|blvd|lane|ln|way|ct|court)\b", re.I)
 
@@ -200,7 +230,7 @@ def extract_store_name(cleaned_text: str) -> Optional[str]:
 
     # 1) Strong hint match
     for l in head:
-        if STORE_HINT_RE.search(l) and not PHONE_RE.search(l):
+        if LINE_FILTER.tags(l) & KW_STORE and STORE_HINT_RE.search(l) and not PHONE_RE.search(l):
             if not ADDRESS_LIKE_RE.search(l):
                 return l
 
@@ -219,10 +249,19 @@ def extract_store_name(cleaned_text: str) -> Optional[str]:
 # Lines to ignore entirely as “generic” items
 GENERIC_ITEM_RE = re.compile(r"^\s*(item|items?)\s*$", re.I)
 
+# Precompiled helpers for the single-pass line classifier below
+CURRENCY_HINT_RE    = re.compile(r"[₹$€£]|Rs|INR")
+SPLIT_AMOUNT_RE     = re.compile(r"^(\d{1,4})[ ,](\d{2})$")
+CURRENCY_SPLIT_RE   = re.compile(r"(₹|Rs\.?|INR|\$|€|£)\s*(\d{1,4})[ ,](\d{2})")
+INLINE_AMOUNT_RE    = re.compile(r"(?:₹|Rs\.?|INR|\$|€|£)?\s*([0-9][0-9 ,]*[0-9])", re.I)
+FIXED_AMOUNT_RE     = re.compile(r"^\d{1,4}(?:,\d{3})*\.\d{2}$")
+LEADING_CURRENCY_RE = re.compile(r"^(?:₹|Rs\.?|INR|\$|€|£)\s*", re.I)
+TRAILING_CURRENCY_RE = re.compile(r"(?:₹|Rs\.?|INR|\$|€|£)?\s*$")
+
 def _fix_amount_token(tok: str) -> str:
     """Turn '30 83' or '30,83' into '30.83' when it looks like price cents."""
     tok = tok.strip()
-    m = re.match(r"^(\d{1,4})[ ,](\d{2})$", tok)
+    m = SPLIT_AMOUNT_RE.match(tok)
     if m:
         return f"{m.group(1)}.{m.group(2)}"
     return tok
@@ -230,38 +269,39 @@ def _fix_amount_token(tok: str) -> str:
 def _repair_amounts_in_line(line: str) -> str:
     """Repair obvious OCR price splits inside a line."""
     parts = line.split()
-    for i, p in enumerate(parts):
-        parts[i] = _fix_amount_token(p)
+    if "," in line:  # only "12,34"-style tokens can change; split() leaves no spaces in a token
+        parts = [_fix_amount_token(p) if "," in p else p for p in parts]
     s = " ".join(parts)
     # Also repair patterns like "₹ 30 83" or "$ 30 83"
-    s = re.sub(r"(₹|Rs\.?|INR|\$|€|£)\s*(\d{1,4})[ ,](\d{2})",
-               lambda m: f"{m.group(1)} {m.group(2)}.{m.group(3)}", s)
+    if CURRENCY_HINT_RE.search(s):
+        s = CURRENCY_SPLIT_RE.sub(_currency_split_repl, s)
     return s
 
-def extract_likely_items(text: str, limit: int = 60) -> List[str]:
-    out: List[str] = []
-    for raw in text.split("\n"):
-        l = _repair_amounts_in_line(raw.strip())
-        if not l:
-            continue
-        if BAD_LINE_RE.search(l) or GENERIC_ITEM_RE.match(l):
-            continue
-        if not PRICE_RE.search(l):
-            continue
-        out.append(l)
-        if len(out) >= limit:
-            break
-    return out
+def _currency_split_repl(m: "re.Match[str]") -> str:
+    return f"{m.group(1)} {m.group(2)}.{m.group(3)}"
 
-def _is_summary_line(l: str) -> bool:
-    return bool(BAD_LINE_RE.search(l))
+def _strip_trailing_amount(line: str, amt: str) -> str:
+    """Drop a trailing '<currency?> <amt>' from line (amt must end the line)."""
+    body = line.rstrip()
+    if not body.endswith(amt):
+        return line
+    return TRAILING_CURRENCY_RE.sub("", body[:len(body) - len(amt)], count=1)
 
-def extract_items_structured(cleaned_text: str, limit: int = 60) -> List[Dict[str, Any]]:
+def extract_receipt_items(
+    cleaned_text: str, lines_limit: int = 60, parsed_limit: int = 60
+) -> Tuple[List[str], List[Dict[str, Any]]]:
+    """
+    One traversal over the receipt lines → (items, items_parsed), i.e. the outputs
+    of extract_likely_items and extract_items_structured. Each line is repaired and
+    classified once (summary/generic, qty@price, amount-only, description).
+    """
     lines = [_repair_amounts_in_line(l.strip()) for l in cleaned_text.split("\n") if l.strip()]
     currency = _detect_currency(lines)
 
+    likely: List[str] = []
     items: List[Dict[str, Any]] = []
-    prev_desc: Optional[str] = None
+    prev_desc: Optional[str] = None   # only ever set to lines that passed the summary filter
+    parsing = parsed_limit > 0
 
     def _push(desc: str, qty: int, unit: float):
         total = round(qty * unit, 2)
@@ -274,7 +314,15 @@ def extract_items_structured(cleaned_text: str, limit: int = 60) -> List[Dict[st
         })
 
     for l in lines:
-        if BAD_LINE_RE.search(l) or GENERIC_ITEM_RE.match(l):
+        if len(likely) >= lines_limit and not parsing:
+            break
+        if (LINE_FILTER.tags(l) & KW_BAD and BAD_LINE_RE.search(l)) or GENERIC_ITEM_RE.match(l):
+            continue
+
+        has_price = PRICE_RE.search(l) is not None
+        if has_price and len(likely) < lines_limit:
+            likely.append(l)
+        if not parsing:
             continue
 
         # Pattern: "2 @ 3.99"
@@ -287,49 +335,54 @@ def extract_items_structured(cleaned_text: str, limit: int = 60) -> List[Dict[st
             except Exception:
                 unit = None
             if unit is not None:
-                if prev_desc and not BAD_LINE_RE.search(prev_desc) and not GENERIC_ITEM_RE.match(prev_desc):
-                    _push(prev_desc, qty, unit)
-                else:
-                    _push("", qty, unit)
+                _push(prev_desc or "", qty, unit)
             continue
 
         # Pattern: amount-only line → attach to previous description if it exists
         if PRICE_ONLY_RE.match(l):
-            amt_tok = _fix_amount_token(l)
-            amt_tok = re.sub(r"^(?:₹|Rs\.?|INR|\$|€|£)\s*", "", amt_tok, flags=re.I)
+            amt_tok = LEADING_CURRENCY_RE.sub("", _fix_amount_token(l), count=1)
             try:
                 amount = float(amt_tok.replace(",", ""))
             except Exception:
                 amount = None
-            if amount is not None and prev_desc and not BAD_LINE_RE.search(prev_desc) and not GENERIC_ITEM_RE.match(prev_desc):
+            if amount is not None and prev_desc:
                 _push(prev_desc, 1, amount)
             prev_desc = None
-            if len(items) >= limit:
-                break
+            if len(items) >= parsed_limit:
+                parsing = False
             continue
 
         # Otherwise treat as description (but also consider inline trailing price)
         prev_desc = l
-        if PRICE_RE.search(l):
+        if has_price:
             amts = []
-            for tok in re.findall(r"(?:₹|Rs\.?|INR|\$|€|£)?\s*([0-9][0-9 ,]*[0-9])", l, flags=re.I):
+            for tok in INLINE_AMOUNT_RE.findall(l):
                 tok_fixed = _fix_amount_token(tok)
-                if re.match(r"^\d{1,4}(?:,\d{3})*\.\d{2}$", tok_fixed):
+                if FIXED_AMOUNT_RE.match(tok_fixed):
                     amts.append(tok_fixed)
             if amts:
                 try:
                     unit = float(amts[-1].replace(",", ""))
-                    desc = re.sub(r"(?:₹|Rs\.?|INR|\$|€|£)?\s*" + re.escape(amts[-1]) + r"\s*$", "", l).strip()
-                    if desc and not BAD_LINE_RE.search(desc) and not GENERIC_ITEM_RE.match(desc):
+                    desc = _strip_trailing_amount(l, amts[-1]).strip()
+                    if desc and not GENERIC_ITEM_RE.match(desc):
                         _push(desc, 1, unit)
                         prev_desc = None
-                        if len(items) >= limit:
-                            break
+                        if len(items) >= parsed_limit:
+                            parsing = False
                 except Exception:
                     pass
 
     items = [it for it in items if it.get("name")]
-    return items[:limit]
+    return likely, items[:parsed_limit]
+
+def extract_likely_items(text: str, limit: int = 60) -> List[str]:
+    return extract_receipt_items(text, lines_limit=limit, parsed_limit=0)[0]
+
+def _is_summary_line(l: str) -> bool:
+    return bool(LINE_FILTER.tags(l) & KW_BAD and BAD_LINE_RE.search(l))
+
+def extract_items_structured(cleaned_text: str, limit: int = 60) -> List[Dict[str, Any]]:
+    return extract_receipt_items(cleaned_text, lines_limit=0, parsed_limit=limit)[1]
 
 # ----------------------------
 # Energy bill parsing (full structured)
@@ -359,6 +412,19 @@ GREEN_HINT_RE    = re.compile(r"(green|renewable|100%\s*(wind|solar|renewable)|r
 SERVICE_ADDR_HINT_RE = re.compile(r"(svc\s*addr|service\s*(addr|address|location)|service\s*provided\s*to)", re.I)
 ZIP_RE               = re.compile(r"\b\d{5}(?:-\d{4})?\b")
 UTILITY_NAME_HINT_RE = re.compile(r"(electric|power|energy|utilities|utility|company|co-op|cooperative|public service|eversource|pg&e|coned|duke|dominion|aps|sdge|sce)", re.I)
+UTILITY_NAME_KEYWORDS = (
+    "electric", "power", "energy", "utilit", "company", "co-op", "cooperative", "public service",
+    "eversource", "pg&e", "coned", "duke", "dominion", "aps", "sdge", "sce",
+)
+
+# Keyword prefilter shared by BAD_LINE_RE / STORE_HINT_RE / UTILITY_NAME_HINT_RE: one scan
+# tags a line with the families it could match; the regex only runs on tagged lines.
+KW_BAD, KW_STORE, KW_UTILITY = 1, 2, 4
+LINE_FILTER = KeywordPrefilter({
+    KW_BAD: BAD_LINE_KEYWORDS,
+    KW_STORE: STORE_HINT_KEYWORDS,
+    KW_UTILITY: UTILITY_NAME_KEYWORDS,
+})
 
 # On-site generation (imports/exports)
 EXPORT_RE = re.compile(r"(export(ed)?|delivered\s+to\s+grid|to\s+grid|sent\s+to\s+grid)\D{0,40}([\d,]+(?:\.\d+)?)\s*kwh", re.I)
@@ -383,6 +449,14 @@ def _to_float(s: str) -> Optional[float]:
     except Exception:
         return None
 
+def _energy_service_address(lines: List[str], i: int) -> Tuple[str, Optional[str]]:
+    """Service address = hint line + next line; ZIP from those or the line after."""
+    addr = lines[i]
+    if i + 1 < len(lines):
+        addr = f"{addr} {lines[i+1]}"
+    z = ZIP_RE.search(addr) or (ZIP_RE.search(lines[i+2]) if i + 2 < len(lines) else None)
+    return addr, (z.group(0) if z else None)
+
 def extract_energy_structured(cleaned: str) -> Dict[str, Any]:
     """
     Return a structured dict with:
@@ -392,46 +466,143 @@ def extract_energy_structured(cleaned: str) -> Dict[str, Any]:
       supplier{name,plan,green_attributes},
       onsite{import_kwh,export_kwh,net_metering},
       home_share_percent, td_loss_percent, accounting_method
+
+    Single scan: every line is offered to all field matchers that are still open.
+    The scan stops before the end only once every field it fills is settled, so the
+    result is always that of a full scan. (Multi-page PDFs are cut earlier, at
+    extraction, when PDF_STOP_EARLY is on.)
     """
     lines = [l.strip() for l in cleaned.split("\n") if l.strip()]
-    lower = [l.lower() for l in lines]
 
-    # Utility name
-    utility_name = None
-    for l in lines[:15]:
-        if UTILITY_NAME_HINT_RE.search(l):
+    utility_name = None                       # first hint line within the first 15
+    service_address = zip_code = None         # first address hint within the first 200
+    addr_seen = False
+    first_zip = None                          # fallback: first ZIP anywhere
+    start_iso = end_iso = None                # first date range within the first 250
+    period_seen = False
+    hint_kwh = None                           # first kWh on a "total usage" line
+    max_kwh = None                            # fallback: largest kWh < 100000 anywhere
+    peak_kwh = offpeak_kwh = midpeak_kwh = None
+    supplier_name = plan = green_attrs = None
+    import_kwh = export_kwh = None
+    net_meter = False
+    home_share_percent = td_loss_percent = None
+    home_share_seen = td_loss_seen = False
+
+    prev_low = ""
+    for i, l in enumerate(lines):
+        low = l.lower()
+
+        # Utility name
+        if utility_name is None and i < 15 and LINE_FILTER.tags(l) & KW_UTILITY and UTILITY_NAME_HINT_RE.search(l):
             utility_name = l
-            break
-    if not utility_name and lines:
-        utility_name = lines[0]
 
-    # Address & ZIP
-    service_address = None
-    zip_code = None
-    for i, l in enumerate(lower[:200]):
-        if SERVICE_ADDR_HINT_RE.search(l):
-            addr = lines[i]
-            if i + 1 < len(lines):
-                addr = f"{addr} {lines[i+1]}"
-            service_address = addr
-            z = ZIP_RE.search(addr) or (ZIP_RE.search(lines[i+2]) if i + 2 < len(lines) else None)
+        # Address & ZIP
+        if not addr_seen and i < 200 and SERVICE_ADDR_HINT_RE.search(low):
+            addr_seen = True
+            service_address, zip_code = _energy_service_address(lines, i)
+        if first_zip is None and zip_code is None:
+            z = ZIP_RE.search(l)
             if z:
-                zip_code = z.group(0)
-            break
-    if not zip_code:
-        z = ZIP_RE.search(" ".join(lines))
-        if z:
-            zip_code = z.group(0)
-
-    # Billing period
-    start_iso = end_iso = None
-    for l in lines[:250]:
-        if PERIOD_HINT_RE.search(l) or DATE_RANGE_RE.search(l):
+                first_zip = z.group(0)
+
+        # Billing period
+        if not period_seen and i < 250:
             m = DATE_RANGE_RE.search(l)
             if m:
+                period_seen = True
                 start_iso = _parse_date_iso(m.group("d1"))
                 end_iso   = _parse_date_iso(m.group("d2"))
-                break
+
+        # kWh figures on this line (total, fallback, TOU all use them)
+        has_kwh = "kwh" in low
+        kwh_vals = [m.group(1) for m in KWH_RE.finditer(l)] if has_kwh else []
+        if kwh_vals:
+            if hint_kwh is None and TOTAL_KWH_HINT_RE.search(l):
+                for v in kwh_vals:
+                    hint_kwh = _to_float(v)
+                    if hint_kwh is not None:
+                        break
+            if hint_kwh is None:
+                for v in kwh_vals:
+                    val = _to_float(v)
+                    if val is not None and val < 100000 and (max_kwh is None or val > max_kwh):
+                        max_kwh = val
+
+            # TOU
+            first_kwh = kwh_vals[0]
+            if peak_kwh is None and PEAK_RE.search(l) and not OFFPEAK_RE.search(l) and not MIDPEAK_RE.search(l):
+                peak_kwh = _to_float(first_kwh)
+            if offpeak_kwh is None and OFFPEAK_RE.search(l):
+                offpeak_kwh = _to_float(first_kwh)
+            if midpeak_kwh is None and MIDPEAK_RE.search(l):
+                midpeak_kwh = _to_float(first_kwh)
+
+        # Onsite gen
+        if has_kwh:
+            if export_kwh is None:
+                mexp = EXPORT_RE.search(l)
+                if mexp:
+                    export_kwh = _to_float(mexp.group(3))
+            if import_kwh is None:
+                mimp = IMPORT_RE.search(l)
+                if mimp:
+                    import_kwh = _to_float(mimp.group(3))
+
+        # Supplier / plan / green
+        if plan is None:
+            m = SUPPLIER_LINE_RE.search(l)
+            if m:
+                val = m.group(2).strip()
+                if len(val) > 120:
+                    val = val[:120]
+                if supplier_name is None:
+                    supplier_name = val
+                else:
+                    plan = val
+        if green_attrs is None and GREEN_HINT_RE.search(l):
+            green_attrs = l if len(l) < 160 else l[:160]
+
+        # Net metering (the hint may also straddle two lines: "... net" / "meter ...")
+        if not net_meter:
+            net_meter = bool(NET_METER_HINT_RE.search(low)) or (prev_low.endswith("net") and low.startswith("meter"))
+        prev_low = low
+
+        # Home share & T&D losses
+        if not home_share_seen:
+            m = HOME_SHARE_RE.search(l)
+            if m:
+                home_share_seen = True
+                try:
+                    home_share_percent = float(m.group(3).replace("%", "").strip())
+                except Exception:
+                    pass
+        if not td_loss_seen:
+            m = TD_LOSS_RE.search(l)
+            if m:
+                td_loss_seen = True
+                try:
+                    td_loss_percent = float(m.group(2).replace("%", "").strip())
+                except Exception:
+                    pass
+
+        # Early exit once every field is settled
+        if (
+            (utility_name is not None or i >= 14)
+            and (addr_seen or i >= 199)
+            and (zip_code is not None or first_zip is not None)
+            and (period_seen or i >= 249)
+            and hint_kwh is not None
+            and None not in (peak_kwh, offpeak_kwh, midpeak_kwh, import_kwh, export_kwh, green_attrs, plan)
+            and net_meter and home_share_seen and td_loss_seen
+        ):
+            break
+
+    if not utility_name and lines:
+        utility_name = lines[0]
+    if not zip_code:
+        zip_code = first_zip
+    total_kwh = hint_kwh if hint_kwh is not None else max_kwh
 
     days = None
     if start_iso and end_iso:
@@ -442,91 +613,14 @@ def extract_energy_structured(cleaned: str) -> Dict[str, Any]:
         except Exception:
             pass
 
-    # Total kWh
-    total_kwh = None
-    for l in lines:
-        if TOTAL_KWH_HINT_RE.search(l):
-            for m in KWH_RE.finditer(l):
-                total_kwh = _to_float(m.group(1))
-                if total_kwh is not None:
-                    break
-        if total_kwh is not None:
-            break
-    if total_kwh is None:
-        cands: List[float] = []
-        for l in lines:
-            for m in KWH_RE.finditer(l):
-                val = _to_float(m.group(1))
-                if val is not None and val < 100000:
-                    cands.append(val)
-        if cands:
-            total_kwh = max(cands)
-
-    # TOU
-    peak_kwh = offpeak_kwh = midpeak_kwh = None
-    for l in lines:
-        if PEAK_RE.search(l) and not OFFPEAK_RE.search(l) and not MIDPEAK_RE.search(l):
-            m = KWH_RE.search(l);  peak_kwh    = _to_float(m.group(1)) if m and peak_kwh is None else peak_kwh
-        if OFFPEAK_RE.search(l):
-            m = KWH_RE.search(l);  offpeak_kwh = _to_float(m.group(1)) if m and offpeak_kwh is None else offpeak_kwh
-        if MIDPEAK_RE.search(l):
-            m = KWH_RE.search(l);  midpeak_kwh = _to_float(m.group(1)) if m and midpeak_kwh is None else midpeak_kwh
     tou = None
     if any(v is not None for v in (peak_kwh, offpeak_kwh, midpeak_kwh)):
         tou = {"peak_kwh": peak_kwh, "offpeak_kwh": offpeak_kwh, "midpeak_kwh": midpeak_kwh}
 
-    # Supplier / plan / green
-    supplier_name = plan = green_attrs = None
-    for l in lines:
-        m = SUPPLIER_LINE_RE.search(l)
-        if m:
-            val = m.group(2).strip()
-            if len(val) > 120:
-                val = val[:120]
-            if supplier_name is None:
-                supplier_name = val
-            elif plan is None:
-                plan = val
-        if green_attrs is None and GREEN_HINT_RE.search(l):
-            green_attrs = l if len(l) < 160 else l[:160]
-
-    # Onsite gen
-    import_kwh = export_kwh = None
-    net_meter = bool(NET_METER_HINT_RE.search(" ".join(lower)))
-    for l in lines:
-        mexp = EXPORT_RE.search(l)
-        if mexp and export_kwh is None:
-            export_kwh = _to_float(mexp.group(3))
-        mimp = IMPORT_RE.search(l)
-        if mimp and import_kwh is None:
-            import_kwh = _to_float(mimp.group(3))
     onsite = None
     if any(v is not None for v in (import_kwh, export_kwh)) or net_meter:
         onsite = {"import_kwh": import_kwh, "export_kwh": export_kwh, "net_metering": net_meter}
 
-    # Home share & T&D losses
-    home_share_percent = None
-    for l in lines:
-        m = HOME_SHARE_RE.search(l)
-        if m:
-            pct = m.group(3)
-            try:
-                home_share_percent = float(pct.replace("%", "").strip())
-            except Exception:
-                pass
-            break
-
-    td_loss_percent = None
-    for l in lines:
-        m = TD_LOSS_RE.search(l)
-        if m:
-            pct = m.group(2)
-            try:
-                td_loss_percent = float(pct.replace("%", "").strip())
-            except Exception:
-                pass
-            break
-
     # Accounting method heuristic
     accounting_method = "market-based" if (green_attrs or (supplier_name and ("green" in supplier_name.lower() or "renewable" in supplier_name.lower()))) else "location-based"
 
@@ -547,34 +641,215 @@ def extract_energy_structured(cleaned: str) -> Dict[str, Any]:
     }
 
 # ----------------------------
-# Vision client (reused)
+# OCR backend (Vision by default; see ocr_backends.py)
 # ----------------------------
 
-vision_client = vision.ImageAnnotatorClient()
+OCR_BACKEND = os.getenv("OCR_BACKEND", "vision")
+_ocr_backend: Optional[OCRBackend] = None
+
+def get_ocr_backend() -> OCRBackend:
+    """The process-wide OCR backend, created on first use (no client at import time)."""
+    global _ocr_backend
+    if _ocr_backend is None:
+        _ocr_backend = make_backend(OCR_BACKEND, timeout=OCR_DEADLINE_SECONDS)
+    return _ocr_backend
+
+def set_ocr_backend(backend: OCRBackend) -> None:
+    """Swap the backend (benchmarks / load tests with a ReplayBackend)."""
+    global _ocr_backend
+    _ocr_backend = backend
+
+# Raw full_text cache keyed by sha256(bytes) + parser kind; re-uploads of the same
+# screenshot (the app retries) skip Vision. Set OCR_CACHE_DIR="" for memory-only.
+ocr_cache = OCRCache(
+    cache_dir=os.getenv("OCR_CACHE_DIR", "data/ocr_cache") or None,
+    max_memory_entries=int(os.getenv("OCR_CACHE_MEMORY_ENTRIES", "512")),
+    max_disk_entries=int(os.getenv("OCR_CACHE_DISK_ENTRIES", "20000")),
+    ttl_seconds=float(os.getenv("OCR_CACHE_TTL_DAYS", "30")) * 24 * 3600,
+)
+
+# ----------------------------
+# Image preprocessing (before OCR)
+# ----------------------------
+
+# ~300 DPI across an 8" receipt / letter-size bill is plenty for text OCR.
+OCR_MAX_LONG_EDGE   = int(os.getenv("OCR_MAX_LONG_EDGE", "2400"))
+OCR_JPEG_QUALITY    = int(os.getenv("OCR_JPEG_QUALITY", "85"))
+OCR_PREPROCESS      = os.getenv("OCR_PREPROCESS", "1") != "0"
+
+def preprocess_image(img_bytes: bytes) -> bytes:
+    """
+    Decode → apply EXIF rotation → grayscale → cap the long edge at OCR_MAX_LONG_EDGE
+    → re-encode as JPEG. Returns the original bytes if Pillow is missing, decoding
+    fails, or the result isn't smaller. Called from the OCR pool, never on the loop.
+    """
+    if not OCR_PREPROCESS:
+        return img_bytes
+    try:
+        from PIL import Image, ImageOps
+    except Exception:
+        return img_bytes  # Pillow not installed: send as-is
+
+    try:
+        with Image.open(BytesIO(img_bytes)) as im:
+            im = ImageOps.exif_transpose(im)
+            im = im.convert("L")
+            if max(im.size) > OCR_MAX_LONG_EDGE:
+                im.thumbnail((OCR_MAX_LONG_EDGE, OCR_MAX_LONG_EDGE), Image.LANCZOS)
+            buf = BytesIO()
+            im.save(buf, format="JPEG", quality=OCR_JPEG_QUALITY, optimize=True)
+    except Exception as e:
+        print("OCR preprocess skipped:", e)
+        return img_bytes
+
+    out = buf.getvalue()
+    print(f"OCR preprocess: {len(img_bytes)} -> {len(out)} bytes")
+    return out if len(out) < len(img_bytes) else img_bytes
+
+def _ocr_full_text(img_bytes: bytes, kind: str, digest: Optional[str] = None) -> str:
+    """
+    Image bytes → raw full_text via the OCR backend, served from ocr_cache when possible.
+    digest: sha256 hex of img_bytes if the caller already has it (uploads.read_upload).
+    The backend gets it too: replay recordings are keyed by the upload, not by the
+    preprocessed image.
+    """
+    digest = digest or hashlib.sha256(img_bytes).hexdigest()
+    key = content_key(img_bytes, kind, digest)
+    cached = ocr_cache.get(key)
+    if cached is not None:
+        return cached
+
+    full = get_ocr_backend().full_text(preprocess_image(img_bytes), digest)
+    ocr_cache.put(key, full)
+    return full
+
+MAX_BATCH_IMAGES = int(os.getenv("OCR_MAX_BATCH_IMAGES", "20"))
+
+def _ocr_full_texts(images: List[bytes], kind: str, digests: Optional[List[str]] = None) -> List[str]:
+    """
+    Batch variant of _ocr_full_text: cached pages are served from ocr_cache and the
+    rest go to the backend in one batch call (Vision: batch_annotate_images, chunked
+    to the API limit). Returns one full_text per image, in input order.
+    """
+    digests = [digests[i] if digests else hashlib.sha256(b).hexdigest() for i, b in enumerate(images)]
+    keys = [content_key(b, kind, digests[i]) for i, b in enumerate(images)]
+    texts: List[Optional[str]] = [ocr_cache.get(k) for k in keys]
+    missing = [i for i, t in enumerate(texts) if t is None]
+
+    if missing:
+        fresh = get_ocr_backend().full_texts(
+            [preprocess_image(images[i]) for i in missing], [digests[i] for i in missing]
+        )
+        for i, full in zip(missing, fresh):
+            ocr_cache.put(keys[i], full)
+            texts[i] = full
+    return [t or "" for t in texts]
+
+def _check_image_batch(images: List[bytes]) -> None:
+    if not images:
+        raise ValueError("no images")
+    if len(images) > MAX_BATCH_IMAGES:
+        raise ValueError(f"too many images (>{MAX_BATCH_IMAGES})")
+    for n, img_bytes in enumerate(images, start=1):
+        if not img_bytes:
+            raise ValueError(f"image {n}: empty image")
+        if len(img_bytes) > MAX_IMAGE_BYTES:
+            raise ValueError(f"image {n}: image too large (>{MAX_IMAGE_BYTES // (1024*1024)}MB)")
+
+# ----------------------------
+# Bounded OCR executor (keeps the event loop free)
+# ----------------------------
+
+OCR_MAX_CONCURRENCY  = int(os.getenv("OCR_MAX_CONCURRENCY", "8"))      # Vision calls in flight
+OCR_DEADLINE_SECONDS = float(os.getenv("OCR_DEADLINE_SECONDS", "30"))  # per call, incl. queueing
+OCR_MAX_ABANDONED    = int(os.getenv("OCR_MAX_ABANDONED", str(OCR_MAX_CONCURRENCY)))  # calls left running past their deadline
+
+class _OCRCall:
+    __slots__ = ("state",)
+
+    def __init__(self) -> None:
+        self.state = "queued"   # -> running -> done, or abandoned by the caller
+
+class _OCRSlots:
+    """
+    OCR_MAX_CONCURRENCY slots for blocking OCR calls. A thread inside the backend can't
+    be stopped, so a call that misses its deadline hands its slot back at once and
+    counts as abandoned until it returns; the pool has OCR_MAX_ABANDONED spare threads
+    for such calls, and once they are all taken new calls fail fast instead of queueing
+    behind them.
+    """
+    def __init__(self, size: int, max_abandoned: int) -> None:
+        self.max_abandoned = max_abandoned
+        self.abandoned = 0
+        self._free = threading.Semaphore(size)
+        self._lock = threading.Lock()
+        self.executor = ThreadPoolExecutor(max_workers=size + max_abandoned, thread_name_prefix="ocr")
+
+    def run(self, call: Callable[[], Any], ticket: _OCRCall) -> Any:
+        """Runs in a pool thread: wait for a slot, then make the call."""
+        self._free.acquire()
+        with self._lock:
+            if ticket.state == "abandoned":   # the caller gave up while this call was queued
+                self._free.release()
+                return None
+            ticket.state = "running"
+        try:
+            return call()
+        finally:
+            with self._lock:
+                if ticket.state == "abandoned":
+                    self.abandoned -= 1       # its slot was handed back by abandon()
+                else:
+                    ticket.state = "done"
+                    self._free.release()
+
+    def abandon(self, ticket: _OCRCall) -> None:
+        """The caller stopped waiting (deadline or cancellation)."""
+        with self._lock:
+            if ticket.state == "running":
+                self.abandoned += 1
+                self._free.release()
+            if ticket.state != "done":
+                ticket.state = "abandoned"
+
+_ocr_slots = _OCRSlots(OCR_MAX_CONCURRENCY, OCR_MAX_ABANDONED)
+
+async def run_ocr(func: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+    """
+    Run a blocking OCR runner (ocr_from_bytes, energy_from_image_bytes, ...) on the
+    bounded OCR pool so async endpoints can await it. Raises RuntimeError when the
+    call misses OCR_DEADLINE_SECONDS, or at once while OCR_MAX_ABANDONED earlier calls
+    are still stuck past theirs.
+    """
+    if _ocr_slots.abandoned >= _ocr_slots.max_abandoned:
+        raise RuntimeError(f"OCR backend unavailable ({_ocr_slots.abandoned} calls stuck past the deadline)")
+    ticket = _OCRCall()
+    loop = asyncio.get_running_loop()
+    fut = loop.run_in_executor(_ocr_slots.executor, _ocr_slots.run, functools.partial(func, *args, **kwargs), ticket)
+    try:
+        return await asyncio.wait_for(fut, OCR_DEADLINE_SECONDS)
+    except asyncio.TimeoutError:
+        _ocr_slots.abandon(ticket)
+        raise RuntimeError(f"OCR deadline exceeded ({OCR_DEADLINE_SECONDS:g}s)")
+    except asyncio.CancelledError:
+        _ocr_slots.abandon(ticket)
+        raise
 
 # ----------------------------
 # OCR runners used by main.py
 # ----------------------------
 
-def ocr_from_bytes(img_bytes: bytes, return_cleaned: bool = False) -> dict:
+def ocr_from_bytes(img_bytes: bytes, return_cleaned: bool = False, digest: Optional[str] = None) -> dict:
     """Receipt OCR → items + parsed lines (legacy)."""
     if not img_bytes:
         raise ValueError("empty image")
     if len(img_bytes) > MAX_IMAGE_BYTES:
         raise ValueError(f"image too large (>{MAX_IMAGE_BYTES // (1024*1024)}MB)")
 
-    image = vision.Image(content=img_bytes)
-    response = vision_client.document_text_detection(
-        image=image, image_context={"language_hints": ["en"]}
-    )
-    if response.error.message:
-        raise RuntimeError(response.error.message)
-
-    full = response.full_text_annotation.text if response.full_text_annotation else ""
+    full = _ocr_full_text(img_bytes, "receipt", digest)
     cleaned = basic_clean(full)
     store = extract_store_name(cleaned)
-    items_lines  = extract_likely_items(cleaned)
-    items_parsed = extract_items_structured(cleaned)
+    items_lines, items_parsed = extract_receipt_items(cleaned)
 
     result = {
         "ok": True,
@@ -589,21 +864,14 @@ def ocr_from_bytes(img_bytes: bytes, return_cleaned: bool = False) -> dict:
         result["cleaned_text"] = cleaned
     return result
 
-def energy_from_image_bytes(img_bytes: bytes, return_cleaned: bool = False) -> dict:
+def energy_from_image_bytes(img_bytes: bytes, return_cleaned: bool = False, digest: Optional[str] = None) -> dict:
     """Energy bill OCR from image bytes → full structured energy JSON."""
     if not img_bytes:
         raise ValueError("empty image")
     if len(img_bytes) > MAX_IMAGE_BYTES:
         raise ValueError(f"image too large (>{MAX_IMAGE_BYTES // (1024*1024)}MB)")
 
-    image = vision.Image(content=img_bytes)
-    response = vision_client.document_text_detection(
-        image=image, image_context={"language_hints": ["en"]}
-    )
-    if response.error.message:
-        raise RuntimeError(response.error.message)
-
-    full = response.full_text_annotation.text if response.full_text_annotation else ""
+    full = _ocr_full_text(img_bytes, "energy", digest)
     cleaned = basic_clean(full)
     energy = extract_energy_structured(cleaned)
 
@@ -618,38 +886,63 @@ def energy_from_image_bytes(img_bytes: bytes, return_cleaned: bool = False) -> d
         out["cleaned_text"] = cleaned
     return out
 
-def energy_from_pdf_bytes(pdf_bytes: bytes, return_cleaned: bool = False) -> dict:
-    """
-    Text-based PDF support (non-scanned):
-      - Uses pdfminer.six to extract text from a file-like object.
-      - If your PDF is scanned (image-only), you must:
-            (a) convert pages to images and call energy_from_image_bytes(), or
-            (b) use Vision's async batch PDF OCR via GCS.
-    """
-    if not pdf_bytes:
-        raise ValueError("empty pdf")
-    if len(pdf_bytes) > MAX_PDF_BYTES:
-        raise ValueError(f"pdf too large (>{MAX_PDF_BYTES // (1024*1024)}MB)")
+def transport_from_image_bytes(img_bytes: bytes, digest: Optional[str] = None) -> dict:
+    """Transport OCR from image bytes → structured transport JSON."""
+    if not img_bytes:
+        raise ValueError("empty image")
+    if len(img_bytes) > MAX_IMAGE_BYTES:
+        raise ValueError(f"image too large (>{MAX_IMAGE_BYTES // (1024*1024)}MB)")
 
-    try:
-        from pdfminer.high_level import extract_text as pdf_extract_text
-    except Exception:
-        raise RuntimeError("pdfminer.six not installed. Install with: pip install pdfminer.six")
+    full = _ocr_full_text(img_bytes, "transport", digest)
+    parsed = parse_transport_text(full)
 
-    try:
-        text = pdf_extract_text(BytesIO(pdf_bytes))
-    except Exception as e:
-        raise RuntimeError(f"pdf text extraction failed: {e}")
+    return {
+        "ok": True,
+        "method": "vision+bytes:transport",
+        "bytes": len(img_bytes),
+        "transport": parsed,
+    }
 
-    cleaned = basic_clean(text or "")
-    if not cleaned:
-        raise RuntimeError("empty PDF text; scanned PDFs need image conversion or Vision async with GCS")
+def ocr_from_image_batch(
+    images: List[bytes], return_cleaned: bool = False, digests: Optional[List[str]] = None
+) -> dict:
+    """Multi-image receipt (long receipt photographed in parts) → one stitched receipt JSON."""
+    _check_image_batch(images)
+
+    texts = _ocr_full_texts(images, "receipt", digests)
+    cleaned = basic_clean("\n".join(texts))   # stitched in page order
+    store = extract_store_name(cleaned)
+    items_lines, items_parsed = extract_receipt_items(cleaned)
+
+    result = {
+        "ok": True,
+        "method": "vision+batch",
+        "bytes": sum(len(b) for b in images),
+        "pages": len(images),
+        "items": items_lines,
+        "items_parsed": items_parsed,
+        "charCount": len(cleaned),
+        "store": store
+    }
+    if return_cleaned:
+        result["cleaned_text"] = cleaned
+    return result
 
+def energy_from_image_batch(
+    images: List[bytes], return_cleaned: bool = False, digests: Optional[List[str]] = None
+) -> dict:
+    """Multi-page energy bill images → one stitched structured energy JSON."""
+    _check_image_batch(images)
+
+    texts = _ocr_full_texts(images, "energy", digests)
+    cleaned = basic_clean("\n".join(texts))   # stitched in page order
     energy = extract_energy_structured(cleaned)
+
     out = {
         "ok": True,
-        "method": "pdf:text:energy",
-        "bytes": len(pdf_bytes),
+        "method": "vision+batch:energy",
+        "bytes": sum(len(b) for b in images),
+        "pages": len(images),
         "energy": energy,
         "charCount": len(cleaned),
     }
@@ -657,117 +950,169 @@ def energy_from_pdf_bytes(pdf_bytes: bytes, return_cleaned: bool = False) -> dic
         out["cleaned_text"] = cleaned
     return out
 
-def transport_from_image_bytes(img_bytes: bytes) -> dict:
-    """Transport OCR from image bytes → structured transport JSON."""
-    if not img_bytes:
-        raise ValueError("empty image")
-    if len(img_bytes) > MAX_IMAGE_BYTES:
-        raise ValueError(f"image too large (>{MAX_IMAGE_BYTES // (1024*1024)}MB)")
-
-    image = vision.Image(content=img_bytes)
-    response = vision_client.document_text_detection(
-        image=image, image_context={"language_hints": ["en"]}
-    )
-    if response.error.message:
-        raise RuntimeError(response.error.message)
-
-    full = response.full_text_annotation.text if response.full_text_annotation else ""
-    parsed = parse_transport_text(full)
+# ----------------------------
+# PDFs (pdfminer text layer page by page, scanned pages OCR'd; see pdf_text.py)
+# ----------------------------
 
-    return {
-        "ok": True,
-        "method": "vision+bytes:transport",
-        "bytes": len(img_bytes),
-        "transport": parsed,
-    }
+# Energy bills: stop reading pages once the fields we need are in the text (later pages
+# are usage history, inserts and legal text). PDF_STOP_EARLY=0 reads up to PDF_MAX_PAGES.
+PDF_STOP_EARLY = os.getenv("PDF_STOP_EARLY", "1") != "0"
 
-def transport_from_pdf_bytes(pdf_bytes: bytes) -> dict:
-    """Transport OCR from text-based PDF bytes → structured transport JSON."""
+class EnergyTextProgress:
+    """
+    stop_when for energy bills, fed one page at a time: true once a service address,
+    a billing period and a labelled total kWh have each been seen. Use one per document.
+    """
+    def __init__(self) -> None:
+        self.address = self.period = self.total_kwh = False
+
+    def __call__(self, page: str) -> bool:
+        self.address = self.address or bool(SERVICE_ADDR_HINT_RE.search(page))
+        self.period = self.period or bool(DATE_RANGE_RE.search(page))
+        self.total_kwh = self.total_kwh or any(
+            KWH_RE.search(l) for l in page.splitlines() if TOTAL_KWH_HINT_RE.search(l)
+        )
+        return self.address and self.period and self.total_kwh
+
+def _check_pdf(pdf_bytes: bytes) -> None:
     if not pdf_bytes:
         raise ValueError("empty pdf")
     if len(pdf_bytes) > MAX_PDF_BYTES:
         raise ValueError(f"pdf too large (>{MAX_PDF_BYTES // (1024*1024)}MB)")
 
+# Scanned (image-only) pages are rasterized and OCR'd through the image path; pages
+# that already have a text layer are never sent to OCR.
+PDF_MAX_OCR_PAGES   = int(os.getenv("PDF_MAX_OCR_PAGES", "10"))   # OCR calls per PDF
+PDF_OCR_CONCURRENCY = int(os.getenv("PDF_OCR_CONCURRENCY", "4"))  # pages in flight per PDF
+
+def _scanned_page_indexes(pages: List[str]) -> List[int]:
+    idx = [i for i, t in enumerate(pages) if is_image_only(t)]
+    if len(idx) > PDF_MAX_OCR_PAGES:
+        print(f"PDF: OCR limited to {PDF_MAX_OCR_PAGES} of {len(idx)} scanned pages")
+        idx = idx[:PDF_MAX_OCR_PAGES]
+    return idx
+
+def _merge_ocr_pages(pages: List[str], idx: List[int], texts: List[str]) -> List[str]:
+    merged = list(pages)
+    for i, text in zip(idx, texts):
+        merged[i] = text + "\n\f"   # same page separator pdfminer emits
+    return merged
+
+def _scan_failed(pages: List[str], e: Exception) -> None:
+    """Rendering/OCR of scanned pages failed: fatal only if there's no text layer at all."""
+    if all(is_image_only(t) for t in pages):
+        raise RuntimeError(f"scanned PDF: {e}")
+    print("PDF: scanned pages skipped:", e)
+
+def _ocr_scanned_pages(pdf_bytes: bytes, pages: List[str], kind: str) -> Tuple[List[str], int]:
+    """Sync path: rasterize image-only pages and OCR them in one batch call."""
+    idx = _scanned_page_indexes(pages)
+    if not idx:
+        return pages, 0
     try:
-        from pdfminer.high_level import extract_text as pdf_extract_text
-    except Exception:
-        raise RuntimeError("pdfminer.six not installed. Install with: pip install pdfminer.six")
+        texts = _ocr_full_texts(render_pdf_pages(pdf_bytes, idx), kind)
+    except Exception as e:
+        _scan_failed(pages, e)
+        return pages, 0
+    return _merge_ocr_pages(pages, idx, texts), len(idx)
+
+async def _ocr_scanned_pages_async(pdf_bytes: bytes, pages: List[str], kind: str) -> Tuple[List[str], int]:
+    """Async path: rasterize in the PDF pool, OCR up to PDF_OCR_CONCURRENCY pages at once."""
+    idx = _scanned_page_indexes(pages)
+    if not idx:
+        return pages, 0
+    sem = asyncio.Semaphore(PDF_OCR_CONCURRENCY)
+
+    async def ocr_page(img_bytes: bytes) -> str:
+        async with sem:
+            return await run_ocr(_ocr_full_text, img_bytes, kind)
 
     try:
-        text = pdf_extract_text(BytesIO(pdf_bytes))
+        images = await render_pdf_pages_async(pdf_bytes, idx)
+        texts = await asyncio.gather(*(ocr_page(b) for b in images))
     except Exception as e:
-        raise RuntimeError(f"pdf text extraction failed: {e}")
+        _scan_failed(pages, e)
+        return pages, 0
+    return _merge_ocr_pages(pages, idx, list(texts)), len(idx)
 
-    cleaned = basic_clean(text or "")
+def _pdf_cleaned(pages: List[str]) -> str:
+    cleaned = basic_clean("".join(pages))
     if not cleaned:
-        raise RuntimeError("empty PDF text; scanned PDFs need image conversion or Vision async with GCS")
+        raise RuntimeError("empty PDF text (no text layer and OCR found no text)")
+    return cleaned
+
+def _energy_pdf_result(pdf_bytes: bytes, pages: List[str], ocr_pages: int, return_cleaned: bool) -> dict:
+    cleaned = _pdf_cleaned(pages)
+    energy = extract_energy_structured(cleaned)
+    out = {
+        "ok": True,
+        "method": "pdf:text+ocr:energy" if ocr_pages else "pdf:text:energy",
+        "bytes": len(pdf_bytes),
+        "pages": len(pages),
+        "ocr_pages": ocr_pages,
+        "energy": energy,
+        "charCount": len(cleaned),
+    }
+    if return_cleaned:
+        out["cleaned_text"] = cleaned
+    return out
 
-    parsed = parse_transport_text(cleaned)
+def energy_from_pdf_bytes(pdf_bytes: bytes, return_cleaned: bool = False) -> dict:
+    """
+    Text-based PDF support (non-scanned):
+      - Uses pdfminer.six to extract text page by page (in-process; async endpoints
+        use energy_from_pdf_bytes_async, which runs it in the PDF process pool).
+      - Scanned (image-only) pages are rasterized and OCR'd like uploaded images;
+        mixed PDFs only OCR the pages without a text layer.
+    """
+    _check_pdf(pdf_bytes)
+    pages = extract_pdf_pages(pdf_bytes, stop_when=EnergyTextProgress() if PDF_STOP_EARLY else None)
+    pages, ocr_pages = _ocr_scanned_pages(pdf_bytes, pages, "energy")
+    return _energy_pdf_result(pdf_bytes, pages, ocr_pages, return_cleaned)
+
+async def energy_from_pdf_bytes_async(pdf_bytes: bytes, return_cleaned: bool = False) -> dict:
+    """energy_from_pdf_bytes with extraction in the PDF process pool (max pages + deadline)."""
+    _check_pdf(pdf_bytes)
+    pages = await extract_pdf_pages_async(pdf_bytes, stop_when=EnergyTextProgress() if PDF_STOP_EARLY else None)
+    pages, ocr_pages = await _ocr_scanned_pages_async(pdf_bytes, pages, "energy")
+    return _energy_pdf_result(pdf_bytes, pages, ocr_pages, return_cleaned)
+
+def _transport_pdf_result(pdf_bytes: bytes, pages: List[str], ocr_pages: int) -> dict:
+    parsed = parse_transport_text(_pdf_cleaned(pages))
     return {
         "ok": True,
-        "method": "pdf:text:transport",
+        "method": "pdf:text+ocr:transport" if ocr_pages else "pdf:text:transport",
         "bytes": len(pdf_bytes),
+        "pages": len(pages),
+        "ocr_pages": ocr_pages,
         "transport": parsed,
     }
 
+def transport_from_pdf_bytes(pdf_bytes: bytes) -> dict:
+    """
+    Transport PDF bytes → structured transport JSON (scanned pages OCR'd). Read in
+    full (up to PDF_MAX_PAGES), not stopped early: parse_transport_text takes pickup,
+    drop-off and provider from anywhere in the text, and ride receipts are short.
+    """
+    _check_pdf(pdf_bytes)
+    pages = extract_pdf_pages(pdf_bytes)
+    pages, ocr_pages = _ocr_scanned_pages(pdf_bytes, pages, "transport")
+    return _transport_pdf_result(pdf_bytes, pages, ocr_pages)
+
+async def transport_from_pdf_bytes_async(pdf_bytes: bytes) -> dict:
+    """transport_from_pdf_bytes with extraction in the PDF process pool."""
+    _check_pdf(pdf_bytes)
+    pages = await extract_pdf_pages_async(pdf_bytes)
+    pages, ocr_pages = await _ocr_scanned_pages_async(pdf_bytes, pages, "transport")
+    return _transport_pdf_result(pdf_bytes, pages, ocr_pages)
+
 # ----------------------------
-# Optional base64 FastAPI app (handy for quick CLI tests)
+# Optional base64 FastAPI app (ocr_b64.py)
 # ----------------------------
 
-app = FastAPI(title="EcoScore OCR", version="4.1.0")
-
-class OCRRequest(BaseModel):
-    image_b64: str
-    return_cleaned: bool = False
-
-@app.get("/healthz")
-def healthz():
-    return {"ok": True}
-
-@app.post("/ocr/b64")
-def ocr_b64(req: OCRRequest):
-    raw = (req.image_b64 or "").strip()
-    if not raw:
-        raise HTTPException(status_code=400, detail="empty image_b64")
-
-    b64 = extract_base64_payload(raw)
-    try:
-        img_bytes = base64.b64decode(b64, validate=True)
-    except Exception:
-        raise HTTPException(status_code=400, detail="invalid base64 payload")
-    if len(img_bytes) > MAX_IMAGE_BYTES:
-        raise HTTPException(status_code=413, detail=f"image too large (>{MAX_IMAGE_BYTES // (1024*1024)}MB)")
-
-    try:
-        result = ocr_from_bytes(img_bytes, return_cleaned=req.return_cleaned)
-        return result
-    except ValueError as e:
-        raise HTTPException(status_code=413, detail=str(e))
-    except RuntimeError as e:
-        raise HTTPException(status_code=502, detail=f"Vision/PDF: {e}")
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"unexpected: {e}")
-
-@app.post("/ocr/energy/b64")
-def ocr_energy_b64(req: OCRRequest):
-    raw = (req.image_b64 or "").strip()
-    if not raw:
-        raise HTTPException(status_code=400, detail="empty image_b64")
-
-    b64 = extract_base64_payload(raw)
-    try:
-        img_bytes = base64.b64decode(b64, validate=True)
-    except Exception:
-        raise HTTPException(status_code=400, detail="invalid base64 payload")
-    if len(img_bytes) > MAX_IMAGE_BYTES:
-        raise HTTPException(status_code=413, detail=f"image too large (>{MAX_IMAGE_BYTES // (1024*1024)}MB)")
-
-    try:
-        result = energy_from_image_bytes(img_bytes, return_cleaned=req.return_cleaned)
-        return result
-    except ValueError as e:
-        raise HTTPException(status_code=413, detail=str(e))
-    except RuntimeError as e:
-        raise HTTPException(status_code=502, detail=f"Vision/PDF: {e}")
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"unexpected: {e}")
+def __getattr__(name: str) -> Any:
+    # `uvicorn ocr:app` keeps working, but importing the parsers doesn't pull in FastAPI
+    if name == "app":
+        from ocr_b64 import app
+        return app
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
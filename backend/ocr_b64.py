@@ -0,0 +1,70 @@
+# backend/ocr_b64.py
+# Optional base64 FastAPI app (handy for quick CLI tests):
+#   - POST /ocr/b64         → receipt items + parsed lines
+#   - POST /ocr/energy/b64  → full structured energy JSON
+# Run: uvicorn ocr_b64:app  (or the old `uvicorn ocr:app`, which resolves to this app)
+
+import base64
+
+from fastapi import FastAPI, HTTPException
+from pydantic import BaseModel
+
+from ocr import MAX_IMAGE_BYTES, energy_from_image_bytes, extract_base64_payload, ocr_from_bytes
+
+app = FastAPI(title="EcoScore OCR", version="4.1.0")
+
+class OCRRequest(BaseModel):
+    image_b64: str
+    return_cleaned: bool = False
+
+@app.get("/healthz")
+def healthz():
+    return {"ok": True}
+
+@app.post("/ocr/b64")
+def ocr_b64(req: OCRRequest):
+    raw = (req.image_b64 or "").strip()
+    if not raw:
+        raise HTTPException(status_code=400, detail="empty image_b64")
+
+    b64 = extract_base64_payload(raw)
+    try:
+        img_bytes = base64.b64decode(b64, validate=True)
+    except Exception:
+        raise HTTPException(status_code=400, detail="invalid base64 payload")
+    if len(img_bytes) > MAX_IMAGE_BYTES:
+        raise HTTPException(status_code=413, detail=f"image too large (>{MAX_IMAGE_BYTES // (1024*1024)}MB)")
+
+    try:
+        result = ocr_from_bytes(img_bytes, return_cleaned=req.return_cleaned)
+        return result
+    except ValueError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except RuntimeError as e:
+        raise HTTPException(status_code=502, detail=f"Vision/PDF: {e}")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"unexpected: {e}")
+
+@app.post("/ocr/energy/b64")
+def ocr_energy_b64(req: OCRRequest):
+    raw = (req.image_b64 or "").strip()
+    if not raw:
+        raise HTTPException(status_code=400, detail="empty image_b64")
+
+    b64 = extract_base64_payload(raw)
+    try:
+        img_bytes = base64.b64decode(b64, validate=True)
+    except Exception:
+        raise HTTPException(status_code=400, detail="invalid base64 payload")
+    if len(img_bytes) > MAX_IMAGE_BYTES:
+        raise HTTPException(status_code=413, detail=f"image too large (>{MAX_IMAGE_BYTES // (1024*1024)}MB)")
+
+    try:
+        result = energy_from_image_bytes(img_bytes, return_cleaned=req.return_cleaned)
+        return result
+    except ValueError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except RuntimeError as e:
+        raise HTTPException(status_code=502, detail=f"Vision/PDF: {e}")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"unexpected: {e}")
@@ -0,0 +1,208 @@
+# backend/ocr_backends.py
+# OCR backends used by ocr.py. Each one turns image bytes into raw full_text.
+#   - VisionBackend:    Google Cloud Vision document_text_detection (default; client created lazily)
+#   - TesseractBackend: local Tesseract via pytesseract (no network / credentials)
+#   - ReplayBackend:    serves recorded full_text by sha256 of the uploaded image (before
+#                       preprocessing, so recordings survive Pillow / resize / JPEG-quality
+#                       changes), with optional synthetic latency; in record mode it wraps
+#                       another backend and saves every result, so the upload path can be
+#                       profiled on an offline box.
+#
+# Select with OCR_BACKEND=vision|tesseract|replay|record
+#   OCR_REPLAY_DIR         recordings directory (default data/ocr_recordings)
+#   OCR_REPLAY_LATENCY_MS  synthetic latency per replayed call (default 0)
+#   OCR_REPLAY_JITTER_MS   +/- uniform jitter on top of the latency (default 0)
+#   OCR_RECORD_BACKEND     backend wrapped by record mode (default vision)
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+from io import BytesIO
+from typing import List, Optional
+
+
+class OCRBackend:
+    """
+    img_bytes is the preprocessed image sent to OCR. digest, when given, is the sha256
+    hex of the original upload; only the replay backend uses it.
+    """
+    name = "base"
+
+    def full_text(self, img_bytes: bytes, digest: Optional[str] = None) -> str:
+        raise NotImplementedError
+
+    def full_texts(self, images: List[bytes], digests: Optional[List[str]] = None) -> List[str]:
+        """Batch OCR; backends without a batch API just loop."""
+        return [self.full_text(b, digests[i] if digests else None) for i, b in enumerate(images)]
+
+    def warm_up(self) -> None:
+        """Optional: create clients / open connections before the first request."""
+
+
+# ----------------------------
+# Google Cloud Vision
+# ----------------------------
+
+class VisionBackend(OCRBackend):
+    name = "vision"
+    BATCH_LIMIT = 16  # max images per synchronous batch_annotate_images request
+
+    def __init__(self, timeout: Optional[float] = None) -> None:
+        self.timeout = timeout
+        self._client = None
+        self._lock = threading.Lock()
+
+    @property
+    def client(self):
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    from google.cloud import vision
+                    self._client = vision.ImageAnnotatorClient()
+        return self._client
+
+    def full_text(self, img_bytes: bytes, digest: Optional[str] = None) -> str:
+        from google.cloud import vision
+
+        image = vision.Image(content=img_bytes)
+        response = self.client.document_text_detection(
+            image=image, image_context={"language_hints": ["en"]}, timeout=self.timeout
+        )
+        if response.error.message:
+            raise RuntimeError(response.error.message)
+        return response.full_text_annotation.text if response.full_text_annotation else ""
+
+    def full_texts(self, images: List[bytes], digests: Optional[List[str]] = None) -> List[str]:
+        from google.cloud import vision
+
+        feature = vision.Feature(type_=vision.Feature.Type.DOCUMENT_TEXT_DETECTION)
+        context = vision.ImageContext(language_hints=["en"])
+        texts: List[str] = []
+        for start in range(0, len(images), self.BATCH_LIMIT):
+            chunk = images[start:start + self.BATCH_LIMIT]
+            requests = [
+                vision.AnnotateImageRequest(image=vision.Image(content=b), features=[feature], image_context=context)
+                for b in chunk
+            ]
+            batch = self.client.batch_annotate_images(requests=requests, timeout=self.timeout)
+            for n, response in enumerate(batch.responses, start=start + 1):
+                if response.error.message:
+                    raise RuntimeError(f"page {n}: {response.error.message}")
+                texts.append(response.full_text_annotation.text if response.full_text_annotation else "")
+        return texts
+
+    def warm_up(self) -> None:
+        client = self.client  # builds the client (credentials + gRPC channel)
+        # preconnect: the channel connects lazily, so wait for it here instead of in
+        # the first request (no billable call is made)
+        import grpc
+        grpc.channel_ready_future(client.transport.grpc_channel).result(timeout=self.timeout or 10)
+
+
+# ----------------------------
+# Local Tesseract
+# ----------------------------
+
+class TesseractBackend(OCRBackend):
+    name = "tesseract"
+
+    def __init__(self, lang: str = "eng") -> None:
+        self.lang = lang
+
+    def full_text(self, img_bytes: bytes, digest: Optional[str] = None) -> str:
+        try:
+            import pytesseract
+            from PIL import Image
+        except Exception:
+            raise RuntimeError("pytesseract/Pillow not installed. Install with: pip install pytesseract pillow")
+        try:
+            with Image.open(BytesIO(img_bytes)) as im:
+                return pytesseract.image_to_string(im, lang=self.lang)
+        except Exception as e:
+            raise RuntimeError(f"tesseract failed: {e}")
+
+
+# ----------------------------
+# Record / replay
+# ----------------------------
+
+class ReplayBackend(OCRBackend):
+    name = "replay"
+
+    def __init__(
+        self,
+        recordings_dir: str = "data/ocr_recordings",
+        latency_ms: float = 0.0,
+        jitter_ms: float = 0.0,
+        record_from: Optional[OCRBackend] = None,
+    ) -> None:
+        self.recordings_dir = recordings_dir
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.record_from = record_from
+        if record_from is not None:
+            self.name = "record"
+        os.makedirs(self.recordings_dir, exist_ok=True)
+
+    def _path(self, img_bytes: bytes, digest: Optional[str]) -> str:
+        """Recording file for the upload's digest (the sha256 of img_bytes when not given)."""
+        return os.path.join(self.recordings_dir, (digest or hashlib.sha256(img_bytes).hexdigest()) + ".json")
+
+    def full_text(self, img_bytes: bytes, digest: Optional[str] = None) -> str:
+        path = self._path(img_bytes, digest)
+        if self.record_from is not None:
+            text = self.record_from.full_text(img_bytes, digest)
+            self._save(path, text)
+            return text
+
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                text = json.load(f)["full_text"]
+        except FileNotFoundError:
+            raise RuntimeError(f"no OCR recording for {os.path.basename(path)}")
+        self._sleep()
+        return text
+
+    def full_texts(self, images: List[bytes], digests: Optional[List[str]] = None) -> List[str]:
+        if self.record_from is not None:
+            texts = self.record_from.full_texts(images, digests)
+            for i, (b, text) in enumerate(zip(images, texts)):
+                self._save(self._path(b, digests[i] if digests else None), text)
+            return texts
+        return [self.full_text(b, digests[i] if digests else None) for i, b in enumerate(images)]
+
+    def _save(self, path: str, text: str) -> None:
+        tmp = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"full_text": text, "recorded_at": time.time()}, f, ensure_ascii=False)
+        os.replace(tmp, path)
+
+    def _sleep(self) -> None:
+        delay = self.latency_ms + (random.uniform(-self.jitter_ms, self.jitter_ms) if self.jitter_ms else 0.0)
+        if delay > 0:
+            time.sleep(delay / 1000.0)
+
+    def warm_up(self) -> None:
+        if self.record_from is not None:
+            self.record_from.warm_up()
+
+
+def make_backend(kind: str, timeout: Optional[float] = None) -> OCRBackend:
+    kind = (kind or "vision").lower()
+    if kind == "vision":
+        return VisionBackend(timeout=timeout)
+    if kind == "tesseract":
+        return TesseractBackend(lang=os.getenv("OCR_TESSERACT_LANG", "eng"))
+    if kind in ("replay", "record"):
+        return ReplayBackend(
+            recordings_dir=os.getenv("OCR_REPLAY_DIR", "data/ocr_recordings"),
+            latency_ms=float(os.getenv("OCR_REPLAY_LATENCY_MS", "0")),
+            jitter_ms=float(os.getenv("OCR_REPLAY_JITTER_MS", "0")),
+            record_from=make_backend(os.getenv("OCR_RECORD_BACKEND", "vision"), timeout) if kind == "record" else None,
+        )
+    raise ValueError(f"unknown OCR backend: {kind!r} (expected vision, tesseract, replay or record)")
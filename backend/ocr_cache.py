@@ -0,0 +1,186 @@
+# backend/ocr_cache.py
+# Content-hash cache for raw OCR text.
+#   key   = sha256(image bytes) + ":" + parser kind ("receipt" | "energy" | "transport")
+#   value = the raw Vision full_text (not the parsed result, so parser changes don't
+#           invalidate the cache)
+#
+# Two tiers:
+#   - in-memory LRU, bounded by entry count and total characters
+#   - on-disk store (one small JSON file per key) with TTL and oldest-first eviction;
+#     the directory is created on the first write, not when the cache is constructed
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional
+
+
+def content_key(data: bytes, kind: str, digest: Optional[str] = None) -> str:
+    return f"{digest or hashlib.sha256(data).hexdigest()}:{kind}"
+
+
+class OCRCache:
+    def __init__(
+        self,
+        cache_dir: Optional[str] = "data/ocr_cache",
+        max_memory_entries: int = 512,
+        max_memory_chars: int = 16 * 1024 * 1024,
+        max_disk_entries: int = 20000,
+        ttl_seconds: float = 30 * 24 * 3600,
+    ) -> None:
+        self.cache_dir = cache_dir
+        self.max_memory_entries = max_memory_entries
+        self.max_memory_chars = max_memory_chars
+        self.max_disk_entries = max_disk_entries
+        self.ttl_seconds = ttl_seconds
+
+        self._lock = threading.Lock()
+        self._mem: "OrderedDict[str, str]" = OrderedDict()
+        self._mem_chars = 0
+        self._disk_entries: Optional[int] = None   # counted on first use
+        self._dir_ready = False                    # created on first write
+
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    # ---- public API ----
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            text = self._mem.get(key)
+            if text is not None:
+                self._mem.move_to_end(key)
+                self.memory_hits += 1
+                return text
+
+        text = self._disk_get(key)
+        with self._lock:
+            if text is None:
+                self.misses += 1
+                return None
+            self.disk_hits += 1
+            self._mem_put(key, text)
+        return text
+
+    def put(self, key: str, text: str) -> None:
+        with self._lock:
+            self._mem_put(key, text)
+        self._disk_put(key, text)
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            lookups = self.memory_hits + self.disk_hits + self.misses
+            return {
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": round((self.memory_hits + self.disk_hits) / lookups, 4) if lookups else 0.0,
+                "memory_entries": len(self._mem),
+                "memory_chars": self._mem_chars,
+                "disk_entries": self._disk_count(),
+                "evictions": self.evictions,
+            }
+
+    # ---- memory tier ----
+
+    def _mem_put(self, key: str, text: str) -> None:
+        old = self._mem.pop(key, None)
+        if old is not None:
+            self._mem_chars -= len(old)
+        self._mem[key] = text
+        self._mem_chars += len(text)
+        while self._mem and (len(self._mem) > self.max_memory_entries or self._mem_chars > self.max_memory_chars):
+            _, dropped = self._mem.popitem(last=False)
+            self._mem_chars -= len(dropped)
+
+    # ---- disk tier ----
+
+    def _disk_count(self) -> int:
+        """Files on disk: listed on first use (which already includes any file written or
+        removed before then), then kept up to date. Caller holds the lock."""
+        if self._disk_entries is None:
+            self._disk_entries = 0
+            if self.cache_dir and os.path.isdir(self.cache_dir):
+                self._disk_entries = sum(1 for n in os.listdir(self.cache_dir) if n.endswith(".json"))
+        return self._disk_entries
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key.replace(":", "-") + ".json")
+
+    def _disk_get(self, key: str) -> Optional[str]:
+        if not self.cache_dir:
+            return None
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                rec = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if time.time() - rec.get("created", 0) > self.ttl_seconds:
+            self._disk_remove(path)
+            return None
+        return rec.get("full_text")
+
+    def _disk_put(self, key: str, text: str) -> None:
+        if not self.cache_dir:
+            return
+        path = self._path(key)
+        is_new = not os.path.exists(path)
+        tmp = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            if not self._dir_ready:
+                os.makedirs(self.cache_dir, exist_ok=True)
+                self._dir_ready = True
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump({"full_text": text, "created": time.time()}, f, ensure_ascii=False)
+            os.replace(tmp, path)
+        except OSError as e:
+            print("OCR cache write failed (non-critical):", e)
+            return
+        if is_new:
+            with self._lock:
+                if self._disk_entries is not None:
+                    self._disk_entries += 1
+                over = self._disk_count() > self.max_disk_entries
+            if over:
+                self._disk_evict()
+
+    def _disk_remove(self, path: str) -> None:
+        try:
+            os.remove(path)
+        except OSError:
+            return
+        with self._lock:
+            if self._disk_entries is not None:
+                self._disk_entries -= 1
+            self.evictions += 1
+
+    def _disk_evict(self) -> None:
+        """Drop expired files, then the oldest ones, down to 90% of the limit."""
+        entries = []
+        now = time.time()
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(".json"):
+                continue
+            path = os.path.join(self.cache_dir, name)
+            try:
+                entries.append((os.path.getmtime(path), path))
+            except OSError:
+                continue
+        entries.sort()
+        target = int(self.max_disk_entries * 0.9)
+        keep = len(entries)
+        for mtime, path in entries:
+            if keep <= target and now - mtime <= self.ttl_seconds:
+                break
+            self._disk_remove(path)
+            keep -= 1
+        with self._lock:
+            self._disk_entries = keep
@@ -0,0 +1,230 @@
+# backend/pdf_text.py
+# Text extraction for text-based PDFs (energy bills, ride receipts), kept off the event loop.
+#   - pdfminer.six is pure Python and holds the GIL for seconds on a large bill, so async
+#     callers run it in a small process pool; each worker imports pdfminer once, in the
+#     pool initializer, instead of on every call.
+#   - Pages are extracted one at a time, up to max_pages; an optional stop predicate
+#     (e.g. "the billing period and total kWh have been seen") ends extraction early.
+#     It is fed each new page's text and keeps its own state, so the text read so far
+#     is never re-scanned.
+#   - Per-document wall-clock limit: the worker checks it between pages and the awaiting
+#     side gives up via asyncio.wait_for. On that timeout the pool's workers are killed
+#     and the pool replaced, so a pathological page can't keep a worker busy forever.
+#   - Scanned (image-only) pages come back as empty text; render_pdf_pages() rasterizes
+#     just those pages (pypdfium2, else pdf2image + poppler) so the caller can OCR them.
+#
+# Env:
+#   PDF_MAX_WORKERS       process pool size (default 2)
+#   PDF_MAX_PAGES         pages read per document, 0 = all (default 50)
+#   PDF_TIMEOUT_SECONDS   wall-clock limit per document (default 20)
+#   PDF_RENDER_DPI        rasterization resolution for scanned pages (default 200)
+
+from __future__ import annotations
+
+import asyncio
+import functools
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from io import BytesIO, StringIO
+from typing import Any, Callable, List, Optional, Sequence
+
+PDF_MAX_WORKERS     = int(os.getenv("PDF_MAX_WORKERS", "2"))
+PDF_MAX_PAGES       = int(os.getenv("PDF_MAX_PAGES", "50"))
+PDF_TIMEOUT_SECONDS = float(os.getenv("PDF_TIMEOUT_SECONDS", "20"))
+PDF_RENDER_DPI      = int(os.getenv("PDF_RENDER_DPI", "200"))
+
+StopPredicate = Callable[[str], bool]
+
+# ----------------------------
+# pdfminer (imported once per process)
+# ----------------------------
+
+_pdfminer = None
+
+def _load_pdfminer():
+    global _pdfminer
+    if _pdfminer is None:
+        try:
+            from pdfminer.converter import TextConverter
+            from pdfminer.layout import LAParams
+            from pdfminer.pdfinterp import PDFPageInterpreter, PDFResourceManager
+            from pdfminer.pdfpage import PDFPage
+        except Exception:
+            raise RuntimeError("pdfminer.six not installed. Install with: pip install pdfminer.six")
+        _pdfminer = (TextConverter, LAParams, PDFPageInterpreter, PDFResourceManager, PDFPage)
+    return _pdfminer
+
+def _init_worker() -> None:
+    """Pool initializer. A missing pdfminer is reported by the first call, not here."""
+    try:
+        _load_pdfminer()
+    except RuntimeError:
+        pass
+
+# ----------------------------
+# Extraction (runs inside a worker, or inline for sync callers)
+# ----------------------------
+
+def extract_pdf_pages(
+    pdf_bytes: bytes,
+    max_pages: Optional[int] = None,
+    timeout: Optional[float] = None,
+    stop_when: Optional[StopPredicate] = None,
+) -> List[str]:
+    """
+    Text of each page read, in order. "".join(pages) is what pdfminer's
+    extract_text() returns for the same pages. Stops after max_pages, or after the
+    first page for which stop_when(page_text) is true; stop_when sees each page once,
+    in order, and may keep state across them (pass a fresh one per document).
+    Raises RuntimeError on parse errors and when the wall-clock limit passes between pages.
+    """
+    TextConverter, LAParams, PDFPageInterpreter, PDFResourceManager, PDFPage = _load_pdfminer()
+    max_pages = PDF_MAX_PAGES if max_pages is None else max_pages
+    deadline = time.monotonic() + (PDF_TIMEOUT_SECONDS if timeout is None else timeout)
+
+    pages: List[str] = []
+    try:
+        with StringIO() as out:
+            rsrcmgr = PDFResourceManager(caching=True)
+            device = TextConverter(rsrcmgr, out, laparams=LAParams())
+            interpreter = PDFPageInterpreter(rsrcmgr, device)
+            for page in PDFPage.get_pages(BytesIO(pdf_bytes), maxpages=max_pages, caching=True):
+                if time.monotonic() > deadline:
+                    raise TimeoutError
+                interpreter.process_page(page)
+                pages.append(out.getvalue())
+                out.seek(0)
+                out.truncate()
+                if stop_when is not None and stop_when(pages[-1]):
+                    break
+    except TimeoutError:
+        raise RuntimeError(f"pdf text extraction timed out after {len(pages)} pages")
+    except Exception as e:
+        raise RuntimeError(f"pdf text extraction failed: {e}")
+    return pages
+
+def is_image_only(page_text: str) -> bool:
+    """pdfminer found no text on the page (only the trailing form feed): a scanned page."""
+    return not page_text.strip()
+
+def _encode_page(im) -> bytes:
+    buf = BytesIO()
+    im.convert("L").save(buf, format="JPEG", quality=90)
+    return buf.getvalue()
+
+def render_pdf_pages(pdf_bytes: bytes, page_indexes: Sequence[int], dpi: Optional[int] = None) -> List[bytes]:
+    """
+    JPEG bytes for the given 0-based pages, in the order given. Uses pypdfium2 when
+    installed, else pdf2image (needs poppler). Raises RuntimeError when neither is available.
+    """
+    dpi = PDF_RENDER_DPI if dpi is None else dpi
+    try:
+        import pypdfium2 as pdfium
+    except Exception:
+        pdfium = None
+
+    try:
+        if pdfium is not None:
+            doc = pdfium.PdfDocument(pdf_bytes)
+            try:
+                return [_encode_page(doc[i].render(scale=dpi / 72).to_pil()) for i in page_indexes]
+            finally:
+                doc.close()
+
+        try:
+            from pdf2image import convert_from_bytes
+        except Exception:
+            raise RuntimeError("no PDF rasterizer. Install with: pip install pypdfium2 (or pdf2image + poppler)")
+        out: List[bytes] = []
+        for i in page_indexes:
+            for im in convert_from_bytes(pdf_bytes, dpi=dpi, first_page=i + 1, last_page=i + 1):
+                out.append(_encode_page(im))
+        return out
+    except RuntimeError:
+        raise
+    except Exception as e:
+        raise RuntimeError(f"pdf page rendering failed: {e}")
+
+# ----------------------------
+# Process pool (async callers)
+# ----------------------------
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+def get_pdf_pool() -> ProcessPoolExecutor:
+    """The process-wide extraction pool, created on first use."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ProcessPoolExecutor(max_workers=PDF_MAX_WORKERS, initializer=_init_worker)
+    return _pool
+
+def warm_up_pdf_pool() -> None:
+    """Start the worker processes (and their pdfminer import) before the first PDF arrives."""
+    pool = get_pdf_pool()
+    for fut in [pool.submit(_init_worker) for _ in range(PDF_MAX_WORKERS)]:
+        fut.result()
+
+def shutdown_pdf_pool() -> None:
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+def _reset_pool(broken: ProcessPoolExecutor, terminate: bool = False) -> None:
+    """
+    A worker died (e.g. OOM on a hostile PDF) or is stuck past its deadline: replace
+    the pool for later calls. terminate=True kills the workers first; other calls
+    running in the same pool then fail as "worker process died".
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is broken:
+            _pool = None
+    if terminate:
+        for proc in list((getattr(broken, "_processes", None) or {}).values()):
+            proc.terminate()
+    broken.shutdown(wait=False, cancel_futures=True)
+
+async def _run_in_pool(call: Callable[[], Any], timeout: float, what: str) -> Any:
+    pool = get_pdf_pool()
+    fut = asyncio.get_running_loop().run_in_executor(pool, call)
+    try:
+        # small grace so the worker's own page-boundary check reports first
+        return await asyncio.wait_for(fut, timeout + 1.0)
+    except asyncio.TimeoutError:
+        # The worker is still inside one page: the deadline is only checked between pages.
+        _reset_pool(pool, terminate=True)
+        raise RuntimeError(f"{what} timed out ({timeout:g}s)")
+    except BrokenProcessPool:
+        _reset_pool(pool)
+        raise RuntimeError(f"{what} failed: worker process died")
+
+async def extract_pdf_pages_async(
+    pdf_bytes: bytes,
+    max_pages: Optional[int] = None,
+    timeout: Optional[float] = None,
+    stop_when: Optional[StopPredicate] = None,
+) -> List[str]:
+    """
+    extract_pdf_pages() in the process pool. stop_when must be picklable (a
+    module-level function, or an instance of a module-level class).
+    """
+    timeout = PDF_TIMEOUT_SECONDS if timeout is None else timeout
+    return await _run_in_pool(
+        functools.partial(extract_pdf_pages, pdf_bytes, max_pages, timeout, stop_when), timeout, "pdf text extraction"
+    )
+
+async def render_pdf_pages_async(
+    pdf_bytes: bytes, page_indexes: Sequence[int], dpi: Optional[int] = None
+) -> List[bytes]:
+    """render_pdf_pages() in the process pool, under the same per-document time limit."""
+    return await _run_in_pool(
+        functools.partial(render_pdf_pages, pdf_bytes, list(page_indexes), dpi), PDF_TIMEOUT_SECONDS, "pdf page rendering"
+    )
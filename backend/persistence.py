@@ -0,0 +1,142 @@
+# backend/persistence.py
+# Single-writer persistence actor (group commit / write-behind).
+#
+#   - Upload handlers enqueue write calls (add_receipt, add_points_entry, ...) instead of
+#     doing blocking file/DB I/O on the event loop.
+#   - One writer task drains the bounded queue; everything pending (up to batch_size,
+#     lingering at most flush_interval for stragglers) is executed in a worker thread
+#     inside the configured batch contexts (e.g. one SQLite transaction + one ledger write).
+#   - Each job also runs inside the job contexts (e.g. a savepoint): a job that raises
+#     has all of its writes undone, and the rest of the batch still commits. Writes
+#     that must succeed or fail together (a receipt and its points) go in one job.
+#   - If the batch itself fails to commit, every job in it fails.
+#   - submit() returns a future that resolves once that write has been flushed, so
+#     callers can await durability; flush() is a barrier for everything enqueued so far.
+#   - stop() drains the queue before returning (call it on shutdown).
+
+from __future__ import annotations
+
+import asyncio
+from contextlib import ExitStack
+from typing import Any, Callable, ContextManager, List, Optional, Sequence, Tuple
+
+_STOP = object()
+
+Job = Tuple[Callable[..., Any], tuple, dict, "asyncio.Future[Any]"]
+
+
+class PersistenceWriter:
+    def __init__(
+        self,
+        batch_contexts: Sequence[Callable[[], ContextManager[Any]]] = (),
+        job_contexts: Sequence[Callable[[], ContextManager[Any]]] = (),
+        max_queue: int = 1000,
+        batch_size: int = 256,
+        flush_interval: float = 0.01,
+    ) -> None:
+        self.batch_contexts = tuple(batch_contexts)
+        self.job_contexts = tuple(job_contexts)
+        self.max_queue = max_queue
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        # simple counters (batch fill / throughput)
+        self.flushes = 0
+        self.jobs_written = 0
+
+    # ---- lifecycle ----
+
+    def start(self) -> None:
+        if self._task is not None and not self._task.done():
+            return
+        self._queue = asyncio.Queue(maxsize=self.max_queue)
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        """Drain everything already enqueued, then stop the writer."""
+        if self._task is None or self._task.done():
+            return
+        await self._queue.put(_STOP)
+        await self._task
+        self._task = None
+        print(f"✅ Persistence writer drained ({self.jobs_written} writes in {self.flushes} flushes)")
+
+    # ---- API ----
+
+    async def submit(self, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> "asyncio.Future[Any]":
+        """
+        Enqueue fn(*args, **kwargs). Waits only for queue space (backpressure);
+        await the returned future to wait for the write to be flushed.
+        """
+        self.start()
+        fut = asyncio.get_running_loop().create_future()
+        await self._queue.put((fn, args, kwargs, fut))
+        return fut
+
+    async def flush(self) -> None:
+        """Wait until everything enqueued before this call has been flushed."""
+        fut = await self.submit(_noop)
+        await fut
+
+    # ---- writer ----
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        stopping = False
+        while not stopping:
+            job = await self._queue.get()
+            if job is _STOP:
+                break
+            batch: List[Job] = [job]
+            deadline = loop.time() + self.flush_interval
+            while len(batch) < self.batch_size:
+                try:
+                    job = self._queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        job = await asyncio.wait_for(self._queue.get(), timeout)
+                    except asyncio.TimeoutError:
+                        break
+                if job is _STOP:
+                    stopping = True
+                    break
+                batch.append(job)
+
+            outcomes = await asyncio.to_thread(self._write_batch, batch)
+            self.flushes += 1
+            self.jobs_written += len(batch)
+            for (_, _, _, fut), (ok, value) in zip(batch, outcomes):
+                if fut.done():
+                    continue
+                if ok:
+                    fut.set_result(value)
+                else:
+                    fut.set_exception(value)
+
+    def _write_batch(self, batch: List[Job]) -> List[Tuple[bool, Any]]:
+        outcomes: List[Tuple[bool, Any]] = []
+        try:
+            with ExitStack() as stack:
+                for ctx in self.batch_contexts:
+                    stack.enter_context(ctx())
+                for fn, args, kwargs, _ in batch:
+                    try:
+                        with ExitStack() as job_stack:
+                            for ctx in self.job_contexts:
+                                job_stack.enter_context(ctx())
+                            value = fn(*args, **kwargs)
+                        outcomes.append((True, value))
+                    except Exception as e:
+                        outcomes.append((False, e))
+        except Exception as e:
+            # the commit itself failed: nothing in this batch is durable
+            return [(False, e) for _ in batch]
+        return outcomes
+
+
+def _noop() -> None:
+    return None
@@ -0,0 +1,129 @@
+# backend/points_index.py
+# In-process indexes over the points ledger, kept up to date by add_points_entry
+# and rebuilt from the ledger on startup:
+#   - PointsAggregates: user -> {per-day, per-month, per-type} point totals (GET /points/{user_id})
+#   - DailyRankIndex:   day -> sorted per-user totals for rank queries     (GET /percentile/{user_id})
+
+from __future__ import annotations
+
+import threading
+from bisect import bisect_left, insort
+from collections import defaultdict
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+
+class _UserTotals:
+    __slots__ = ("by_day", "by_month", "by_type")
+
+    def __init__(self) -> None:
+        self.by_day: Dict[str, float] = defaultdict(float)
+        self.by_month: Dict[str, float] = defaultdict(float)
+        self.by_type: Dict[str, float] = defaultdict(float)
+
+
+class PointsAggregates:
+    """
+    Running totals per user. Days and months are keyed by the entry's own
+    "YYYY-MM-DD" date string, so rollover at UTC midnight / month start is just
+    a different key at query time; nothing has to be reset.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._users: Dict[str, _UserTotals] = {}
+
+    def rebuild(self, entries: Iterable[Dict[str, Any]]) -> None:
+        with self._lock:
+            self._users = {}
+            for e in entries:
+                self._add(e)
+
+    def add(self, entry: Dict[str, Any]) -> None:
+        with self._lock:
+            self._add(entry)
+
+    def _add(self, e: Dict[str, Any]) -> None:
+        user = e.get("user")
+        totals = self._users.get(user)
+        if totals is None:
+            totals = self._users[user] = _UserTotals()
+        pts = e["points"]
+        day = e.get("date")
+        if isinstance(day, str):
+            totals.by_day[day] += pts
+            totals.by_month[day[:7]] += pts
+        totals.by_type[e.get("type")] += pts
+
+    def summary(self, user: str, day: str) -> Dict[str, Any]:
+        """Totals for `day` ("YYYY-MM-DD"), its month, and all-time per type."""
+        with self._lock:
+            totals = self._users.get(user)
+            if totals is None:
+                return {}
+            return {
+                "today_points": totals.by_day.get(day, 0),
+                "month_points": totals.by_month.get(day[:7], 0),
+                "by_type": dict(totals.by_type),
+            }
+
+
+class DailyRankIndex:
+    """
+    Per-day user totals plus a sorted list of those totals for rank queries.
+
+    The sorted list is only materialized for days that are actually queried
+    (in practice: today) and is then kept in sync on every add, so a query is
+    two dict lookups and one bisect.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._totals: Dict[str, Dict[str, float]] = defaultdict(dict)  # day -> user -> total
+        self._ranked: Dict[str, List[float]] = {}                       # day -> sorted totals
+
+    def rebuild(self, entries: Iterable[Dict[str, Any]]) -> None:
+        with self._lock:
+            self._totals = defaultdict(dict)
+            self._ranked = {}
+            for e in entries:
+                self._add(e)
+
+    def add(self, entry: Dict[str, Any]) -> None:
+        with self._lock:
+            self._add(entry)
+
+    def _add(self, e: Dict[str, Any]) -> None:
+        user = e.get("user")
+        day = e.get("date")
+        if not user or day is None:
+            return
+        day_totals = self._totals[day]
+        old = day_totals.get(user)
+        new = (0.0 if old is None else old) + e.get("points", 0)
+        day_totals[user] = new
+        ranked = self._ranked.get(day)
+        if ranked is not None:
+            if old is not None:
+                del ranked[bisect_left(ranked, old)]
+            insort(ranked, new)
+
+    def rank(self, day: str, user: str) -> Optional[Tuple[float, int, int]]:
+        """
+        (user_points, users_strictly_below, total_users) for `day`, or None when
+        nobody has points that day. A user without points that day counts as 0.0
+        and is included in total_users.
+        """
+        with self._lock:
+            day_totals = self._totals.get(day)
+            if not day_totals:
+                return None
+            ranked = self._ranked.get(day)
+            if ranked is None:
+                # only the queried day is kept sorted; older days are dropped
+                ranked = sorted(day_totals.values())
+                self._ranked = {day: ranked}
+            pts = day_totals.get(user)
+            total_users = len(ranked) + (1 if pts is None else 0)
+            if pts is None:
+                pts = 0.0
+            return pts, bisect_left(ranked, pts), total_users
@@ -0,0 +1,274 @@
+# backend/storage.py
+# Storage engines behind db.py:
+#   - JsonStorage:   the original data/*.json layout (one array of per-user blocks per file)
+#   - SQLiteStorage: one SQLite database (WAL mode, (user, date) indexes, parameterized statements)
+#
+# Pick the engine with ECOSCORE_STORAGE=sqlite|json (default: sqlite).
+# The first time the SQLite database is opened, existing data/*.json files are
+# migrated into it (see migrate_from_json); PRAGMA user_version records that the
+# migration ran, so data cleared later is never imported again.
+
+from __future__ import annotations
+
+import json
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List
+
+# kind -> (json file, per-user list key)
+JSON_LAYOUT = {
+    "receipts": ("data/receipts.json", "receipts"),
+    "energy":   ("data/energy.json", "energy_bills"),
+    "rides":    ("data/transport.json", "rides"),
+}
+
+
+class StorageEngine:
+    """Interface shared by the storage engines."""
+
+    def insert(self, kind: str, user: str, entry: Dict[str, Any]) -> None:
+        raise NotImplementedError
+
+    def list_entries(self, kind: str, user: str) -> List[Dict[str, Any]]:
+        raise NotImplementedError
+
+    @contextmanager
+    def transaction(self) -> Iterator[None]:
+        yield
+
+    @contextmanager
+    def savepoint(self) -> Iterator[None]:
+        """Inserts in the block are undone if it raises (engines that can roll back)."""
+        yield
+
+    def close(self) -> None:
+        pass
+
+
+# ----------------------------
+# JSON files (original layout)
+# ----------------------------
+
+class JsonStorage(StorageEngine):
+    def __init__(self, layout: Dict[str, tuple] = JSON_LAYOUT) -> None:
+        self.layout = layout
+        self._lock = threading.Lock()
+
+    def _load(self, path: str) -> List[Dict[str, Any]]:
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                content = f.read().strip()
+                if content:
+                    return json.loads(content)
+        return []
+
+    def insert(self, kind: str, user: str, entry: Dict[str, Any]) -> None:
+        path, key = self.layout[kind]
+        with self._lock:
+            data = self._load(path)
+            user_entry = next((e for e in data if e.get("user") == user), None)
+            if user_entry is None:
+                user_entry = {"user": user, key: []}
+                data.append(user_entry)
+            user_entry.setdefault(key, []).append(entry)
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(data, f, indent=2)
+
+    def list_entries(self, kind: str, user: str) -> List[Dict[str, Any]]:
+        """Raises FileNotFoundError when the backing file is missing (as before)."""
+        path, key = self.layout[kind]
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        user_block = next((item for item in data if item.get("user") == user), None)
+        if not user_block:
+            return []
+        return user_block.get(key, [])
+
+
+# ----------------------------
+# SQLite
+# ----------------------------
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS receipts (
+    entry_id TEXT,
+    user     TEXT NOT NULL,
+    date     TEXT,
+    store    TEXT,
+    items    TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS receipts_user_date ON receipts (user, date);
+
+CREATE TABLE IF NOT EXISTS energy_bills (
+    entry_id        TEXT,
+    user            TEXT NOT NULL,
+    date            TEXT,
+    start_date      TEXT,
+    end_date        TEXT,
+    consumption_kwh REAL,
+    emissions       REAL,
+    points          REAL
+);
+CREATE INDEX IF NOT EXISTS energy_bills_user_date ON energy_bills (user, date);
+
+CREATE TABLE IF NOT EXISTS rides (
+    entry_id       TEXT,
+    user           TEXT NOT NULL,
+    date           TEXT,
+    ride_date      TEXT,
+    distance_miles REAL,
+    vehicle_type   TEXT,
+    emissions      REAL,
+    points         REAL
+);
+CREATE INDEX IF NOT EXISTS rides_user_date ON rides (user, date);
+"""
+
+# kind -> (table, entry columns in JSON key order)
+SQL_LAYOUT = {
+    "receipts": ("receipts", ("entry_id", "date", "items", "store")),
+    "energy":   ("energy_bills", ("entry_id", "date", "start_date", "end_date", "consumption_kwh", "emissions", "points")),
+    "rides":    ("rides", ("entry_id", "date", "ride_date", "distance_miles", "vehicle_type", "emissions", "points")),
+}
+
+# entry_id is not unique in the legacy JSON data, so rows are keyed by rowid.
+# Statements are built once; sqlite3 caches the prepared form per connection.
+INSERT_SQL = {
+    kind: f"INSERT INTO {table} (user, {', '.join(cols)}) VALUES (?, {', '.join('?' for _ in cols)})"
+    for kind, (table, cols) in SQL_LAYOUT.items()
+}
+SELECT_SQL = {
+    kind: f"SELECT {', '.join(cols)} FROM {table} WHERE user = ? ORDER BY rowid"
+    for kind, (table, cols) in SQL_LAYOUT.items()
+}
+JSON_COLUMNS = {"items"}
+JSON_MIGRATED_VERSION = 1   # PRAGMA user_version once migrate_from_json has run
+
+
+class SQLiteStorage(StorageEngine):
+    def __init__(self, path: str = "data/ecoscore.db") -> None:
+        self.path = path
+        self._lock = threading.RLock()
+        self._in_tx = 0
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, cached_statements=64)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+
+    @contextmanager
+    def transaction(self) -> Iterator[None]:
+        """Group several inserts into one commit; nests safely."""
+        with self._lock:
+            if self._in_tx:
+                self._in_tx += 1
+                try:
+                    yield
+                finally:
+                    self._in_tx -= 1
+                return
+            self._conn.execute("BEGIN")
+            self._in_tx = 1
+            try:
+                yield
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            else:
+                self._conn.execute("COMMIT")
+            finally:
+                self._in_tx = 0
+
+    @contextmanager
+    def savepoint(self) -> Iterator[None]:
+        """
+        Inside transaction(): the inserts made in the block are rolled back on their own
+        if it raises, and the rest of the transaction goes on. Outside: a transaction.
+        """
+        with self._lock:
+            if not self._in_tx:
+                with self.transaction():
+                    yield
+                return
+            self._conn.execute("SAVEPOINT job")
+            try:
+                yield
+            except BaseException:
+                self._conn.execute("ROLLBACK TO job")
+                self._conn.execute("RELEASE job")
+                raise
+            self._conn.execute("RELEASE job")
+
+    def insert(self, kind: str, user: str, entry: Dict[str, Any]) -> None:
+        _, cols = SQL_LAYOUT[kind]
+        values = [user]
+        for c in cols:
+            v = entry.get(c)
+            values.append(json.dumps(v, ensure_ascii=False) if c in JSON_COLUMNS else v)
+        with self._lock:
+            self._conn.execute(INSERT_SQL[kind], values)
+
+    def list_entries(self, kind: str, user: str) -> List[Dict[str, Any]]:
+        _, cols = SQL_LAYOUT[kind]
+        with self._lock:
+            rows = self._conn.execute(SELECT_SQL[kind], (user,)).fetchall()
+        out = []
+        for row in rows:
+            entry = dict(zip(cols, row))
+            for c in JSON_COLUMNS.intersection(entry):
+                entry[c] = json.loads(entry[c]) if entry[c] is not None else None
+            out.append(entry)
+        return out
+
+    def is_empty(self) -> bool:
+        with self._lock:
+            for table, _ in SQL_LAYOUT.values():
+                if self._conn.execute(f"SELECT 1 FROM {table} LIMIT 1").fetchone():
+                    return False
+        return True
+
+    def json_migrated(self) -> bool:
+        with self._lock:
+            return self._conn.execute("PRAGMA user_version").fetchone()[0] >= JSON_MIGRATED_VERSION
+
+    def mark_json_migrated(self) -> None:
+        with self._lock:
+            self._conn.execute(f"PRAGMA user_version = {JSON_MIGRATED_VERSION}")
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+def migrate_from_json(target: StorageEngine, layout: Dict[str, tuple] = JSON_LAYOUT) -> int:
+    """One-shot copy of data/*.json into another engine. Returns rows copied."""
+    source = JsonStorage(layout)
+    copied = 0
+    with target.transaction():
+        for kind, (path, key) in layout.items():
+            for block in source._load(path):
+                user = block.get("user")
+                if not user:
+                    continue
+                for entry in block.get(key, []):
+                    target.insert(kind, user, entry)
+                    copied += 1
+    print(f"✅ Migrated {copied} entries from JSON files into {type(target).__name__}")
+    return copied
+
+
+def open_storage(engine: str = "sqlite", db_path: str = "data/ecoscore.db") -> StorageEngine:
+    if engine == "json":
+        return JsonStorage()
+    if engine == "sqlite":
+        store = SQLiteStorage(db_path)
+        if not store.json_migrated():
+            with store.transaction():
+                # A database with rows but no mark was filled by a build that migrated
+                # without recording it: mark it, don't copy the JSON files again.
+                if store.is_empty():
+                    migrate_from_json(store)
+                store.mark_json_migrated()
+        return store
+    raise ValueError(f"unknown storage engine: {engine!r} (expected 'sqlite' or 'json')")
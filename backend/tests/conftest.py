@@ -0,0 +1,9 @@
+import sys
+from pathlib import Path
+
+# The app imports its modules both as top-level names (run from backend/) and through
+# the backend package (run from the repo root); tests need both on the path.
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+for path in (BACKEND_DIR, BACKEND_DIR.parent):
+    if str(path) not in sys.path:
+        sys.path.insert(0, str(path))
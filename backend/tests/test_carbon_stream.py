@@ -0,0 +1,110 @@
+import asyncio
+
+from backend.LLM_Score.clients.llm_client import LLMClient
+from backend.LLM_Score.services.carbon_service import CarbonService
+from backend.LLM_Score.services.emission_cache import EmissionCache
+
+ITEMS = ["LMB SHLDR", "DAWN DISH 20OZ", "OAT MLK", "KIWI GOLD"]
+TRUE_KG = {"LMB SHLDR": 20.0, "DAWN DISH 20OZ": 0.3, "OAT MLK": 1.1, "KIWI GOLD": 0.4}
+
+
+class FakeStreamClient(LLMClient):
+    """Streams paraphrased names, and finishes the second chunk before the first."""
+
+    def __init__(self, echo_ids: bool) -> None:
+        super().__init__(api_key="test", chunk_max_items=2, chunk_retries=1)
+        self.echo_ids = echo_ids
+        self.calls = []
+
+    async def _stream_completion(self, chunk):
+        names = [entry["item_name"] for entry in chunk]
+        self.calls.append(names)
+        if names[0] == ITEMS[0]:
+            await asyncio.sleep(0.05)
+        for i, name in reversed(list(enumerate(names))):
+            entry = {"item_name": name.title() + " (paraphrased)", "emissions_kg_co2e": TRUE_KG[name]}
+            if self.echo_ids:
+                entry["id"] = i
+            yield entry
+
+
+async def collect(service):
+    return [row async for row in service.stream_batch([{"name": n} for n in ITEMS])]
+
+
+def test_stream_rows_matched_by_echoed_id():
+    cache = EmissionCache(path=None)
+    client = FakeStreamClient(echo_ids=True)
+    rows = asyncio.run(collect(CarbonService(client, cache=cache)))
+
+    assert {ITEMS[i]: row["emissions_kg_co2e"] for i, row in rows} == TRUE_KG
+    assert all(row["item_name"] == ITEMS[i] for i, row in rows)
+    assert len(client.calls) == 2
+
+
+def test_stream_unmatched_rows_are_retried_not_guessed():
+    cache = EmissionCache(path=None)
+    client = FakeStreamClient(echo_ids=False)
+    rows = asyncio.run(collect(CarbonService(client, cache=cache)))
+
+    # Nothing identifies the paraphrased rows: no item gets a value, nothing is cached.
+    assert rows == []
+    assert len(client.calls) == 4   # each chunk tried once and retried once
+    assert cache.stats()["entries"] == 0
+
+
+def test_stream_matches_names_up_to_case():
+    class CaseOnly(FakeStreamClient):
+        async def _stream_completion(self, chunk):
+            for entry in chunk:
+                yield {"item_name": entry["item_name"].lower(), "emissions_kg_co2e": TRUE_KG[entry["item_name"]]}
+
+    rows = asyncio.run(collect(CarbonService(CaseOnly(echo_ids=False), cache=EmissionCache(path=None))))
+    assert {ITEMS[i]: row["emissions_kg_co2e"] for i, row in rows} == TRUE_KG
+
+
+class FakeBatchClient(LLMClient):
+    """Answers each chunk in one completion, rows reversed and paraphrased, same count."""
+
+    def __init__(self, echo_ids: bool) -> None:
+        super().__init__(api_key="test", chunk_max_items=2, chunk_retries=0)
+        self.echo_ids = echo_ids
+
+    async def _complete_chunk(self, chunk):
+        rows = []
+        for i, entry in reversed(list(enumerate(chunk))):
+            row = {"item_name": entry["item_name"].title() + " (paraphrased)",
+                   "emissions_kg_co2e": TRUE_KG[entry["item_name"]]}
+            if self.echo_ids:
+                row["id"] = i
+            rows.append(row)
+        return {"items": rows}, False
+
+
+def estimate(client, cache):
+    return asyncio.run(CarbonService(client, cache=cache).estimate_batch([{"name": n} for n in ITEMS]))
+
+
+def test_batch_rows_matched_by_echoed_id():
+    cache = EmissionCache(path=None)
+    rows = estimate(FakeBatchClient(echo_ids=True), cache)
+    assert {row["item_name"]: row["emissions_kg_co2e"] for row in rows} == TRUE_KG
+
+
+def test_batch_reordered_rows_are_dropped_not_matched_by_position():
+    cache = EmissionCache(path=None)
+    rows = estimate(FakeBatchClient(echo_ids=False), cache)
+    assert rows == []
+    assert cache.stats()["entries"] == 0
+
+
+def test_batch_id_and_name_must_agree():
+    class Swapped(FakeBatchClient):
+        async def _complete_chunk(self, chunk):
+            # exact names, but each row claims the other item's id
+            return {"items": [
+                {"id": 1 - i, "item_name": entry["item_name"], "emissions_kg_co2e": TRUE_KG[entry["item_name"]]}
+                for i, entry in enumerate(chunk)
+            ]}, False
+
+    assert estimate(Swapped(echo_ids=True), EmissionCache(path=None)) == []
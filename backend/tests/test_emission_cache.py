@@ -0,0 +1,49 @@
+import pytest
+
+from backend.LLM_Score.services.emission_cache import EmissionCache, canonical_item_name
+
+
+@pytest.mark.parametrize(
+    "name, key",
+    [
+        ("ORG CHKN BRST 1.32 LB @ 4.99/LB", "organic chicken breast"),
+        ("organic chicken breast", "organic chicken breast"),
+        ("NATURAL BNLS SKNLS CKN T", "natural boneless skinless chicken t"),   # cut-off word kept
+        ("BANANAS 4011", "banana"),                                            # PLU code dropped
+        ("2 @ 1.99 YOGURT", "yogurt"),
+        ("WHL MLK 1 GAL", "whole milk"),
+        ("GRND BF 5 LB", "ground beef"),
+        ("  Oat   Milk 64 FL OZ ", "oat milk"),
+    ],
+)
+def test_canonical_item_name(name, key):
+    assert canonical_item_name(name) == key
+
+
+def test_fat_percentages_stay_distinct():
+    assert canonical_item_name("2% MILK") == "2% milk"
+    assert canonical_item_name("1% MILK") == "1% milk"
+    assert canonical_item_name("MILK 1,5%") == "milk 1.5%"
+    assert len({canonical_item_name(n) for n in ("2% MILK", "1% MILK", "MILK")}) == 3
+
+
+def test_brand_prefixes_are_not_expanded():
+    assert canonical_item_name("TOMS OF MAINE TOOTHPASTE") == "toms of maine toothpaste"
+    assert canonical_item_name("TOMS OF MAINE TOOTHPASTE") != canonical_item_name("TOMATO")
+
+
+def test_falls_back_to_the_name_when_nothing_survives():
+    assert canonical_item_name("12345") == "12345"
+    assert canonical_item_name("") == ""
+
+
+def test_cache_counts_entries_without_rescanning():
+    cache = EmissionCache(path=None, max_entries=10)
+    cache.put_many({"a": 1.0, "b": 2.0})
+    cache.put_many({"b": 3.0, "c": 4.0})
+    assert cache.stats()["entries"] == 3
+    assert cache.get_many(["a", "b", "x"]) == {"a": 1.0, "b": 3.0}
+
+    cache.put_many({f"k{i}": float(i) for i in range(10)})
+    stats = cache.stats()
+    assert stats["entries"] == 9 and stats["evictions"] == 4
@@ -0,0 +1,70 @@
+import pytest
+
+from backend.LLM_Score.services.emission_catalog import EmissionCatalog
+
+
+@pytest.fixture(scope="module")
+def catalog():
+    return EmissionCatalog.load()
+
+
+@pytest.mark.parametrize(
+    "name",
+    [
+        "BEEF BROTH 32OZ",
+        "DOG FOOD BEEF",
+        "CHKN NOODLE SOUP",
+        "COFFEE CREAMER",
+        "RICE VINEGAR",
+        "SUGAR FREE GUM",
+        "TOMS OF MAINE TOOTHPASTE",
+        "EGGPLANT",
+        "BAREBELLS CHOCOLATE DOUGH",
+    ],
+)
+def test_extra_words_leave_item_to_llm(catalog, name):
+    assert catalog.match(name) is None
+
+
+@pytest.mark.parametrize(
+    "name, category",
+    [
+        ("GRND BF", "beef"),
+        ("ORG CHKN BRST", "poultry meat"),
+        ("BNLS SKNLS CHKN BRST", "poultry meat"),
+        ("ORG BANANA", "bananas"),
+        ("LG EGGS", "eggs"),
+        ("OAT MILK", "oat milk"),
+        ("WHL MLK", "milk"),
+        ("FRZ PEAS", "peas"),
+    ],
+)
+def test_confident_matches(catalog, name, category):
+    match = catalog.match(name)
+    assert match is not None and match.category == category
+    assert match.score >= catalog.min_score
+
+
+def test_weight_on_line_scales_emissions(catalog):
+    per_unit = catalog.match("GRND BF")
+    five_lb = catalog.match("GRND BF 5 LB")
+    assert per_unit.weight_kg == 0.5
+    assert five_lb.weight_kg == pytest.approx(5 * 0.4536, abs=1e-3)
+    assert five_lb.emissions_kg_co2e == pytest.approx(per_unit.emissions_kg_co2e / 0.5 * 5 * 0.4536, abs=0.05)
+
+
+@pytest.mark.parametrize(
+    "name, weight_kg",
+    [
+        ("ORG CHKN BRST 1.32 LB @ 4.99/LB", 1.32 * 0.4536),   # price per lb is not a weight
+        ("2 X 500G PASTA", 1.0),
+        ("OAT MILK 64 FL OZ", 64 * 0.02957),
+        ("2 @ BANANAS", 2.0),
+    ],
+)
+def test_line_weights(catalog, name, weight_kg):
+    assert catalog.match(name).weight_kg == pytest.approx(weight_kg, abs=1e-3)
+
+
+def test_count_sized_lines_go_to_llm(catalog):
+    assert catalog.match("LG EGGS 12CT") is None
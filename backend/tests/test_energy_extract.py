@@ -0,0 +1,47 @@
+import json
+from pathlib import Path
+
+import pytest
+
+from ocr import extract_energy_structured
+
+SUMMARY = "\n".join([
+    "Dominion Energy",
+    "Service address: 12 Elm St, Richmond VA 23220",
+    "Billing period 01/03/2025 - 02/02/2025",
+    "Total usage 612 kWh",
+    "On-peak 200 kWh",
+])
+DETAILS = "\n".join([
+    "Usage details",
+    "Off-peak 412 kWh",
+    "Net metering credit applied",
+    "Customer service: 1-800-555-0100, Norfolk VA 23510",
+])
+
+# Multi-page synthetic bills (optional fields moved onto later pages) with the output
+# of the parser as it was before the single-scan rewrite.
+BASELINE = json.loads((Path(__file__).parent / "data" / "energy_multipage_baseline.json").read_text())
+
+
+def bill(*pages):
+    return "\n\f".join(pages)
+
+
+def test_single_page_reads_every_field():
+    energy = extract_energy_structured(bill(SUMMARY + "\n" + DETAILS))
+    assert energy["utility_name"] == "Dominion Energy"
+    assert energy["zip_code"] == "23220"
+    assert energy["billing_period_start"] == "2025-01-03"
+    assert energy["total_kwh"] == 612
+    assert energy["tou"] == {"peak_kwh": 200, "offpeak_kwh": 412, "midpeak_kwh": None}
+    assert energy["onsite"]["net_metering"] is True
+
+
+def test_reads_optional_fields_from_later_pages():
+    assert extract_energy_structured(bill(SUMMARY, DETAILS)) == extract_energy_structured(SUMMARY + "\n" + DETAILS)
+
+
+@pytest.mark.parametrize("case", BASELINE["bills"], ids=lambda case: f"{case['text'].count(chr(12)) + 1}pages")
+def test_multi_page_bills_match_the_baseline_parser(case):
+    assert extract_energy_structured(case["text"]) == case["expected"]
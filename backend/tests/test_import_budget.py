@@ -0,0 +1,50 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+from conftest import BACKEND_DIR
+
+# milliseconds, best of RUNS; parsers must stay importable without FastAPI/cloud SDKs.
+# Wall-clock numbers depend on the machine, so the budgets are only enforced on request:
+#   IMPORT_BUDGET=1 python -m pytest -q backend/tests/test_import_budget.py
+# The no-side-effects checks always run.
+BUDGETS = {
+    "ocr": 300.0,
+    "db": 150.0,
+    "LLM_Score.ScoreCal": 150.0,
+    "main": 1000.0,
+}
+RUNS = 3
+
+
+def import_ms(module, cwd):
+    """Cumulative `python -X importtime` cost of importing module in a fresh interpreter."""
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join([str(BACKEND_DIR), str(BACKEND_DIR.parent)]), WARM_UP="0")
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=cwd, env=env, capture_output=True, text=True,
+    )
+    assert proc.returncode == 0, f"import {module} failed:\n{proc.stderr[-2000:]}"
+
+    for line in proc.stderr.splitlines():
+        if line.startswith("import time:") and "self [us]" not in line:
+            _, cum_us, name = line[len("import time:"):].split("|", 2)
+            if name.strip() == module:
+                return int(cum_us) / 1000.0
+    pytest.fail(f"no importtime row for {module}")
+
+
+@pytest.mark.skipif(os.getenv("IMPORT_BUDGET", "0") == "0", reason="timing budgets are opt-in: set IMPORT_BUDGET=1")
+@pytest.mark.parametrize("module", list(BUDGETS))
+def test_import_budget(module, tmp_path):
+    import_ms(module, tmp_path)   # warm the bytecode cache
+    ms = min(import_ms(module, tmp_path) for _ in range(RUNS))
+    assert ms <= BUDGETS[module], f"import {module} took {ms:.1f} ms (budget {BUDGETS[module]:.0f} ms)"
+
+
+@pytest.mark.parametrize("module", list(BUDGETS))
+def test_import_has_no_side_effects_on_disk(module, tmp_path):
+    import_ms(module, tmp_path)
+    assert list(tmp_path.iterdir()) == []
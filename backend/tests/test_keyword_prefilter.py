@@ -0,0 +1,65 @@
+import random
+import sys
+
+import pytest
+
+import ocr
+from keyword_prefilter import KeywordPrefilter
+
+CHECKS = [
+    (ocr.KW_BAD, ocr.BAD_LINE_RE),
+    (ocr.KW_STORE, ocr.STORE_HINT_RE),
+    (ocr.KW_UTILITY, ocr.UTILITY_NAME_HINT_RE),
+]
+
+# Fragments of every keyword and regex alternative, with case/spacing noise.
+PIECES = [k for kws in ocr.LINE_FILTER.families.values() for k in kws] + [
+    "sub total", "grand  total", "items in transaction", "purchase transaction", "amount paid",
+    "you saved", "thank you", "visit again", "bill no.", "invoice no", "master card", "super market",
+    "trader joe", "whole foods", "h-e-b", "h e b", "he-b", "stop & shop", "stop&shop", "public service",
+    "pg&e", "co-op", "BANANAS", "3.99", "12 34", "MILK", "İ", "ſ", "K", "\t", "\x1f", "-", " ",
+]
+
+
+def corpus(n, seed=0):
+    rng = random.Random(seed)
+
+    def noisy(s):
+        r = rng.random()
+        if r < 0.3:
+            return s.upper()
+        if r < 0.4:
+            return "".join(c.upper() if rng.random() < 0.5 else c for c in s)
+        if r < 0.5 and len(s) > 2:
+            i = rng.randrange(1, len(s))
+            return s[:i] + rng.choice([" ", "", "x", "\t"]) + s[i:]
+        return s
+
+    for _ in range(n):
+        yield "".join(noisy(rng.choice(PIECES)) + rng.choice(["", " ", "  "]) for _ in range(rng.randint(0, 5)))
+
+
+@pytest.fixture(params=["pyahocorasick", "literal regex"])
+def line_filter(request, monkeypatch):
+    if request.param == "pyahocorasick":
+        pytest.importorskip("ahocorasick")
+    else:
+        monkeypatch.setitem(sys.modules, "ahocorasick", None)   # import fails: fallback
+    prefilter = KeywordPrefilter(ocr.LINE_FILTER.families)
+    assert (prefilter._automaton is not None) == (request.param == "pyahocorasick")
+    return prefilter
+
+
+def test_prefilter_then_regex_equals_regex(line_filter):
+    matched = 0
+    for line in corpus(50000):
+        tags = line_filter.tags(line)
+        for flag, regex in CHECKS:
+            expected = bool(regex.search(line))
+            assert bool(tags & flag and regex.search(line)) == expected, (regex.pattern[:40], line)
+            matched += expected
+    assert matched > 1000   # the corpus actually exercises the regexes
+
+
+def test_non_ascii_lines_get_every_family(line_filter):
+    assert line_filter.tags("SUBTOTAL İ") == line_filter.all_flags
@@ -0,0 +1,81 @@
+import asyncio
+from contextlib import contextmanager
+
+import pytest
+
+from ledger import PointsLedger
+from persistence import PersistenceWriter
+from storage import SQLiteStorage
+
+
+@pytest.fixture
+def stores(tmp_path):
+    storage = SQLiteStorage(str(tmp_path / "ecoscore.db"))
+    ledger = PointsLedger(str(tmp_path / "points.jsonl"), legacy_path=None)
+    indexed = []
+    ledger.subscribe(indexed.extend)
+    yield storage, ledger, indexed
+    storage.close()
+
+
+def upload(storage, ledger, user, fail=False):
+    storage.insert("receipts", user, {"entry_id": user, "items": []})
+    ledger.append({"user": user, "points": 1})
+    if fail:
+        raise ValueError(f"{user} failed")
+    ledger.append({"user": user, "points": 2})
+    return user
+
+
+def run_batch(writer, jobs):
+    async def go():
+        writer.start()
+        futures = [await writer.submit(*job) for job in jobs]
+        results = await asyncio.gather(*futures, return_exceptions=True)
+        await writer.stop()
+        return results
+    return asyncio.run(go())
+
+
+def saved(storage, ledger, users):
+    receipts = [u for u in users if storage.list_entries("receipts", u)]
+    return receipts, sorted({e["user"] for e in ledger.load()})
+
+
+def test_failed_job_is_undone_and_batch_commits(stores):
+    storage, ledger, indexed = stores
+    writer = PersistenceWriter(
+        batch_contexts=(ledger.batch, storage.transaction),
+        job_contexts=(ledger.savepoint, storage.savepoint),
+        flush_interval=0.05,
+    )
+    results = run_batch(writer, [
+        (upload, storage, ledger, "a"),
+        (upload, storage, ledger, "b", True),
+        (upload, storage, ledger, "c"),
+    ])
+
+    assert results[0] == "a" and results[2] == "c"
+    assert isinstance(results[1], ValueError)
+    assert writer.flushes == 1
+    assert saved(storage, ledger, "abc") == (["a", "c"], ["a", "c"])
+    assert [e["user"] for e in indexed] == ["a", "a", "c", "c"]
+
+
+def test_failed_commit_writes_no_ledger_lines(stores):
+    storage, ledger, indexed = stores
+
+    @contextmanager
+    def failing_commit():
+        yield
+        raise OSError("disk full")
+
+    writer = PersistenceWriter(
+        batch_contexts=(ledger.batch, storage.transaction, failing_commit),
+        job_contexts=(ledger.savepoint, storage.savepoint),
+    )
+    results = run_batch(writer, [(upload, storage, ledger, "a")])
+
+    assert isinstance(results[0], OSError)
+    assert saved(storage, ledger, "a") == ([], [])
+    assert indexed == []
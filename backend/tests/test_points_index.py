@@ -0,0 +1,66 @@
+import random
+from collections import defaultdict
+
+import pytest
+
+from points_index import DailyRankIndex
+
+DAY = "2025-06-16"
+
+
+def baseline_rank(entries, day, user):
+    """The linear count GET /percentile used before DailyRankIndex."""
+    today_totals = defaultdict(float)
+    for p in entries:
+        if p.get("date") == day and p.get("user"):
+            today_totals[p["user"]] += p.get("points", 0)
+    if not today_totals:
+        return None
+    user_points = today_totals.get(user, 0.0)
+    if user not in today_totals:
+        today_totals[user] = 0.0
+    values = list(today_totals.values())
+    return user_points, sum(1 for v in values if v < user_points), len(values)
+
+
+def tied_entries(seed, n=400):
+    """Few users, few distinct point values: lots of equal totals, some on other days."""
+    rng = random.Random(seed)
+    return [
+        {"user": f"u{rng.randrange(30)}", "date": rng.choice([DAY, DAY, DAY, "2025-06-15"]),
+         "points": rng.choice([0, 1, 1, 2, 5, 0.5])}
+        for _ in range(n)
+    ]
+
+
+USERS = [f"u{i}" for i in range(30)] + ["nobody"]
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_rebuilt_index_matches_baseline_with_ties(seed):
+    entries = tied_entries(seed)
+    index = DailyRankIndex()
+    index.rebuild(entries)
+    for user in USERS:
+        assert index.rank(DAY, user) == baseline_rank(entries, DAY, user)
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_incremental_index_matches_baseline_with_ties(seed):
+    entries = tied_entries(seed)
+    index = DailyRankIndex()
+    seen = []
+    for n, entry in enumerate(entries):
+        index.add(entry)
+        seen.append(entry)
+        if n % 20 == 0:   # queries keep the day's sorted list live between adds
+            for user in USERS:
+                assert index.rank(DAY, user) == baseline_rank(seen, DAY, user)
+
+
+def test_all_users_tied():
+    entries = [{"user": u, "date": DAY, "points": 3} for u in ("a", "b", "c")]
+    index = DailyRankIndex()
+    index.rebuild(entries)
+    assert index.rank(DAY, "b") == baseline_rank(entries, DAY, "b") == (3, 0, 3)
+    assert index.rank(DAY, "z") == baseline_rank(entries, DAY, "z") == (0.0, 0, 4)
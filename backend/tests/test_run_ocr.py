@@ -0,0 +1,67 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+import ocr
+
+
+@pytest.fixture
+def slots(monkeypatch):
+    """One OCR slot, room for two abandoned calls, a 0.1 s deadline."""
+    pool = ocr._OCRSlots(1, 2)
+    monkeypatch.setattr(ocr, "_ocr_slots", pool)
+    monkeypatch.setattr(ocr, "OCR_DEADLINE_SECONDS", 0.1)
+    release = threading.Event()
+    yield pool, release
+    release.set()
+    pool.executor.shutdown(wait=True)
+
+
+def test_stuck_backend_does_not_block_later_calls(slots):
+    pool, release = slots
+
+    async def go():
+        with pytest.raises(RuntimeError, match="deadline"):
+            await ocr.run_ocr(release.wait)
+        t0 = time.perf_counter()
+        assert await ocr.run_ocr(lambda: "text") == "text"
+        return time.perf_counter() - t0
+
+    assert asyncio.run(go()) < 0.1
+    assert pool.abandoned == 1
+
+
+def test_fails_fast_while_too_many_calls_are_stuck(slots):
+    pool, release = slots
+
+    async def go():
+        for _ in range(2):
+            with pytest.raises(RuntimeError, match="deadline"):
+                await ocr.run_ocr(release.wait)
+        with pytest.raises(RuntimeError, match="unavailable"):
+            await ocr.run_ocr(lambda: "text")
+
+        release.set()   # the stuck calls return and give their threads back
+        while pool.abandoned:
+            await asyncio.sleep(0.01)
+        return await ocr.run_ocr(lambda: "text")
+
+    assert asyncio.run(go()) == "text"
+
+
+def test_calls_queued_past_the_deadline_never_run(slots):
+    pool, _ = slots
+    ran = []
+    pool._free.acquire()   # a live call holds the only slot for the whole test
+
+    async def go():
+        with pytest.raises(RuntimeError, match="deadline"):
+            await ocr.run_ocr(ran.append, "queued")
+
+    asyncio.run(go())
+    pool._free.release()
+    pool.executor.shutdown(wait=True)
+    assert ran == []
+    assert pool.abandoned == 0
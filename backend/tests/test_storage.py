@@ -0,0 +1,44 @@
+import json
+import sqlite3
+
+import pytest
+
+from storage import SQLiteStorage, open_storage
+
+
+@pytest.fixture
+def legacy_json(tmp_path, monkeypatch):
+    """data/receipts.json from before the SQLite engine, in a scratch working directory."""
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "data").mkdir()
+    blocks = [{"user": "u1", "receipts": [{"entry_id": "r1", "store": "S", "items": []}]}]
+    (tmp_path / "data" / "receipts.json").write_text(json.dumps(blocks))
+    return str(tmp_path / "data" / "ecoscore.db")
+
+
+def receipt_ids(store):
+    return [r["entry_id"] for r in store.list_entries("receipts", "u1")]
+
+
+def test_json_is_migrated_once(legacy_json):
+    store = open_storage("sqlite", legacy_json)
+    assert receipt_ids(store) == ["r1"]
+    store.close()
+
+    with sqlite3.connect(legacy_json) as conn:   # the user clears their data
+        conn.execute("DELETE FROM receipts")
+
+    store = open_storage("sqlite", legacy_json)
+    assert receipt_ids(store) == []
+    store.close()
+
+
+def test_unmarked_database_with_rows_is_not_migrated_again(legacy_json):
+    store = SQLiteStorage(legacy_json)   # filled by a build that didn't record the migration
+    store.insert("receipts", "u1", {"entry_id": "r2", "items": []})
+    store.close()
+
+    store = open_storage("sqlite", legacy_json)
+    assert receipt_ids(store) == ["r2"]
+    assert store.json_migrated()
+    store.close()
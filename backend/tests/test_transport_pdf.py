@@ -0,0 +1,38 @@
+import io
+
+import pytest
+
+pytest.importorskip("pdfminer")
+canvas = pytest.importorskip("reportlab.pdfgen.canvas")
+
+import ocr
+
+# Trip summary on page 1; addresses, price and provider only on page 2.
+PAGES = [
+    ["Jun 16, 2025", "4.2 mi   18 min", "7:12 PM", "7:30 PM"],
+    ["Trip details", "100 Market St", "Pickup", "200 Mission St", "Drop-off", "Total $23.40",
+     "Thanks for riding with Lyft"],
+]
+
+
+def make_pdf(pages):
+    buf = io.BytesIO()
+    c = canvas.Canvas(buf)
+    for lines in pages:
+        y = 800
+        for line in lines:
+            c.drawString(50, y, line)
+            y -= 14
+        c.showPage()
+    c.save()
+    return buf.getvalue()
+
+
+def test_ride_fields_on_later_pages_are_read():
+    result = ocr.transport_from_pdf_bytes(make_pdf(PAGES))
+    transport = result["transport"]
+    assert result["pages"] == 2
+    assert (transport["date"], transport["distance_miles"], transport["duration_min"]) == ("2025-06-16", 4.2, 18.0)
+    assert (transport["pickup"], transport["dropoff"]) == ("100 Market St", "200 Mission St")
+    assert transport["price_total"] == 23.40
+    assert transport["provider"] == "Lyft"
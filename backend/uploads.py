@@ -0,0 +1,112 @@
+# backend/uploads.py
+# Upload ingestion with size limits enforced while the bytes arrive, not after buffering.
+#   - UploadLimitMiddleware (ASGI): rejects an oversized upload request with 413 straight
+#     from its Content-Length header, before the multipart body is parsed; for requests
+#     without one (chunked), it counts body bytes and aborts as soon as the limit is passed.
+#   - read_upload(): reads an UploadFile in chunks, stops with 413 once the file passes its
+#     limit, and hashes while reading. The sha256 goes to the OCR cache (content_key), so
+#     the bytes are hashed once and copied once.
+
+from __future__ import annotations
+
+import hashlib
+import os
+from typing import Awaitable, Callable, List, Optional
+
+from fastapi import HTTPException, UploadFile
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+UPLOAD_CHUNK_BYTES = int(os.getenv("UPLOAD_CHUNK_BYTES", str(1024 * 1024)))
+
+
+def _too_large(what: str, limit: int) -> HTTPException:
+    return HTTPException(status_code=413, detail=f"{what} too large (>{limit // (1024*1024)}MB)")
+
+
+class Upload:
+    """One uploaded file: its bytes (single contiguous copy) and their sha256."""
+
+    __slots__ = ("data", "sha256", "filename", "content_type")
+
+    def __init__(self, data: bytes, sha256: str, filename: Optional[str], content_type: Optional[str]) -> None:
+        self.data = data
+        self.sha256 = sha256
+        self.filename = filename
+        self.content_type = content_type
+
+
+async def read_upload(upload: UploadFile, limit: int, what: str = "file") -> Upload:
+    """Chunked read with an early 413; hashes each chunk as it is read."""
+    if upload.size is not None and upload.size > limit:
+        raise _too_large(what, limit)
+
+    digest = hashlib.sha256()
+    chunks: List[bytes] = []
+    total = 0
+    while True:
+        chunk = await upload.read(UPLOAD_CHUNK_BYTES)
+        if not chunk:
+            break
+        total += len(chunk)
+        if total > limit:
+            raise _too_large(what, limit)
+        digest.update(chunk)
+        chunks.append(chunk)
+
+    data = chunks[0] if len(chunks) == 1 else b"".join(chunks)
+    return Upload(data, digest.hexdigest(), upload.filename, upload.content_type)
+
+
+async def read_uploads(uploads: List[UploadFile], limit: int, max_files: int, what: str = "image") -> List[Upload]:
+    """read_upload for a multi-file field; the file count is checked before reading anything."""
+    if len(uploads) > max_files:
+        raise HTTPException(status_code=413, detail=f"too many {what}s (>{max_files})")
+    return [await read_upload(u, limit, f"{what} {n}") for n, u in enumerate(uploads, start=1)]
+
+
+class UploadLimitMiddleware:
+    """
+    Request-body cap per path. limit_for_path(path) returns the byte limit, or None
+    for paths that aren't limited.
+    """
+
+    def __init__(self, app: ASGIApp, limit_for_path: Callable[[str], Optional[int]]) -> None:
+        self.app = app
+        self.limit_for_path = limit_for_path
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        limit = self.limit_for_path(scope["path"]) if scope["type"] == "http" else None
+        if limit is None:
+            await self.app(scope, receive, send)
+            return
+
+        for name, value in scope.get("headers", ()):
+            if name == b"content-length":
+                if value.isdigit() and int(value) > limit:
+                    await _send_413(send, limit)
+                    return
+                break
+
+        received = 0
+
+        async def limited_receive() -> Message:
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    # surfaces through FastAPI's body parsing as a 413 response
+                    raise _too_large("request", limit)
+            return message
+
+        await self.app(scope, limited_receive, send)
+
+
+async def _send_413(send: Callable[[Message], Awaitable[None]], limit: int) -> None:
+    body = f'{{"detail":"request too large (>{limit // (1024*1024)}MB)"}}'.encode()
+    await send({
+        "type": "http.response.start",
+        "status": 413,
+        "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())],
+    })
+    await send({"type": "http.response.body", "body": body})